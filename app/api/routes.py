@@ -1,30 +1,79 @@
-from fastapi import APIRouter, UploadFile, HTTPException
+import asyncio
+import json
+import os
+import secrets
+import uuid
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from langchain_core.documents import Document
 from app.core.logger import logger
-from app.core.database import db
+from app.core.config import settings
+from app.core.database import ReadOnlyIndexError, db
+from app.core.document_registry import document_registry
+from app.core.ollama_pool import pool_health_checker
+from app.core.profiling import (
+    Profile,
+    ProfileFormat,
+    loop_lag_monitor,
+    profile_process,
+    request_profiler,
+)
+from app.core.query_log import query_log
+from app.core.resilience import CircuitOpenError
+from app.core.deadline import (
+    ClientDisconnected,
+    DeadlineExceeded,
+    deadline_scope,
+    header_timeout,
+    request_stats,
+    resolve_timeout,
+    run_request,
+)
 from app.models.schemas import (
     UploadResponse,
     AddChunksResponse,
     AddChunksRequest,
     AskRequest,
     AskResponse,
+    AskBatchRequest,
+    AskBatchResponse,
+    SearchRequest,
+    SearchResponse,
+    MigrationRequest,
+    RouteProfileRequest,
+    SessionAskRequest,
+    SessionAskResponse,
 )
-from app.services.chunking import chunking_service
+from app.services.chunking import ChunkingStrategy, chunking_service
+from app.services.conversation import conversation_service
 from app.services.document_loader import DocumentLoader
 from app.services.graph import langgraph_service
+from app.services.ingestion import ingestion_service
+from app.services.migration import embedding_migration
 from app.services.pipeline import query_pipeline
+from app.services.precompute import answer_precomputer
+from app.services.retrieval import retrieval_service
+from app.services.sync import directory_sync
 
 router = APIRouter()
 
 
 @router.post("/upload")
-async def upload_document(file: UploadFile):
-    try:
-        documents = await DocumentLoader.load_from_uploaded_file(file)
-        chunks = await chunking_service.split_documents(documents)
-        chunks_created = len(chunks)
-        texts = [chunk.page_content for chunk in chunks]
-        metadatas = [chunk.metadata for chunk in chunks]
-        await db.add_documents(texts, metadatas)
+async def upload_document(file: UploadFile, strategy: ChunkingStrategy = "recursive"):
+    try:
+        ids = await ingestion_service.index_document_stream(
+            DocumentLoader.iter_uploaded_file(file), strategy=strategy
+        )
+        chunks_created = len(ids)
         logger.success(f"Processed and added {chunks_created} chunks to database")
         return UploadResponse(
             filename=file.filename,
@@ -32,6 +81,8 @@ async def upload_document(file: UploadFile):
             chunks_created=chunks_created,
             message="File uploaded successfully",
         )
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -40,57 +91,428 @@ async def upload_document(file: UploadFile):
 @router.post("/add-chunks", response_model=AddChunksResponse)
 async def add_chunks(request: AddChunksRequest):
     try:
-        chunks = await chunking_service.split_text(
-            text=request.text, metadata=request.metadata or {}
+        document = Document(page_content=request.text, metadata=request.metadata or {})
+        ids = await ingestion_service.index_documents(
+            [document], strategy=request.chunking_strategy
         )
-        texts = [chunk.page_content for chunk in chunks]
-        metadatas = [chunk.metadata for chunk in chunks]
-
-        ids = await db.add_documents(texts, metadatas)
 
         return AddChunksResponse(status="success", chunks_added=len(ids), chunk_ids=ids)
 
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Add chunks failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/ask-question", response_model=AskResponse)
-async def ask_question(request: AskRequest):
+@router.post("/add-chunks/stream", response_model=AddChunksResponse)
+async def add_chunks_stream(request: Request, metadata: str | None = None):
     try:
-        result = await query_pipeline.ask(
-            question=request.question,
-            top_k=request.top_k,
-            temperature=request.temperature,
+        base_metadata = json.loads(metadata) if metadata else {}
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid metadata: {e}")
+
+    try:
+        parts = ingestion_service.decode_stream(request.stream())
+        if "ndjson" in request.headers.get("content-type", ""):
+            chunks = ingestion_service.chunk_ndjson(parts, metadata=base_metadata)
+        else:
+            chunks = chunking_service.split_text_stream(parts, metadata=base_metadata)
+
+        # Streamed text is kept under its own key in the parsed-text store so
+        # that re-indexing covers it too.
+        ids = await ingestion_service.add_chunks(
+            chunks, record_as=f"stream:{uuid.uuid4().hex}"
+        )
+
+        return AddChunksResponse(status="success", chunks_added=len(ids), chunk_ids=ids)
+
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Streaming add chunks failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/search", response_model=SearchResponse, response_model_exclude_none=True)
+async def search(request: SearchRequest):
+    try:
+        result = await retrieval_service.search_page(
+            query=request.query,
+            limit=request.limit,
+            cursor=request.cursor,
             score_threshold=request.score_threshold,
+            filter=request.filter,
+            fields=request.fields,
+            include_content=request.include_content,
+            highlight=request.highlight,
+            expand_parents=request.expand_parents,
+        )
+        return SearchResponse(**result)
+
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ask-question", response_model=AskResponse)
+async def ask_question(request: AskRequest, http_request: Request):
+    try:
+        result = await run_request(
+            http_request,
+            query_pipeline.ask(
+                question=request.question,
+                top_k=request.top_k,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                score_threshold=request.score_threshold,
+            ),
+            timeout=request.timeout,
         )
 
         return AskResponse(**result)
 
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
     except Exception as e:
         logger.error(f"Question processing failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/sessions/ask", response_model=SessionAskResponse)
+async def ask_in_session(request: SessionAskRequest, http_request: Request):
+    try:
+        result = await run_request(
+            http_request,
+            conversation_service.ask(
+                question=request.question,
+                session_id=request.session_id,
+                top_k=request.top_k,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                score_threshold=request.score_threshold,
+            ),
+            timeout=request.timeout,
+        )
+
+        return SessionAskResponse(**result)
+
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
+    except Exception as e:
+        logger.error(f"Session question failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = await conversation_service.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not await conversation_service.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": f"Session {session_id} deleted"}
+
+
+@router.post("/ask-batch", response_model=AskBatchResponse)
+async def ask_batch(request: AskBatchRequest, http_request: Request):
+    try:
+        results = await run_request(
+            http_request,
+            query_pipeline.ask_batch(
+                questions=request.questions,
+                top_k=request.top_k,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                score_threshold=request.score_threshold,
+            ),
+            timeout=request.timeout,
+        )
+
+        return AskBatchResponse(results=[AskResponse(**result) for result in results])
+
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
+    except Exception as e:
+        logger.error(f"Batch question processing failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ask-batch/stream")
+async def ask_batch_stream(request: AskBatchRequest, http_request: Request):
+    timeout = resolve_timeout(request.timeout, header_timeout(http_request))
+
+    # Starlette cancels the stream when the client goes away, which in turn
+    # cancels the pending generations.
+    async def lines():
+        try:
+            with deadline_scope(timeout):
+                async for result in query_pipeline.ask_batch_stream(
+                    questions=request.questions,
+                    top_k=request.top_k,
+                    temperature=request.temperature,
+                    max_tokens=request.max_tokens,
+                    score_threshold=request.score_threshold,
+                ):
+                    yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+        except asyncio.CancelledError:
+            request_stats.cancelled[http_request.url.path] += 1
+            raise
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.post("/ask-graph", response_model=AskResponse)
-async def ask_with_graph(request: AskRequest):
+async def ask_with_graph(request: AskRequest, http_request: Request):
     try:
-        result = await langgraph_service.process(
-            query=request.question, top_k=request.top_k, temperature=request.temperature
+        result = await run_request(
+            http_request,
+            langgraph_service.process(
+                query=request.question,
+                top_k=request.top_k,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+            ),
+            timeout=request.timeout,
         )
 
         result["metrics"] = {
             "query_type": result.pop("query_type", "unknown"),
             "documents_found": len(result.get("sources", [])),
+            **result.pop("llm_options", {}),
         }
         return AskResponse(**result)
 
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
     except Exception as e:
         logger.error(f"Graph processing failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not x_admin_token or not secrets.compare_digest(
+        x_admin_token, settings.ADMIN_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/reindex", status_code=202, dependencies=[Depends(require_admin)])
+async def reindex(strategy: ChunkingStrategy | None = None):
+    try:
+        await ingestion_service.start_reindex(strategy=strategy)
+        return ingestion_service.reindex_status
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/reindex/status")
+async def reindex_status():
+    return ingestion_service.reindex_status
+
+
+@router.post("/sync", dependencies=[Depends(require_admin)])
+async def sync_directories(strategy: ChunkingStrategy | None = None):
+    if not directory_sync.directories():
+        raise HTTPException(status_code=400, detail="SYNC_DIRECTORIES is not set")
+    try:
+        return await directory_sync.sync(strategy=strategy)
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/sync/status")
+async def sync_status():
+    return directory_sync.get_status()
+
+
+@router.post("/migrations", status_code=202, dependencies=[Depends(require_admin)])
+async def start_migration(request: MigrationRequest):
+    try:
+        return await embedding_migration.start(
+            request.embedding_model, rate=request.rate, swap=request.swap
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/migrations/status")
+async def migration_status():
+    return await embedding_migration.get_status()
+
+
+@router.post("/migrations/swap", dependencies=[Depends(require_admin)])
+async def swap_migration():
+    try:
+        return await embedding_migration.swap()
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/migrations/rollback", dependencies=[Depends(require_admin)])
+async def rollback_migration():
+    try:
+        return await embedding_migration.rollback()
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.delete("/migrations", dependencies=[Depends(require_admin)])
+async def cancel_migration():
+    try:
+        await embedding_migration.cancel()
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return await embedding_migration.get_status()
+
+
+@router.get("/query-log")
+async def top_queries(limit: int = Query(default=20, ge=1, le=1000)):
+    return await query_log.top(limit, collection=db.collection_name)
+
+
+@router.get("/precompute/status")
+async def precompute_status():
+    return answer_precomputer.get_status()
+
+
+@router.post("/precompute", dependencies=[Depends(require_admin)])
+async def run_precompute():
+    return await answer_precomputer.refresh()
+
+
+@router.get("/ollama/pools")
+async def ollama_pools():
+    return pool_health_checker.get_status()
+
+
+@router.get("/requests/stats")
+async def requests_stats():
+    return request_stats.get_stats()
+
+
 @router.get("/db/stats")
 async def db_stats():
     stats = await db.get_collection_stats()
+    stats["registered_documents"] = await document_registry.count()
     return stats
+
+
+def profile_response(profile: Profile, format: ProfileFormat, name: str):
+    if format == "speedscope":
+        return JSONResponse(profile.to_speedscope(name))
+    return PlainTextResponse(profile.to_collapsed())
+
+
+@router.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(
+    seconds: float = Query(default=10, gt=0),
+    format: ProfileFormat = "collapsed",
+    idle: bool = False,
+):
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must not exceed {settings.PROFILE_MAX_SECONDS}",
+        )
+    profile = await profile_process(seconds, idle=idle)
+    return profile_response(profile, format, f"worker {os.getpid()}, {seconds}s")
+
+
+@router.post(
+    "/admin/profile/requests", status_code=202, dependencies=[Depends(require_admin)]
+)
+async def profile_requests(request: RouteProfileRequest):
+    if request.count > settings.PROFILE_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"count must not exceed {settings.PROFILE_MAX_REQUESTS}",
+        )
+    try:
+        return request_profiler.arm(request.path, request.count, idle=request.idle)
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def profiled_requests_status():
+    return request_profiler.get_status()
+
+
+@router.get("/admin/profile/requests/output", dependencies=[Depends(require_admin)])
+async def profiled_requests_output(format: ProfileFormat = "collapsed"):
+    if request_profiler.profile is None:
+        raise HTTPException(status_code=404, detail="No requests have been profiled")
+    return profile_response(
+        request_profiler.profile,
+        format,
+        f"worker {os.getpid()}, {request_profiler.profiled} requests "
+        f"to {request_profiler.path}",
+    )
+
+
+@router.delete("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def cancel_profiled_requests():
+    request_profiler.cancel()
+    return request_profiler.get_status()
+
+
+@router.get("/admin/loop-lag", dependencies=[Depends(require_admin)])
+async def loop_lag():
+    return loop_lag_monitor.get_status()
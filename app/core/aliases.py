@@ -0,0 +1,137 @@
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+
+class CollectionAliases:
+    # COLLECTION_NAME is an alias; the collection it points to can be swapped
+    # atomically, which is how embedding migrations cut over. Every worker
+    # compares the generation with the one it opened and re-initializes when
+    # the alias moved or the collection was dropped.
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.ALIAS_STORE_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS aliases ("
+                "alias TEXT PRIMARY KEY, target TEXT NOT NULL, previous TEXT, "
+                "updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS alias_state ("
+                "alias TEXT PRIMARY KEY, generation INTEGER NOT NULL, "
+                "shadow TEXT, shadow_model TEXT, shadow_kind TEXT, "
+                "shadow_ready INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._initialized = True
+        return connection
+
+    def resolve(self, alias: str) -> str:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT target FROM aliases WHERE alias = ?", (alias,)
+            ).fetchone()
+        return row[0] if row else alias
+
+    def previous(self, alias: str) -> str | None:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT previous FROM aliases WHERE alias = ?", (alias,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, alias: str, target: str) -> str:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT target FROM aliases WHERE alias = ?", (alias,)
+            ).fetchone()
+            previous = row[0] if row else alias
+            connection.execute(
+                "INSERT OR REPLACE INTO aliases (alias, target, previous, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (alias, target, previous, time.time()),
+            )
+            # The shadow collection stops receiving writes once swapped in.
+            self._update(connection, alias, bump=True, shadow=(None, None, None, False))
+        return previous
+
+    def state(self, alias: str) -> tuple[int, str | None, str | None]:
+        # (generation, shadow, shadow_model)
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT generation, shadow, shadow_model FROM alias_state "
+                "WHERE alias = ?",
+                (alias,),
+            ).fetchone()
+        return row or (0, None, None)
+
+    def shadow_job(self, alias: str) -> dict[str, Any] | None:
+        # The migration, re-index or rollback the shadow collection belongs to.
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT shadow, shadow_model, shadow_kind, shadow_ready "
+                "FROM alias_state WHERE alias = ? AND shadow IS NOT NULL",
+                (alias,),
+            ).fetchone()
+        if row is None:
+            return None
+        name, model, kind, ready = row
+        return {"name": name, "model": model, "kind": kind, "ready": bool(ready)}
+
+    def bump(self, alias: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            self._update(connection, alias, bump=True)
+
+    def set_shadow(
+        self,
+        alias: str,
+        shadow: str | None,
+        model: str = None,
+        kind: str = None,
+        ready: bool = False,
+    ) -> None:
+        with closing(self._connect()) as connection, connection:
+            self._update(connection, alias, shadow=(shadow, model, kind, ready))
+
+    def mark_ready(self, alias: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE alias_state SET shadow_ready = 1 WHERE alias = ?", (alias,)
+            )
+
+    @staticmethod
+    def _update(
+        connection: sqlite3.Connection,
+        alias: str,
+        bump: bool = False,
+        shadow: tuple[str | None, str | None, str | None, bool] = None,
+    ) -> None:
+        # A single upsert, so concurrent workers never lose a bump.
+        if bump:
+            connection.execute(
+                "INSERT INTO alias_state (alias, generation) VALUES (?, 1) "
+                "ON CONFLICT(alias) DO UPDATE SET generation = generation + 1",
+                (alias,),
+            )
+        if shadow is not None:
+            connection.execute(
+                "INSERT INTO alias_state (alias, generation, shadow, shadow_model, "
+                "shadow_kind, shadow_ready) VALUES (?, 0, ?, ?, ?, ?) "
+                "ON CONFLICT(alias) DO UPDATE SET shadow = excluded.shadow, "
+                "shadow_model = excluded.shadow_model, "
+                "shadow_kind = excluded.shadow_kind, "
+                "shadow_ready = excluded.shadow_ready",
+                (alias, *shadow),
+            )
+
+
+collection_aliases = CollectionAliases()
@@ -10,11 +10,14 @@ llm_response_cache = TTLCache(
 )
 
 
-def get_llm_cache_key(question: str, context: str, temperature: float) -> str:
+def get_llm_cache_key(
+    question: str, context: str, temperature: float, max_tokens: int | None = None
+) -> str:
     data = {
         "question": question.strip(),
         "context": context.strip(),
         "temperature": round(temperature, 3),
+        "max_tokens": max_tokens,
     }
     json_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
     return sha256(json_str.encode("utf-8")).hexdigest()
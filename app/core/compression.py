@@ -0,0 +1,189 @@
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.logger import logger
+
+REDUCTION_METHODS = {"none", "matryoshka", "pca"}
+QUANTIZATION_MODES = {"none", "int8", "binary"}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingCompressor:
+    def __init__(
+        self, method: str = None, dimension: int = None, pca_path: str | Path = None
+    ):
+        self.method = method or settings.EMBEDDING_REDUCTION
+        self.dimension = dimension or settings.EMBEDDING_DIMENSION
+        self.pca_path = Path(pca_path or settings.EMBEDDING_PCA_PATH)
+        self.mean = None
+        self.components = None
+
+        if self.method not in REDUCTION_METHODS:
+            raise ValueError(f"Unknown embedding reduction: {self.method}")
+        if self.method != "none" and not self.dimension:
+            raise ValueError("EMBEDDING_DIMENSION is required for reduction")
+        if self.method == "pca" and self.pca_path.exists():
+            self.load_pca()
+
+    @property
+    def enabled(self) -> bool:
+        return self.method != "none"
+
+    def fit_pca(self, vectors: np.ndarray, save: bool = True) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) < self.dimension:
+            raise ValueError(
+                f"PCA to {self.dimension} dims needs at least {self.dimension} "
+                f"vectors, got {len(vectors)}"
+            )
+        self.mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.components = vt[: self.dimension].astype(np.float32)
+        logger.info(
+            f"PCA fitted on {len(vectors)} vectors: "
+            f"{vectors.shape[1]} → {self.dimension} dims"
+        )
+
+        if save:
+            self.pca_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(self.pca_path, mean=self.mean, components=self.components)
+            logger.info(f"PCA components saved to {self.pca_path}")
+
+    def load_pca(self) -> None:
+        data = np.load(self.pca_path)
+        self.mean = data["mean"]
+        self.components = data["components"][: self.dimension]
+
+    def transform(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == "matryoshka":
+            # Matryoshka-trained models (nomic-embed-text v1.5) keep most of
+            # the signal in the leading dimensions.
+            vectors = vectors[..., : self.dimension]
+        elif self.method == "pca":
+            if self.components is None:
+                raise ValueError(
+                    f"PCA components not found: {self.pca_path}. "
+                    "Fit them with `python -m app.scripts.vector_compression fit-pca`"
+                )
+            vectors = (vectors - self.mean) @ self.components.T
+        return normalize(vectors)
+
+
+class CompressedEmbeddings(Embeddings):
+    def __init__(self, base: Embeddings, compressor: EmbeddingCompressor):
+        self.base = base
+        self.compressor = compressor
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.compressor.transform(self.base.embed_documents(texts)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.compressor.transform(self.base.embed_query(text)).tolist()
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = await self.base.aembed_documents(texts)
+        return self.compressor.transform(vectors).tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        vector = await self.base.aembed_query(text)
+        return self.compressor.transform(vector).tolist()
+
+
+class QuantizedIndex:
+    def __init__(self, mode: str = None):
+        self.mode = mode or settings.EMBEDDING_QUANTIZATION
+        if self.mode not in QUANTIZATION_MODES - {"none"}:
+            raise ValueError(f"Unknown quantization mode: {self.mode}")
+        # Ids, codes and scales are replaced together, so a search running in
+        # another thread never sees them out of step.
+        self._state: tuple[list[str], np.ndarray | None, np.ndarray | None] = (
+            [],
+            None,
+            None,
+        )
+        self._known: set[str] = set()
+
+    @property
+    def ids(self) -> list[str]:
+        return self._state[0]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._known
+
+    @property
+    def nbytes(self) -> int:
+        _, codes, scales = self._state
+        if codes is None:
+            return 0
+        return codes.nbytes + (scales.nbytes if scales is not None else 0)
+
+    def quantize(self, vectors) -> tuple[np.ndarray, np.ndarray | None]:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.mode == "binary":
+            return np.packbits(vectors > 0, axis=1), None
+
+        # int8 with a per-vector scale keeps the full code range for every
+        # vector regardless of its magnitude.
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+
+    def add(self, ids: list[str], vectors) -> None:
+        # Ids already in the index are skipped, so replaying a write is safe.
+        new = [i for i, id_ in enumerate(ids) if id_ not in self._known]
+        if not new:
+            return
+        codes, scales = self.quantize(np.asarray(vectors, dtype=np.float32)[new])
+        old_ids, old_codes, old_scales = self._state
+        if old_codes is not None:
+            codes = np.vstack([old_codes, codes])
+        if old_scales is not None:
+            scales = np.concatenate([old_scales, scales])
+        self._state = (old_ids + [ids[i] for i in new], codes, scales)
+        self._known.update(ids[i] for i in new)
+
+    def remove(self, ids: list[str]) -> None:
+        to_remove = self._known.intersection(ids)
+        if not to_remove:
+            return
+        old_ids, codes, scales = self._state
+        keep = np.array([i not in to_remove for i in old_ids], dtype=bool)
+        self._state = (
+            [i for i, kept in zip(old_ids, keep) if kept],
+            codes[keep],
+            scales[keep] if scales is not None else None,
+        )
+        self._known.difference_update(to_remove)
+
+    def search(self, vector, k: int) -> list[str]:
+        ids, index_codes, index_scales = self._state
+        if not ids:
+            return []
+        codes, scales = self.quantize(vector)
+        if self.mode == "binary":
+            # Hamming distance via XOR + byte popcount table.
+            distances = _POPCOUNT[np.bitwise_xor(index_codes, codes)].sum(axis=1)
+            scores = -distances.astype(np.float32)
+        else:
+            scores = (index_codes.astype(np.int32) @ codes[0].astype(np.int32)) * (
+                index_scales * scales[0]
+            )
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [ids[i] for i in top]
@@ -6,15 +6,137 @@ class Settings(BaseSettings):
     OLLAMA_MODEL: str = "llama3"
     OLLAMA_EMBEDDING_MODEL: str = "nomic-embed-text:latest"
     OLLAMA_TIMEOUT: int = 30
+    OLLAMA_KEEP_ALIVE: int = 24 * 60 * 60  # seconds, -1 keeps models loaded
+
+    # Comma-separated Ollama URLs; empty means OLLAMA_BASE_URL only.
+    OLLAMA_GENERATION_URLS: str = ""
+    OLLAMA_EMBEDDING_URLS: str = ""
+    OLLAMA_EJECT_FAILURES: int = 3
+    OLLAMA_EJECT_SECONDS: float = 30
+    OLLAMA_HEALTH_CHECK_INTERVAL: float = 15
+    OLLAMA_HEALTH_CHECK_TIMEOUT: float = 5
+    EMBEDDING_HEDGE_AFTER: float = 0  # seconds, 0 disables hedging
+
+    # Hugging Face tokenizer id or tokenizer.json path; empty estimates tokens.
+    LLM_TOKENIZER: str = ""
+    LLM_TOKEN_ESTIMATE_MARGIN: float = 1.2
+    LLM_NUM_CTX: int = 8192
+    LLM_NUM_PREDICT: int = 512
+
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_TIMEOUT: float = 30
+    RETRY_MAX_ATTEMPTS: int = 2
+    RETRY_BUDGET_RATIO: float = 0.1
+    RETRY_BUDGET_BURST: float = 10
+    RETRY_BACKOFF: float = 0.2
+
+    WARMUP_ENABLED: bool = True
+    WARMUP_RETRY_INTERVAL: int = 10
+    KEEP_WARM_INTERVAL: int = 240
 
     COLLECTION_NAME: str = "documents"
     CHROMA_HOST: str
     CHROMA_PORT: int = 8000
 
+    # Comma-separated host:port list; empty means CHROMA_HOST:CHROMA_PORT only.
+    CHROMA_SHARD_HOSTS: str = ""
+    CHROMA_COLLECTIONS_PER_HOST: int = 1
+    SHARD_VIRTUAL_NODES: int = 64
+    SHARD_TIMEOUT: float = 5  # seconds, 0 waits for every shard
+    SHARD_ALLOW_PARTIAL: bool = True
+
+    VECTOR_BACKEND: str = "chroma"  # chroma | local | auto
+    LOCAL_INDEX_PATH: str = "data/local_index"
+    LOCAL_INDEX_IVF_THRESHOLD: int = 50000
+    LOCAL_INDEX_NPROBE: int = 8
+    LOCAL_INDEX_COMPACT_RATIO: float = 0.2  # share of dead rows, 0 disables
+
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10 Mb
 
+    INGEST_BATCH_SIZE: int = 64
+    STREAM_WINDOW_SIZE: int = 64 * 1024
+
+    PDF_WORKERS: int = 0  # 0 uses every CPU
+    PDF_PAGES_PER_TASK: int = 16
+    PDF_PARALLEL_MIN_PAGES: int = 32
+
+    EMBEDDING_BATCH_SIZE: int = 64
+    SEMANTIC_MIN_CHUNK_TOKENS: int = 64
+    SEMANTIC_MAX_CHUNK_TOKENS: int = 512
+    SEMANTIC_BREAKPOINT_PERCENTILE: float = 90.0
+
+    DOCSTORE_PATH: str = "data/docstore.sqlite3"
+    PARENT_CHUNK_SIZE: int = 2000
+    CHILD_CHUNK_SIZE: int = 400
+    CHILD_CHUNK_OVERLAP: int = 50
+    PARENT_FETCH_FACTOR: int = 3
+
+    PARSED_STORE_PATH: str = "data/parsed.sqlite3"
+    REINDEX_CONCURRENCY: int = 4
+    LEASE_STORE_PATH: str = "data/leases.sqlite3"
+    LEASE_TTL: float = 60  # seconds a crashed worker can block re-index or sync
+
+    DOCUMENT_REGISTRY_PATH: str = "data/registry.sqlite3"
+
+    SYNC_DIRECTORIES: str = ""  # comma-separated, empty disables sync
+    SYNC_INTERVAL: float = 300  # seconds, 0 scans only on request
+    SYNC_STRATEGY: str = "recursive"
+    SYNC_STATE_PATH: str = "data/sync.sqlite3"
+
+    ALIAS_STORE_PATH: str = "data/aliases.sqlite3"
+    ALIAS_CHECK_INTERVAL: float = 1.0  # seconds between alias checks on reads
+    MIGRATION_RATE: float = 50  # chunks per second, 0 disables throttling
+    MIGRATION_BATCH_SIZE: int = 64
+
+    EMBEDDING_REDUCTION: str = "none"  # none | matryoshka | pca
+    EMBEDDING_DIMENSION: int = 0
+    EMBEDDING_PCA_PATH: str = "data/pca.npz"
+    EMBEDDING_QUANTIZATION: str = "none"  # none | int8 | binary
+    QUANTIZATION_OVERSAMPLE: int = 4
+    QUANTIZATION_LOG_PATH: str = "data/quantized_log.sqlite3"
+    QUANTIZATION_LOG_SIZE: int = 100000
+
+    REQUEST_TIMEOUT: float = 0  # seconds, 0 disables the server-side deadline
+    DISCONNECT_POLL_INTERVAL: float = 0.5
+
+    SEARCH_MAX_RESULTS: int = 1000
+    SEARCH_SNIPPET_SIZE: int = 240
+
+    SESSION_STORE_PATH: str = "data/sessions.sqlite3"
+    SESSION_TTL: float = 3600  # seconds since the last turn
+    SESSION_MAX_COUNT: int = 10000
+    SESSION_MAX_TURNS: int = 6  # older turns are folded into a summary
+    SESSION_DRIFT_THRESHOLD: float = 0.6  # reuse context above this similarity
+
+    INTENT_ROUTER_ENABLED: bool = True
+    INTENTS_PATH: str = ""  # JSON intents file, built-in greeting/search if empty
+    INTENT_THRESHOLD: float = 0.75
+
+    ADMIN_TOKEN: str = ""  # X-Admin-Token for /admin endpoints, empty disables them
+    PROFILE_SAMPLE_INTERVAL: float = 0.005  # seconds between stack samples
+    PROFILE_MAX_SECONDS: float = 60
+    PROFILE_MAX_REQUESTS: int = 100
+    LOOP_LAG_MONITOR_ENABLED: bool = True
+    LOOP_LAG_CHECK_INTERVAL: float = 0.05
+    LOOP_LAG_THRESHOLD: float = 0.1  # seconds, a longer stall logs the loop's stack
+    LOOP_LAG_HISTORY: int = 50
+
+    QUERY_LOG_ENABLED: bool = True
+    QUERY_LOG_PATH: str = "data/query_log.sqlite3"
+    QUERY_LOG_MAX_ENTRIES: int = 10000
+    QUERY_LOG_WINDOW: float = 7 * 24 * 3600  # seconds, older questions are dropped
+    PRECOMPUTE_ENABLED: bool = True
+    PRECOMPUTE_TOP_N: int = 200
+    PRECOMPUTE_MIN_COUNT: int = 3
+    PRECOMPUTE_INTERVAL: float = 60
+    PRECOMPUTE_CLAIM_TIMEOUT: float = 300
+
+    ASK_BATCH_MAX_QUESTIONS: int = 1000
+    ASK_BATCH_CONCURRENCY: int = 4
+    ASK_BATCH_SHARED_CONTEXT_MAX: int = 8  # questions per shared context, 1 disables
+
     APP_PORT: int = 8080
     APP_ENV: str = "development"
 
@@ -1,9 +1,37 @@
-import chromadb
-from chromadb.config import Settings
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from app.core.aliases import collection_aliases
+from app.core.compression import (
+    CompressedEmbeddings,
+    EmbeddingCompressor,
+    QuantizedIndex,
+)
 from app.core.config import settings
+from app.core.docstore import docstore
+from app.core.document_registry import document_registry
 from app.core.logger import logger
+from app.core.ollama_pool import OllamaPool, PooledEmbeddings, parse_urls
+from app.core.parsed_store import parsed_store
+from app.core.quantized_log import quantized_log
+from app.core.resilience import backends
+from app.core.sharding import ShardSet, read_embedding_model, shard_addresses
+from app.core.snapshot import (
+    iter_snapshot,
+    read_manifest,
+    read_parents,
+    read_parsed,
+    read_registry,
+    write_snapshot,
+)
+
+
+class ReadOnlyIndexError(RuntimeError):
+    pass
 
 
 class VectorDatabase:
@@ -11,57 +39,458 @@ class VectorDatabase:
         self.client = None
         self.collection = None
         self.embeddings = None
+        self.embedding_pool = None
         self.vectorstore = None
+        self.docstore = docstore
+        self.compressor = None
+        self.quantized_index = None
+        self._quantized_seq = 0
+        self._quantized_lock = threading.Lock()
+        self.backend = None
+        # Set while VECTOR_BACKEND=auto serves the local fallback: writes there
+        # would never reach ChromaDB, so they are refused.
+        self.read_only = False
+        self.shards: ShardSet | None = None
+        self.collection_name = None
+        self.embedding_model = None
+        # Set while an embedding migration runs; receives every write too.
+        self.shadow = None
+        # Opens the shadow collection of a migration started by another worker.
+        self.shadow_factory = None
+        self.generation = None
+        self._generation_checked = 0.0
+        # Awaited after chunks are added or deleted.
+        self.change_listeners = []
+
+    @staticmethod
+    def create_embeddings(
+        model: str, pool_name: str = "embedding"
+    ) -> tuple[OllamaPool, PooledEmbeddings]:
+        # chromadb, langchain_chroma and langchain_ollama are imported lazily
+        # to keep application import cheap.
+        from langchain_ollama import OllamaEmbeddings
+
+        pool = OllamaPool(
+            pool_name,
+            parse_urls(settings.OLLAMA_EMBEDDING_URLS),
+            lambda url: OllamaEmbeddings(
+                base_url=url,
+                model=model,
+                keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            ),
+            hedge_after=settings.EMBEDDING_HEDGE_AFTER,
+        )
+        return pool, PooledEmbeddings(pool, backends["embedding"])
 
     async def initialize(self):
+        # Runs without awaiting, so swapping the alias and re-initializing
+        # switches every query to the new collection at once.
         try:
-            self.client = chromadb.HttpClient(
-                host=settings.CHROMA_HOST,
-                port=settings.CHROMA_PORT,
-                settings=Settings(anonymized_telemetry=False, allow_reset=True),
-            )
-
-            self.client.heartbeat()
-            logger.info("Successfully connected to ChromaDB")
-            self.embeddings = OllamaEmbeddings(
-                base_url=settings.OLLAMA_BASE_URL,
-                model=settings.OLLAMA_EMBEDDING_MODEL,
+            generation, shadow, shadow_model = collection_aliases.state(
+                settings.COLLECTION_NAME
             )
-            logger.info(f"Embedding model:{settings.OLLAMA_EMBEDDING_MODEL}")
+            self.collection_name = collection_aliases.resolve(settings.COLLECTION_NAME)
+            if self.collection_name != settings.COLLECTION_NAME:
+                logger.info(
+                    f"Collection alias '{settings.COLLECTION_NAME}' "
+                    f"-> '{self.collection_name}'"
+                )
+            self.compressor = EmbeddingCompressor()
+            self.read_only = False
 
-            collection_name = settings.COLLECTION_NAME
-            existing_collections = [col.name for col in self.client.list_collections()]
-
-            if collection_name in existing_collections:
-                logger.info(f"Collection '{collection_name}' already exists")
+            if settings.VECTOR_BACKEND == "local":
+                self._initialize_local()
+            elif settings.VECTOR_BACKEND == "chroma":
+                self._initialize_chroma()
+            elif settings.VECTOR_BACKEND == "auto":
+                try:
+                    self._initialize_chroma()
+                except Exception as e:
+                    logger.error(
+                        f"ChromaDB unavailable, serving the local index read-only: {e}"
+                    )
+                    self._initialize_local()
+                    self.read_only = True
             else:
-                logger.info(f"Creating new collection '{collection_name}'")
-            self.vectorstore = Chroma(
-                client=self.client,
-                collection_name=collection_name,
-                embedding_function=self.embeddings,
-            )
+                raise ValueError(f"Unknown vector backend: {settings.VECTOR_BACKEND}")
 
-            logger.info("VectorStore initialized successfully")
+            self.generation = generation
+            self._generation_checked = time.monotonic()
+            self._open_shadow(shadow, shadow_model)
+            logger.info(f"VectorStore initialized successfully ({self.backend})")
 
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
             raise
 
+    def check_writable(self) -> None:
+        if self.read_only:
+            raise ReadOnlyIndexError(
+                "ChromaDB is unavailable; the local fallback index is read-only"
+            )
+
+    async def refresh(self, force: bool = False) -> None:
+        # Picks up alias swaps, dropped collections and migrations started by
+        # other workers. Writes always check, so none of them miss the shadow.
+        now = time.monotonic()
+        if not force and now - self._generation_checked < settings.ALIAS_CHECK_INTERVAL:
+            return
+        self._generation_checked = now
+        generation, shadow, shadow_model = await asyncio.to_thread(
+            collection_aliases.state, settings.COLLECTION_NAME
+        )
+        if generation != self.generation:
+            logger.info(f"Collection alias generation {generation}, re-initializing")
+            await self.initialize()
+        elif shadow != (self.shadow.name if self.shadow is not None else None):
+            self._open_shadow(shadow, shadow_model)
+
+    def _open_shadow(self, name: str | None, model: str | None) -> None:
+        if self.shadow is not None:
+            if self.shadow.name == name:
+                return
+            self.shadow.close()
+            self.shadow = None
+        if name is not None and self.shadow_factory is not None:
+            self.shadow = self.shadow_factory(name, model)
+            logger.info(f"Writing to shadow collection '{name}' too")
+
+    def _use_embedding_model(self, recorded: str | None) -> None:
+        # Vectors from one model are meaningless to another, so the model the
+        # collection was built with wins over the configured one.
+        self.embedding_model = recorded or settings.OLLAMA_EMBEDDING_MODEL
+        if recorded and recorded != settings.OLLAMA_EMBEDDING_MODEL:
+            logger.warning(
+                f"Collection '{self.collection_name}' was embedded with "
+                f"'{recorded}', not OLLAMA_EMBEDDING_MODEL "
+                f"'{settings.OLLAMA_EMBEDDING_MODEL}'; querying with '{recorded}'. "
+                "Update the setting or run an embedding migration"
+            )
+        self.embedding_pool, self.embeddings = self.create_embeddings(
+            self.embedding_model
+        )
+        logger.info(f"Embedding model:{self.embedding_model}")
+
+        if self.compressor.enabled:
+            self.embeddings = CompressedEmbeddings(self.embeddings, self.compressor)
+            logger.info(
+                f"Embedding reduction: {self.compressor.method} "
+                f"to {self.compressor.dimension} dims"
+            )
+
+    def open_collection(self, name: str, embeddings):
+        if self.backend == "local":
+            from app.core.local_index import LocalVectorStore
+
+            return LocalVectorStore(embedding_function=embeddings, collection_name=name)
+        return ShardSet.connect(shard_addresses(name=name), embeddings)
+
+    def _initialize_local(self):
+        from app.core.local_index import LocalVectorStore
+
+        self.client = None
+        self.collection = None
+        self.shards = None
+        self.quantized_index = None
+        store = LocalVectorStore(
+            embedding_function=None, collection_name=self.collection_name
+        )
+        self._use_embedding_model(store.recorded_embedding_model())
+        store.embedding_function = self.embeddings
+        store.record_embedding_model(self.embedding_model)
+        self.vectorstore = store
+        self.backend = "local"
+        if settings.EMBEDDING_QUANTIZATION != "none":
+            logger.warning("EMBEDDING_QUANTIZATION is ignored by the local index")
+        logger.info(
+            f"Local index '{self.collection_name}' at {self.vectorstore.path}: "
+            f"{self.vectorstore.count()} vectors"
+        )
+
+    def _initialize_chroma(self):
+        # A single collection is the one-shard case of the sharded layout.
+        addresses = shard_addresses(name=self.collection_name)
+        self._use_embedding_model(read_embedding_model(*addresses[0]))
+        self.shards = ShardSet.connect(addresses, self.embeddings)
+        self.shards.record_embedding_model(self.embedding_model)
+        first = self.shards.shards[0]
+        self.client = first.client
+        self.vectorstore = first.vectorstore
+        self.collection = first.collection
+        self.backend = "chroma"
+        if len(self.shards.shards) > 1:
+            logger.info(
+                f"Sharded across {len(self.shards.shards)} collections: "
+                f"{', '.join(self.shards.by_name)}"
+            )
+
+        self.quantized_index = None
+        if settings.EMBEDDING_QUANTIZATION != "none":
+            if len(self.shards.shards) > 1:
+                logger.warning("EMBEDDING_QUANTIZATION is ignored with sharding")
+            else:
+                self._quantized_seq = quantized_log.latest()
+                self.quantized_index = self._load_quantized_index()
+
     async def add_documents(self, documents: list, metadatas: list = None):
         try:
+            await self.refresh(force=True)
+            self.check_writable()
             if not self.vectorstore:
                 raise ValueError("VectorStore not initialized")
-            ids = await self.vectorstore.aadd_texts(
-                texts=documents, metadatas=metadatas
-            )
+            if self.shards is not None:
+                ids = await self.shards.add_texts(documents, metadatas)
+            else:
+                ids = await self.vectorstore.aadd_texts(
+                    texts=documents, metadatas=metadatas
+                )
+            if self.quantized_index is not None:
+                await asyncio.to_thread(self._add_quantized, ids)
+            if self.shadow is not None:
+                await self.shadow.add(ids, documents, metadatas)
             logger.info(f"Added {len(ids)} documents to database")
+            await self._notify_change()
             return ids
 
         except Exception as e:
             logger.error(f"Failed to add documents: {e}")
             raise
 
+    def _load_quantized_index(self, batch_size: int = 1000) -> QuantizedIndex:
+        index = QuantizedIndex()
+        offset = 0
+        while True:
+            batch = self.collection.get(
+                include=["embeddings"], limit=batch_size, offset=offset
+            )
+            if not batch["ids"]:
+                break
+            index.add(batch["ids"], batch["embeddings"])
+            offset += len(batch["ids"])
+
+        logger.info(
+            f"Quantized index ({index.mode}) loaded: "
+            f"{len(index)} vectors, {index.nbytes} bytes"
+        )
+        return index
+
+    # add and remove replace the index state as a whole; the lock keeps writes
+    # from threads and the replay in _sync_quantized from losing each other's.
+    def _add_quantized(self, ids: list[str], embeddings=None) -> None:
+        if embeddings is None:
+            added = self.collection.get(ids=ids, include=["embeddings"])
+            ids, embeddings = added["ids"], added["embeddings"]
+        with self._quantized_lock:
+            self.quantized_index.add(ids, embeddings)
+        quantized_log.append(self.collection_name, "add", ids)
+
+    def _remove_quantized(self, ids: list[str] | None = None) -> None:
+        # None removes every id, read under the same lock.
+        with self._quantized_lock:
+            if ids is None:
+                ids = self.quantized_index.ids
+            self.quantized_index.remove(ids)
+        quantized_log.append(self.collection_name, "remove", ids)
+
+    def _sync_quantized(self) -> None:
+        # Each worker has its own quantized index; replay the writes other
+        # workers made since this one last looked.
+        with self._quantized_lock:
+            changes = quantized_log.since(self.collection_name, self._quantized_seq)
+            if changes is None:
+                logger.warning("Quantized change log pruned past this worker")
+                self._quantized_seq = quantized_log.latest()
+                self.quantized_index = self._load_quantized_index()
+                return
+            self._quantized_seq, entries = changes
+            for op, ids in entries:
+                if op == "remove":
+                    self.quantized_index.remove(ids)
+                    continue
+                missing = [id_ for id_ in ids if id_ not in self.quantized_index]
+                if missing:
+                    added = self.collection.get(ids=missing, include=["embeddings"])
+                    self.quantized_index.add(added["ids"], added["embeddings"])
+
+    def _quantized_search_by_vector(
+        self, query_vector, k: int, score_threshold: float
+    ) -> list[tuple[Document, float]]:
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        candidate_ids = self.quantized_index.search(
+            query_vector, k * settings.QUANTIZATION_OVERSAMPLE
+        )
+        if not candidate_ids:
+            return []
+
+        # First pass ran on compact codes; re-score the candidates with
+        # the full-precision vectors stored in Chroma.
+        found = self.collection.get(
+            ids=candidate_ids, include=["embeddings", "documents", "metadatas"]
+        )
+        vectors = np.asarray(found["embeddings"], dtype=np.float32)
+        distances = ((vectors - query_vector) ** 2).sum(axis=1)
+        relevance_fn = self.vectorstore._select_relevance_score_fn()
+
+        results = []
+        for i in np.argsort(distances)[:k]:
+            score = relevance_fn(float(distances[i]))
+            if score < score_threshold:
+                continue
+            document = Document(
+                id=found["ids"][i],
+                page_content=found["documents"][i],
+                metadata=found["metadatas"][i] or {},
+            )
+            results.append((document, score))
+
+        return results
+
+    def _search_by_vectors(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        score_threshold: float,
+        filter: dict | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        # The quantized index holds no metadata, so filtered searches go
+        # straight to the vector store.
+        if self.quantized_index is not None and not filter:
+            self._sync_quantized()
+            return [
+                self._quantized_search_by_vector(vector, k, score_threshold)
+                for vector in vectors
+            ]
+
+        raw_results = [
+            self.vectorstore.similarity_search_by_vector_with_score(
+                vector, k, filter=filter
+            )
+            for vector in vectors
+        ]
+        return self._score(raw_results, score_threshold)
+
+    def _score(
+        self, raw_results: list[list[tuple[Document, float]]], score_threshold: float
+    ) -> list[list[tuple[Document, float]]]:
+        relevance_fn = self.vectorstore._select_relevance_score_fn()
+        return [
+            [
+                (document, score)
+                for document, distance in results
+                if (score := relevance_fn(distance)) >= score_threshold
+            ]
+            for results in raw_results
+        ]
+
+    async def _scatter_search(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        score_threshold: float,
+        filter: dict | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        raw_results = await self.shards.query(vectors, k, self.metadata_filter(filter))
+        return self._score(raw_results, score_threshold)
+
+    async def similarity_search_by_vectors(
+        self,
+        vectors: list[list[float]],
+        k: int = 4,
+        score_threshold: float = 0.0,
+        filter: dict | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        try:
+            if not self.vectorstore:
+                raise ValueError("VectorStore not initialized")
+            if not vectors:
+                return []
+
+            if self.shards is not None and (self.quantized_index is None or filter):
+                return await backends["vectorstore"].call(
+                    lambda: self._scatter_search(vectors, k, score_threshold, filter)
+                )
+            return await backends["vectorstore"].call(
+                lambda: asyncio.to_thread(
+                    self._search_by_vectors, vectors, k, score_threshold, filter
+                )
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to search documents by vectors: {e}")
+            raise
+
+    async def add_parent_documents(self, documents: list, collection: str = None):
+        try:
+            if collection is None:
+                await self.refresh(force=True)
+                self.check_writable()
+                collections = [self.collection_name]
+                if self.shadow is not None:
+                    collections.append(self.shadow.name)
+            else:
+                collections = [collection]
+            for name in collections:
+                await self.docstore.put_many(name, documents)
+        except Exception as e:
+            logger.error(f"Failed to add parent documents: {e}")
+            raise
+
+    async def get_parent_documents(self, parent_ids: list[str]) -> dict:
+        try:
+            return await self.docstore.get_many(self.collection_name, parent_ids)
+        except Exception as e:
+            logger.error(f"Failed to get parent documents: {e}")
+            raise
+
+    async def has_parent_documents(self) -> bool:
+        return await self.docstore.exists(self.collection_name)
+
+    def metadata_filter(self, filter: dict | None) -> dict | None:
+        if not filter:
+            return None
+        if self.backend == "local" or len(filter) == 1:
+            return filter
+        # Chroma accepts a single field per where clause; combine with $and.
+        return {"$and": [{key: value} for key, value in filter.items()]}
+
+    async def delete_where(self, filter: dict) -> None:
+        try:
+            await self.refresh(force=True)
+            self.check_writable()
+            if not self.vectorstore:
+                raise ValueError("VectorStore not initialized")
+            if self.backend == "local":
+                deleted = await asyncio.to_thread(self.vectorstore.delete_where, filter)
+                logger.info(f"Deleted {deleted} documents from database")
+            else:
+                await asyncio.to_thread(self._delete_where_chroma, filter)
+                logger.info(f"Deleted documents matching {filter}")
+            # Parents go with their children.
+            await self.docstore.delete_where(self.collection_name, filter)
+            if self.shadow is not None:
+                await self.shadow.delete_where(filter)
+                await self.docstore.delete_where(self.shadow.name, filter)
+            await self._notify_change()
+        except Exception as e:
+            logger.error(f"Failed to delete documents: {e}")
+            raise
+
+    def _delete_where_chroma(self, filter: dict) -> None:
+        where = self.metadata_filter(filter)
+        if self.quantized_index is None:
+            self.shards.delete_where(where)
+            return
+        # Resolved to ids first, so the same ids leave every worker's
+        # quantized index. Quantization implies a single shard.
+        ids = self.collection.get(where=where, include=[])["ids"]
+        if ids:
+            self.shards.delete_ids(ids)
+            self._remove_quantized(ids)
+
+    async def _notify_change(self) -> None:
+        for listener in self.change_listeners:
+            await listener()
+
     async def similarity_search(self, query: str, k: int = 4):
         try:
             if not self.vectorstore:
@@ -77,22 +506,175 @@ class VectorDatabase:
 
     async def get_collection_stats(self):
         try:
-            collection = self.client.get_collection(settings.COLLECTION_NAME)
-            count = collection.count()
+            collection = {
+                "collection_name": settings.COLLECTION_NAME,
+                "collection": self.collection_name,
+                "embedding_model": self.embedding_model,
+            }
+            if self.backend == "local":
+                return {
+                    **collection,
+                    "document_count": self.vectorstore.count(),
+                    "backend": self.backend,
+                }
 
+            status = self.shards.get_status()
             return {
-                "collection_name": settings.COLLECTION_NAME,
-                "document_count": count,
+                **collection,
+                "document_count": sum(shard["count"] for shard in status["shards"]),
+                "backend": self.backend,
+                **status,
             }
         except Exception as e:
             logger.error(f"Failed to get collection stats: {e}")
             return {"error": str(e)}
 
+    def count(self) -> int:
+        if self.backend == "local":
+            return self.vectorstore.count()
+        return self.shards.count()
+
+    def ids(self) -> set[str]:
+        if self.backend == "local":
+            return self.vectorstore.ids()
+        return self.shards.ids()
+
+    def get_by_ids(self, ids: list[str]) -> list[Document]:
+        if self.backend == "local":
+            return self.vectorstore.get_by_ids(ids)
+        return self.shards.get_by_ids(ids)
+
+    def iter_batches(self, batch_size: int = 1000):
+        if self.backend == "local":
+            return self.vectorstore.iter_vectors(batch_size)
+        return self.shards.iter_batches(batch_size)
+
+    def _embedding_info(self) -> dict:
+        # Vectors are only interchangeable between identical embedding setups.
+        compression = "none"
+        if self.compressor is not None and self.compressor.enabled:
+            compression = f"{self.compressor.method}:{self.compressor.dimension}"
+        return {
+            "embedding_model": self.embedding_model,
+            "compression": compression,
+        }
+
+    async def export_snapshot(self, path: str | Path, batch_size: int = 1000) -> dict:
+        try:
+            if not self.vectorstore:
+                raise ValueError("VectorStore not initialized")
+
+            batches = self.iter_batches(batch_size)
+            info = {
+                "collection": settings.COLLECTION_NAME,
+                "backend": self.backend,
+                **self._embedding_info(),
+            }
+            registry_rows = await document_registry.export_rows()
+            parent_rows = await self.docstore.export_rows(self.collection_name)
+            parsed_files = await parsed_store.export_rows()
+            return await asyncio.to_thread(
+                write_snapshot,
+                path,
+                batches,
+                registry_rows,
+                info,
+                parent_rows,
+                parsed_files,
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to export snapshot: {e}")
+            raise
+
+    async def import_snapshot(
+        self, path: str | Path, replace: bool = False, force: bool = False
+    ) -> dict:
+        try:
+            await self.refresh(force=True)
+            self.check_writable()
+            if not self.vectorstore:
+                raise ValueError("VectorStore not initialized")
+            # The shadow would miss the imported vectors; they are not dual-written.
+            job = await asyncio.to_thread(
+                collection_aliases.shadow_job, settings.COLLECTION_NAME
+            )
+            if job is not None:
+                raise ValueError(
+                    f"Collection '{job['name']}' is being built by a {job['kind']}"
+                )
+
+            manifest = read_manifest(path)
+            mismatched = {
+                key: {"snapshot": manifest.get(key), "current": value}
+                for key, value in self._embedding_info().items()
+                if manifest.get(key) != value
+            }
+            if mismatched and not force:
+                raise ValueError(
+                    f"Snapshot was made with different embeddings: {mismatched}"
+                )
+
+            if await asyncio.to_thread(self.count):
+                if not replace:
+                    raise ValueError(
+                        f"Collection '{settings.COLLECTION_NAME}' is not empty"
+                    )
+                await self.delete_collection()
+
+            imported = await asyncio.to_thread(self._import_batches, path, manifest)
+            await document_registry.restore(read_registry(path, manifest))
+            await self.docstore.restore(
+                self.collection_name, read_parents(path, manifest)
+            )
+            await parsed_store.restore(read_parsed(path, manifest))
+            logger.info(f"Imported {imported} vectors from snapshot {path}")
+            await self._notify_change()
+            return {"count": imported, "batches": len(manifest["batches"])}
+
+        except Exception as e:
+            logger.error(f"Failed to import snapshot: {e}")
+            raise
+
+    def _import_batches(self, path: str | Path, manifest: dict) -> int:
+        imported = 0
+        for ids, embeddings, documents, metadatas in iter_snapshot(path, manifest):
+            # Stored vectors go straight into the index; nothing is re-embedded.
+            if self.backend == "local":
+                self.vectorstore.add_vectors(embeddings, documents, metadatas, ids)
+            else:
+                self.shards.add_embeddings(ids, embeddings, documents, metadatas)
+                if self.quantized_index is not None:
+                    self._add_quantized(ids, embeddings)
+            imported += len(ids)
+        return imported
+
+    @staticmethod
+    def doc_ids(batches) -> set[str]:
+        doc_ids = set()
+        for _, _, _, metadatas in batches:
+            doc_ids.update(m["doc_id"] for m in metadatas if m and m.get("doc_id"))
+        return doc_ids
+
     async def delete_collection(self):
         try:
-            self.client.delete_collection(settings.COLLECTION_NAME)
-            logger.warning(f"Collection '{settings.COLLECTION_NAME}' deleted")
+            await self.refresh(force=True)
+            self.check_writable()
+            doc_ids = await asyncio.to_thread(self.doc_ids, self.iter_batches())
+            if self.backend == "local":
+                self.vectorstore.drop()
+            else:
+                if self.quantized_index is not None:
+                    self._remove_quantized()
+                self.shards.delete()
+            await self.docstore.clear(self.collection_name)
+            await document_registry.delete(list(doc_ids))
+            # Otherwise a re-index would bring the deleted corpus back.
+            await parsed_store.clear()
+            logger.warning(f"Collection '{self.collection_name}' deleted")
+            await asyncio.to_thread(collection_aliases.bump, settings.COLLECTION_NAME)
             await self.initialize()
+            await self._notify_change()
         except Exception as e:
             logger.error(f"Failed to delete collection: {e}")
             raise
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Coroutine
+
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Absolute loop time by which the current request has to be answered. Set once
+# per request and inherited by every task the request spawns.
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class RequestStats:
+    def __init__(self):
+        self.cancelled = Counter()
+        self.deadline_exceeded = Counter()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "cancelled": sum(self.cancelled.values()),
+            "cancelled_by_endpoint": dict(self.cancelled),
+            "deadline_exceeded": sum(self.deadline_exceeded.values()),
+            "deadline_exceeded_by_stage": dict(self.deadline_exceeded),
+        }
+
+
+request_stats = RequestStats()
+
+
+def resolve_timeout(*timeouts: float | None) -> float | None:
+    # The tightest of the client-supplied and the server-wide limits wins.
+    candidates = [t for t in (*timeouts, settings.REQUEST_TIMEOUT) if t and t > 0]
+    return min(candidates) if candidates else None
+
+
+def remaining() -> float | None:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+async def guard(awaitable: Awaitable, stage: str):
+    timeout = remaining()
+    if timeout is None:
+        return await awaitable
+
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        request_stats.deadline_exceeded[stage] += 1
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        request_stats.deadline_exceeded[stage] += 1
+        raise DeadlineExceeded(f"Deadline exceeded during {stage}")
+
+
+@contextmanager
+def deadline_scope(timeout: float | None):
+    token = _deadline.set(
+        asyncio.get_running_loop().time() + timeout if timeout else None
+    )
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def run_request(request: Request, coro: Coroutine, timeout: float | None = None):
+    timeout = resolve_timeout(timeout, header_timeout(request))
+    endpoint = request.url.path
+    start = time.time()
+
+    # The task copies the current context, deadline included, on creation.
+    with deadline_scope(timeout):
+        task = asyncio.create_task(coro)
+
+    try:
+        while True:
+            wait = settings.DISCONNECT_POLL_INTERVAL
+            if timeout:
+                wait = max(0.0, min(wait, start + timeout - time.time()))
+            done, _ = await asyncio.wait({task}, timeout=wait)
+            if done:
+                return task.result()
+
+            if await request.is_disconnected():
+                task.cancel()
+                request_stats.cancelled[endpoint] += 1
+                logger.warning(
+                    f"Client disconnected from {endpoint} after "
+                    f"{time.time() - start:.2f}s, request cancelled"
+                )
+                raise ClientDisconnected(endpoint)
+
+            # Stages check the deadline themselves; this is the backstop for
+            # work that is not wrapped in guard().
+            if timeout and time.time() - start >= timeout:
+                task.cancel()
+                request_stats.deadline_exceeded["request"] += 1
+                raise DeadlineExceeded(f"Deadline of {timeout:.1f}s exceeded")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def header_timeout(request: Request) -> float | None:
+    value = request.headers.get("x-request-timeout")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid X-Request-Timeout header: {value!r}")
+        return None
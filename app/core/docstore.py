@@ -0,0 +1,182 @@
+import asyncio
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.document_registry import DocumentRegistry
+from app.core.logger import logger
+
+
+class ParentDocumentStore:
+    # Parents are scoped to the collection their children live in, so a
+    # migration or re-index builds its own set next to the live one.
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.DOCSTORE_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS parent_documents ("
+                "collection TEXT NOT NULL, id TEXT NOT NULL, doc_id TEXT NOT NULL, "
+                "content TEXT NOT NULL, metadata TEXT NOT NULL, "
+                "PRIMARY KEY (collection, id))"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS parent_documents_doc_id "
+                "ON parent_documents (collection, doc_id)"
+            )
+            self._initialized = True
+        return connection
+
+    def _put_many(self, collection: str, documents: list[Document]) -> None:
+        # Children are deleted by the doc_id their file was registered under;
+        # the parent's file-level fields hash to the same one.
+        rows = [
+            (
+                collection,
+                doc.metadata["parent_id"],
+                DocumentRegistry.split(doc.metadata)[0],
+                doc.page_content,
+                json.dumps(doc.metadata, ensure_ascii=False),
+            )
+            for doc in documents
+        ]
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO parent_documents "
+                "(collection, id, doc_id, content, metadata) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def _get_many(self, collection: str, ids: list[str]) -> dict[str, Document]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT id, content, metadata FROM parent_documents "
+                f"WHERE collection = ? AND id IN ({placeholders})",
+                [collection, *ids],
+            ).fetchall()
+        return {
+            row[0]: Document(page_content=row[1], metadata=json.loads(row[2]))
+            for row in rows
+        }
+
+    def _exists(self, collection: str) -> bool:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT 1 FROM parent_documents WHERE collection = ? LIMIT 1",
+                (collection,),
+            ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _where(filter: dict[str, Any]) -> tuple[str, list[Any]]:
+        # The same equality and {"$in": [...]} forms the vector stores accept.
+        conditions, params = [], []
+        for key, value in filter.items():
+            field = "doc_id" if key == "doc_id" else "json_extract(metadata, ?)"
+            if key != "doc_id":
+                params.append(f"$.{key}")
+            if isinstance(value, dict) and "$in" in value:
+                values = list(value["$in"])
+                conditions.append(f"{field} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+            elif value is None:
+                conditions.append(f"{field} IS NULL")
+            else:
+                conditions.append(f"{field} = ?")
+                params.append(value)
+        return " AND ".join(conditions) or "1", params
+
+    def _delete_where(self, collection: str, filter: dict[str, Any]) -> int:
+        where, params = self._where(filter)
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                f"DELETE FROM parent_documents WHERE collection = ? AND {where}",
+                [collection, *params],
+            ).rowcount
+
+    def _copy(self, source: str, target: str, doc_ids: list[str] = None) -> int:
+        filters = [{}]
+        if doc_ids is not None:
+            filters = [
+                {"doc_id": {"$in": doc_ids[i : i + 500]}}
+                for i in range(0, len(doc_ids), 500)
+            ]
+        copied = 0
+        with closing(self._connect()) as connection, connection:
+            for filter in filters:
+                where, params = self._where(filter)
+                copied += connection.execute(
+                    "INSERT OR IGNORE INTO parent_documents "
+                    "(collection, id, doc_id, content, metadata) "
+                    "SELECT ?, id, doc_id, content, metadata FROM parent_documents "
+                    f"WHERE collection = ? AND {where}",
+                    [target, source, *params],
+                ).rowcount
+        return copied
+
+    def _rows(self, collection: str) -> list[tuple[str, str, str, str]]:
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                "SELECT id, doc_id, content, metadata FROM parent_documents "
+                "WHERE collection = ?",
+                (collection,),
+            ).fetchall()
+
+    def _restore(self, collection: str, rows: list[tuple[str, str, str, str]]) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO parent_documents "
+                "(collection, id, doc_id, content, metadata) VALUES (?, ?, ?, ?, ?)",
+                [(collection, *row) for row in rows],
+            )
+
+    def _clear(self, collection: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM parent_documents WHERE collection = ?", (collection,)
+            )
+
+    async def put_many(self, collection: str, documents: list[Document]) -> None:
+        await asyncio.to_thread(self._put_many, collection, documents)
+        logger.info(f"Stored {len(documents)} parent documents for '{collection}'")
+
+    async def get_many(self, collection: str, ids: list[str]) -> dict[str, Document]:
+        return await asyncio.to_thread(self._get_many, collection, ids)
+
+    async def exists(self, collection: str) -> bool:
+        return await asyncio.to_thread(self._exists, collection)
+
+    async def delete_where(self, collection: str, filter: dict[str, Any]) -> int:
+        return await asyncio.to_thread(self._delete_where, collection, filter)
+
+    async def copy(self, source: str, target: str, doc_ids: list[str] = None) -> int:
+        return await asyncio.to_thread(self._copy, source, target, doc_ids)
+
+    async def export_rows(self, collection: str) -> list[tuple[str, str, str, str]]:
+        return await asyncio.to_thread(self._rows, collection)
+
+    async def restore(
+        self, collection: str, rows: list[tuple[str, str, str, str]]
+    ) -> None:
+        await asyncio.to_thread(self._restore, collection, rows)
+
+    async def clear(self, collection: str) -> None:
+        await asyncio.to_thread(self._clear, collection)
+        logger.warning(f"Parent documents of '{collection}' cleared")
+
+
+docstore = ParentDocumentStore()
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Fields that differ between chunks of one file stay on the vector; everything
+# else is the same for the whole file and is stored once in the registry.
+CHUNK_FIELDS = frozenset(
+    {
+        "doc_id",
+        "chunk_id",
+        "chunk_index",
+        "chunk_size",
+        "page",
+        "page_number",
+        "page_label",
+        "parent_id",
+        "start_index",
+        # Whisper's per-segment "[0.00s -> 4.20s]".
+        "timestamps",
+    }
+)
+
+
+class DocumentRegistry:
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.DOCUMENT_REGISTRY_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "doc_id TEXT PRIMARY KEY, metadata TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            self._initialized = True
+        return connection
+
+    @staticmethod
+    def split(metadata: dict[str, Any]) -> tuple[str, dict, dict]:
+        document = {k: v for k, v in metadata.items() if k not in CHUNK_FIELDS}
+        chunk = {k: v for k, v in metadata.items() if k in CHUNK_FIELDS}
+        # Content-addressed, so parts of a stream with different metadata get
+        # their own entries and identical metadata is stored once.
+        payload = json.dumps(document, sort_keys=True, default=str)
+        doc_id = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+        return doc_id, document, chunk
+
+    def _register(self, metadatas: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        compact = []
+        rows = {}
+        for metadata in metadatas:
+            doc_id, document, chunk = self.split(metadata)
+            rows[doc_id] = json.dumps(document, ensure_ascii=False, default=str)
+            compact.append({**chunk, "doc_id": doc_id})
+
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO documents (doc_id, metadata, created_at) "
+                "VALUES (?, ?, ?)",
+                [(doc_id, metadata, now) for doc_id, metadata in rows.items()],
+            )
+        return compact
+
+    def _get_many(self, doc_ids: list[str]) -> dict[str, dict[str, Any]]:
+        if not doc_ids:
+            return {}
+        placeholders = ",".join("?" * len(doc_ids))
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                f"SELECT doc_id, metadata FROM documents "
+                f"WHERE doc_id IN ({placeholders})",
+                doc_ids,
+            ).fetchall()
+        return {doc_id: json.loads(metadata) for doc_id, metadata in rows}
+
+    def _find(self, filter: dict[str, Any]) -> list[str]:
+        conditions = " AND ".join(
+            "json_extract(metadata, ?) = ?" for _ in range(len(filter))
+        )
+        params = []
+        for key, value in filter.items():
+            params.extend([f'$."{key}"', value])
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                f"SELECT doc_id FROM documents WHERE {conditions}", params
+            ).fetchall()
+        return [doc_id for (doc_id,) in rows]
+
+    def _rows(self) -> list[tuple[str, str, float]]:
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                "SELECT doc_id, metadata, created_at FROM documents"
+            ).fetchall()
+
+    def _restore(self, rows: list[tuple[str, str, float]]) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO documents (doc_id, metadata, created_at) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def _delete(self, doc_ids: list[str]) -> int:
+        if not doc_ids:
+            return 0
+        placeholders = ",".join("?" * len(doc_ids))
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                f"DELETE FROM documents WHERE doc_id IN ({placeholders})", doc_ids
+            ).rowcount
+
+    def _count(self) -> int:
+        with closing(self._connect()) as connection, connection:
+            return connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    async def register(self, metadatas: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        return await asyncio.to_thread(self._register, metadatas)
+
+    async def get_many(self, doc_ids: list[str]) -> dict[str, dict[str, Any]]:
+        return await asyncio.to_thread(self._get_many, doc_ids)
+
+    async def attach(self, documents: list[Document]) -> list[Document]:
+        doc_ids = list(
+            dict.fromkeys(
+                doc.metadata["doc_id"]
+                for doc in documents
+                if doc.metadata.get("doc_id")
+            )
+        )
+        registered = await asyncio.to_thread(self._get_many, doc_ids)
+        for doc in documents:
+            document = registered.get(doc.metadata.get("doc_id"))
+            if document is not None:
+                doc.metadata = {**document, **doc.metadata}
+        return documents
+
+    async def resolve_filter(self, filter: dict[str, Any]) -> dict[str, Any] | None:
+        # Document-level conditions become a doc_id lookup the vector store can
+        # evaluate. None means no registered document matches.
+        document = {k: v for k, v in filter.items() if k not in CHUNK_FIELDS}
+        chunk = {k: v for k, v in filter.items() if k in CHUNK_FIELDS}
+        if not document:
+            return chunk
+
+        doc_ids = await asyncio.to_thread(self._find, document)
+        if not doc_ids:
+            logger.info(f"No registered documents match {document}")
+            return None
+        return {**chunk, "doc_id": {"$in": doc_ids}}
+
+    async def export_rows(self) -> list[tuple[str, str, float]]:
+        return await asyncio.to_thread(self._rows)
+
+    async def restore(self, rows: list[tuple[str, str, float]]) -> None:
+        await asyncio.to_thread(self._restore, rows)
+
+    async def delete(self, doc_ids: list[str]) -> int:
+        return await asyncio.to_thread(self._delete, doc_ids)
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count)
+
+
+document_registry = DocumentRegistry()
@@ -0,0 +1,88 @@
+import asyncio
+import sqlite3
+import time
+import uuid
+from contextlib import asynccontextmanager, closing
+from pathlib import Path
+from typing import AsyncIterator
+
+from app.core.config import settings
+
+
+class LeaseStore:
+    # Work that only one worker may run at a time (re-index, directory sync).
+    # The holder renews its lease while it works, so a crashed worker blocks
+    # the others for at most LEASE_TTL seconds.
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.LEASE_STORE_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "name TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            self._initialized = True
+        return connection
+
+    def _claim(self, name: str, owner: str, seconds: float) -> bool:
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO leases (name, owner, expires_at) "
+                "VALUES (?, '', 0)",
+                (name,),
+            )
+            cursor = connection.execute(
+                "UPDATE leases SET owner = ?, expires_at = ? "
+                "WHERE name = ? AND (expires_at < ? OR owner = ?)",
+                (owner, now + seconds, name, now, owner),
+            )
+        return cursor.rowcount > 0
+
+    def _release(self, name: str, owner: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE leases SET expires_at = 0 WHERE name = ? AND owner = ?",
+                (name, owner),
+            )
+
+    def _held(self, name: str) -> bool:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT expires_at FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+        return row is not None and row[0] >= time.time()
+
+    async def held(self, name: str) -> bool:
+        return await asyncio.to_thread(self._held, name)
+
+    @asynccontextmanager
+    async def hold(self, name: str) -> AsyncIterator[bool]:
+        # Yields False without waiting when another worker holds the lease.
+        owner = uuid.uuid4().hex
+        ttl = settings.LEASE_TTL
+        if not await asyncio.to_thread(self._claim, name, owner, ttl):
+            yield False
+            return
+
+        async def renew() -> None:
+            while True:
+                await asyncio.sleep(ttl / 3)
+                await asyncio.to_thread(self._claim, name, owner, ttl)
+
+        renewing = asyncio.create_task(renew())
+        try:
+            yield True
+        finally:
+            renewing.cancel()
+            await asyncio.to_thread(self._release, name, owner)
+
+
+leases = LeaseStore()
@@ -0,0 +1,675 @@
+import asyncio
+import fcntl
+import json
+import re
+import sqlite3
+import uuid
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.core.compression import normalize
+from app.core.config import settings
+from app.core.logger import logger
+
+# Metadata fields with an expression index; filters on other fields still
+# work, but scan the table.
+INDEXED_FIELDS = ("doc_id", "parent_id")
+FIELD_PATTERN = re.compile(r"^\w+$")
+
+
+class LocalVectorStore(VectorStore):
+    # Vectors live in an append-only float32 file that every worker maps
+    # read-only, so index pages are shared through the OS page cache. Row
+    # metadata lives in SQLite; writers serialize on a file lock. Deleted rows
+    # stay in the file until compaction writes the next generation of it.
+    VECTORS_FILE = "vectors.f32"
+    ASSIGNMENTS_FILE = "assignments.i32"
+    CENTROIDS_FILE = "centroids.npy"
+    DB_FILE = "meta.sqlite3"
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        collection_name: str = None,
+        path: str | Path = None,
+        ivf_threshold: int = None,
+        nprobe: int = None,
+    ):
+        self.embedding_function = embedding_function
+        self.collection_name = collection_name or settings.COLLECTION_NAME
+        self.path = Path(path or settings.LOCAL_INDEX_PATH) / self.collection_name
+        self.ivf_threshold = ivf_threshold or settings.LOCAL_INDEX_IVF_THRESHOLD
+        self.nprobe = nprobe or settings.LOCAL_INDEX_NPROBE
+        self.compact_ratio = settings.LOCAL_INDEX_COMPACT_RATIO
+
+        self._dimension = None
+        self._generation = None
+        self._vectors = None
+        self._rows = 0
+        self._assignments = None
+        self._centroids = None
+        self._centroids_mtime = None
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                "document TEXT NOT NULL, metadata TEXT NOT NULL, "
+                "deleted INTEGER NOT NULL DEFAULT 0)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            for field in INDEXED_FIELDS:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS chunks_{field} "
+                    f"ON chunks (json_extract(metadata, '$.{field}'))"
+                )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    @contextmanager
+    def _connect(self):
+        with closing(
+            sqlite3.connect(self.path / self.DB_FILE, timeout=30)
+        ) as connection:
+            with connection:
+                yield connection
+
+    @contextmanager
+    def _lock(self, name: str, operation: int):
+        with open(self.path / name, "w") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_lock(self):
+        return self._lock("lock", fcntl.LOCK_EX)
+
+    def _read_lock(self):
+        # Held by searches; compaction takes it exclusively only to switch
+        # generations, so row numbers never change under a running search.
+        return self._lock("generation.lock", fcntl.LOCK_SH)
+
+    def _file(self, name: str, generation: int) -> Path:
+        return self.path / (f"{name}.{generation}" if generation else name)
+
+    def _get_info(self, key: str) -> str | None:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM info WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_info(self, key: str, value: Any) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                (key, str(value)),
+            )
+
+    def _refresh(self) -> None:
+        # Other workers may have appended rows, retrained the IVF centroids or
+        # compacted the index since the last call, so remap whenever the files
+        # grew or were replaced.
+        if self._dimension is None:
+            value = self._get_info("dimension")
+            if value is None:
+                return
+            self._dimension = int(value)
+
+        generation = int(self._get_info("generation") or 0)
+        if generation != self._generation:
+            self._generation = generation
+            self._rows = None
+            self._assignments = None
+
+        vectors_path = self._file(self.VECTORS_FILE, generation)
+        size = vectors_path.stat().st_size if vectors_path.exists() else 0
+        rows = size // (self._dimension * 4)
+        if rows != self._rows:
+            self._vectors = (
+                np.memmap(
+                    vectors_path,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(rows, self._dimension),
+                )
+                if rows
+                else None
+            )
+            self._rows = rows
+
+        centroids_path = self.path / self.CENTROIDS_FILE
+        if centroids_path.exists():
+            mtime = centroids_path.stat().st_mtime_ns
+            if mtime != self._centroids_mtime:
+                self._centroids = np.load(centroids_path)
+                self._centroids_mtime = mtime
+                self._assignments = None
+
+            assignments_path = self._file(self.ASSIGNMENTS_FILE, generation)
+            assigned = (
+                assignments_path.stat().st_size // 4 if assignments_path.exists() else 0
+            )
+            if self._assignments is None or len(self._assignments) != assigned:
+                self._assignments = (
+                    np.memmap(
+                        assignments_path, dtype=np.int32, mode="r", shape=(assigned,)
+                    )
+                    if assigned
+                    else np.zeros(0, dtype=np.int32)
+                )
+        else:
+            self._centroids = None
+            self._centroids_mtime = None
+            self._assignments = None
+
+    def _train_ivf(
+        self, rows: int, generation: int, iterations: int = 10, sample: int = 50000
+    ) -> None:
+        vectors = np.memmap(
+            self._file(self.VECTORS_FILE, generation),
+            dtype=np.float32,
+            mode="r",
+            shape=(rows, self._dimension),
+        )
+        nlist = int(min(max(np.sqrt(rows), 16), 4096))
+        rng = np.random.default_rng(0)
+        training = np.asarray(
+            vectors[np.sort(rng.choice(rows, min(rows, sample), replace=False))]
+        )
+
+        # Spherical k-means: vectors are normalized, so assign by dot product.
+        centroids = training[rng.choice(len(training), nlist, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(training @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = training[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalize(centroids)
+
+        assignments = np.concatenate(
+            [
+                np.argmax(
+                    np.asarray(vectors[start : start + 10000]) @ centroids.T, axis=1
+                )
+                for start in range(0, rows, 10000)
+            ]
+        ).astype(np.int32)
+
+        assignments_path = self._file(self.ASSIGNMENTS_FILE, generation)
+        assignments_tmp = assignments_path.with_name(assignments_path.name + ".tmp")
+        assignments.tofile(assignments_tmp)
+        assignments_tmp.replace(assignments_path)
+        with open(self.path / (self.CENTROIDS_FILE + ".tmp"), "wb") as f:
+            np.save(f, centroids.astype(np.float32))
+        (self.path / (self.CENTROIDS_FILE + ".tmp")).replace(
+            self.path / self.CENTROIDS_FILE
+        )
+        self._set_info("trained_rows", rows)
+
+        logger.info(f"Local index IVF trained: {rows} vectors, {nlist} lists")
+
+    def _add_vectors(
+        self,
+        vectors: np.ndarray,
+        texts: list[str],
+        metadatas: list[dict] | None,
+        ids: list[str] | None,
+    ) -> list[str]:
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+
+        with self._write_lock():
+            dimension = self._get_info("dimension")
+            if dimension is None:
+                self._set_info("dimension", vectors.shape[1])
+                dimension = vectors.shape[1]
+            if int(dimension) != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"index dimension {dimension}"
+                )
+            self._dimension = int(dimension)
+            generation = int(self._get_info("generation") or 0)
+
+            vectors_path = self._file(self.VECTORS_FILE, generation)
+            start_row = (
+                vectors_path.stat().st_size // (self._dimension * 4)
+                if vectors_path.exists()
+                else 0
+            )
+            with open(vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+
+            centroids_path = self.path / self.CENTROIDS_FILE
+            if centroids_path.exists():
+                centroids = np.load(centroids_path)
+                labels = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+                with open(self._file(self.ASSIGNMENTS_FILE, generation), "ab") as f:
+                    f.write(labels.tobytes())
+
+            with self._connect() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO chunks (row, id, document, metadata) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            start_row + i,
+                            id_,
+                            text,
+                            json.dumps(metadata, ensure_ascii=False),
+                        )
+                        for i, (id_, text, metadata) in enumerate(
+                            zip(ids, texts, metadatas)
+                        )
+                    ],
+                )
+
+            total_rows = start_row + len(vectors)
+            trained_rows = int(self._get_info("trained_rows") or 0)
+            if total_rows >= self.ivf_threshold and total_rows >= 2 * trained_rows:
+                self._train_ivf(total_rows, generation)
+
+        return ids
+
+    def _candidate_rows(self, query: np.ndarray) -> np.ndarray | None:
+        if self._centroids is None or self._assignments is None:
+            return None
+        lists = np.argsort(-(self._centroids @ query))[: self.nprobe]
+        assigned = np.flatnonzero(np.isin(self._assignments, lists))
+        # Rows appended by another worker before their assignments became
+        # visible are scanned exactly.
+        tail = np.arange(len(self._assignments), self._rows)
+        return np.concatenate([assigned, tail])
+
+    @staticmethod
+    def _where(filter: dict[str, Any] | None) -> tuple[str, list[Any]]:
+        # Equality and Chroma's {"$in": [...]}, the two forms the service uses.
+        # Paths are inlined so that SQLite matches the expression indexes.
+        conditions, params = ["deleted = 0"], []
+        for key, value in (filter or {}).items():
+            if not FIELD_PATTERN.match(key):
+                raise ValueError(f"Unsupported filter field '{key}'")
+            field = f"json_extract(metadata, '$.{key}')"
+            if isinstance(value, dict) and "$in" in value:
+                values = list(value["$in"])
+                conditions.append(f"{field} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+            elif value is None:
+                conditions.append(f"{field} IS NULL")
+            else:
+                conditions.append(f"{field} = ?")
+                params.append(value)
+        return " AND ".join(conditions), params
+
+    def _lookup(self, rows: Sequence[int]) -> dict[int, Document]:
+        found = {}
+        with self._connect() as connection:
+            for start in range(0, len(rows), 1000):
+                batch = [int(row) for row in rows[start : start + 1000]]
+                placeholders = ",".join("?" * len(batch))
+                for row, id_, document, metadata in connection.execute(
+                    f"SELECT row, id, document, metadata FROM chunks "
+                    f"WHERE deleted = 0 AND row IN ({placeholders})",
+                    batch,
+                ):
+                    found[row] = Document(
+                        id=id_, page_content=document, metadata=json.loads(metadata)
+                    )
+        return found
+
+    def _ranked(
+        self, rows: np.ndarray | None, scores: np.ndarray, k: int
+    ) -> list[tuple[Document, float]]:
+        # Deleted and replaced rows are still in the vector file, so the fetch
+        # widens until k of the best rows turn out to be live.
+        results = []
+        seen: set[int] = set()
+        fetch = min(len(scores), k * 2)
+        while fetch:
+            top = np.argpartition(-scores, fetch - 1)[:fetch]
+            top = [int(p) for p in top[np.argsort(-scores[top])] if p not in seen]
+            seen.update(top)
+            top_rows = top if rows is None else rows[top]
+            found = self._lookup(top_rows)
+            for position, row in zip(top, top_rows):
+                if int(row) in found:
+                    # Squared L2 distance of normalized vectors, same scale as
+                    # Chroma's default "l2" space, so score thresholds mean the
+                    # same thing.
+                    distance = float(2.0 - 2.0 * scores[position])
+                    results.append((found[int(row)], distance))
+            if len(results) >= k or fetch == len(scores):
+                break
+            fetch = min(len(scores), fetch * 4)
+        results.sort(key=lambda result: result[1])
+        return results[:k]
+
+    def _search_vector(
+        self, query_vector, k: int, filter: dict[str, Any] | None = None
+    ) -> list[tuple[Document, float]]:
+        query = normalize(np.asarray(query_vector, dtype=np.float32))
+        with self._read_lock():
+            self._refresh()
+            if self._vectors is None or k <= 0:
+                return []
+
+            if filter:
+                # Matching rows are selected first, so a selective filter
+                # still returns k results when there are k matches.
+                where, params = self._where(filter)
+                with self._connect() as connection:
+                    rows = np.fromiter(
+                        (
+                            row
+                            for (row,) in connection.execute(
+                                f"SELECT row FROM chunks WHERE {where} AND row < ?",
+                                [*params, self._rows],
+                            )
+                        ),
+                        dtype=np.int64,
+                    )
+                if not len(rows):
+                    return []
+            else:
+                rows = self._candidate_rows(query)
+            scores = (self._vectors if rows is None else self._vectors[rows]) @ query
+            return self._ranked(rows, scores, k)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._euclidean_relevance_score_fn
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        vectors = self.embedding_function.embed_documents(texts)
+        return self._add_vectors(vectors, texts, metadatas, ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        vectors = await self.embedding_function.aembed_documents(texts)
+        return await asyncio.to_thread(
+            self._add_vectors, vectors, texts, metadatas, ids
+        )
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        return self._search_vector(
+            self.embedding_function.embed_query(query), k, filter
+        )
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        vector = await self.embedding_function.aembed_query(query)
+        return await asyncio.to_thread(self._search_vector, vector, k, filter)
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        return self._search_vector(embedding, k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        results = await self.asimilarity_search_with_score(query, k, **kwargs)
+        return [doc for doc, _ in results]
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT id, document, metadata FROM chunks "
+                f"WHERE deleted = 0 AND id IN ({placeholders})",
+                list(ids),
+            ).fetchall()
+        return [
+            Document(id=id_, page_content=document, metadata=json.loads(metadata))
+            for id_, document, metadata in rows
+        ]
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        if not ids:
+            return False
+        placeholders = ",".join("?" * len(ids))
+        with self._write_lock(), self._connect() as connection:
+            connection.execute(
+                f"UPDATE chunks SET deleted = 1 WHERE id IN ({placeholders})", ids
+            )
+        self._maybe_compact()
+        return True
+
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        texts: list[str],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[str]:
+        return self._add_vectors(vectors, texts, metadatas, ids)
+
+    def iter_vectors(
+        self, batch_size: int = 1000
+    ) -> Iterator[tuple[list[str], np.ndarray, list[str], list[dict]]]:
+        last_row, last_id = -1, None
+        while True:
+            with self._read_lock():
+                # Rows appended meanwhile are only visible after a remap.
+                generation = self._generation
+                self._refresh()
+                with self._connect() as connection:
+                    if last_id is not None and self._generation != generation:
+                        # Compaction renumbered the rows but kept their order.
+                        found = connection.execute(
+                            "SELECT row FROM chunks WHERE id = ?", (last_id,)
+                        ).fetchone()
+                        if found is None:
+                            raise RuntimeError(
+                                "Local index compacted during iteration; retry"
+                            )
+                        last_row = found[0]
+                    rows = connection.execute(
+                        "SELECT row, id, document, metadata FROM chunks "
+                        "WHERE deleted = 0 AND row > ? AND row < ? "
+                        "ORDER BY row LIMIT ?",
+                        (last_row, self._rows or 0, batch_size),
+                    ).fetchall()
+                if not rows:
+                    return
+                last_row, last_id = rows[-1][0], rows[-1][1]
+                batch = (
+                    [id_ for _, id_, _, _ in rows],
+                    np.asarray(self._vectors[[row for row, _, _, _ in rows]]),
+                    [document for _, _, document, _ in rows],
+                    [json.loads(metadata) for _, _, _, metadata in rows],
+                )
+            yield batch
+
+    def delete_where(self, filter: dict) -> int:
+        where, params = self._where(filter)
+        with self._write_lock(), self._connect() as connection:
+            deleted = connection.execute(
+                f"UPDATE chunks SET deleted = 1 WHERE {where}", params
+            ).rowcount
+        if deleted:
+            self._maybe_compact()
+        return deleted
+
+    def _maybe_compact(self) -> None:
+        dimension = self._get_info("dimension")
+        if self.compact_ratio <= 0 or dimension is None:
+            return
+        vectors_path = self._file(self.VECTORS_FILE, self._current_generation())
+        if not vectors_path.exists():
+            return
+        rows = vectors_path.stat().st_size // (int(dimension) * 4)
+        if rows - self.count() >= max(1, self.compact_ratio * rows):
+            self.compact()
+
+    def _current_generation(self) -> int:
+        return int(self._get_info("generation") or 0)
+
+    def compact(self) -> int:
+        # The next generation of the vector and assignment files is written
+        # beside the current one while searches go on; one SQLite transaction
+        # then renumbers the rows and switches to it, so a crash at any point
+        # leaves a consistent index.
+        with self._write_lock():
+            self._refresh()
+            if self._vectors is None:
+                return 0
+            generation = self._generation
+            with self._connect() as connection:
+                live = np.fromiter(
+                    (
+                        row
+                        for (row,) in connection.execute(
+                            "SELECT row FROM chunks WHERE deleted = 0 ORDER BY row"
+                        )
+                    ),
+                    dtype=np.int64,
+                )
+            removed = self._rows - len(live)
+            if removed <= 0:
+                return 0
+
+            next_generation = generation + 1
+            with open(self._file(self.VECTORS_FILE, next_generation), "wb") as f:
+                for start in range(0, len(live), 10000):
+                    f.write(
+                        np.asarray(self._vectors[live[start : start + 10000]]).tobytes()
+                    )
+            # Assignments are always complete under the write lock.
+            if self._assignments is not None:
+                np.asarray(self._assignments)[live].astype(np.int32).tofile(
+                    self._file(self.ASSIGNMENTS_FILE, next_generation)
+                )
+
+            with self._lock("generation.lock", fcntl.LOCK_EX), self._connect() as c:
+                c.execute("DELETE FROM chunks WHERE deleted = 1")
+                # Ascending, so every target row number is already free.
+                c.executemany(
+                    "UPDATE chunks SET row = ? WHERE row = ?",
+                    [(i, int(row)) for i, row in enumerate(live) if i != row],
+                )
+                c.execute(
+                    "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                    ("generation", str(next_generation)),
+                )
+                trained_rows = int(self._get_info("trained_rows") or 0)
+                if trained_rows:
+                    c.execute(
+                        "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                        ("trained_rows", str(min(trained_rows, len(live)))),
+                    )
+
+            for name in [self.VECTORS_FILE, self.ASSIGNMENTS_FILE]:
+                self._file(name, generation).unlink(missing_ok=True)
+
+        logger.info(
+            f"Local index '{self.collection_name}' compacted: {removed} rows removed, "
+            f"{len(live)} kept"
+        )
+        return removed
+
+    def ids(self) -> set[str]:
+        with self._connect() as connection:
+            return {
+                id_
+                for (id_,) in connection.execute(
+                    "SELECT id FROM chunks WHERE deleted = 0"
+                )
+            }
+
+    def recorded_embedding_model(self) -> str | None:
+        return self._get_info("embedding_model")
+
+    def record_embedding_model(self, model: str) -> None:
+        if self._get_info("embedding_model") is None:
+            self._set_info("embedding_model", model)
+
+    def count(self) -> int:
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM chunks WHERE deleted = 0"
+            ).fetchone()[0]
+
+    def drop(self) -> None:
+        with self._write_lock():
+            for name in [self.VECTORS_FILE, self.ASSIGNMENTS_FILE, self.CENTROIDS_FILE]:
+                for path in self.path.glob(f"{name}*"):
+                    path.unlink()
+            with self._connect() as connection:
+                connection.execute("DELETE FROM chunks")
+                connection.execute("DELETE FROM info")
+        self._dimension = None
+        self._generation = None
+        self._vectors = None
+        self._rows = 0
+        self._assignments = None
+        self._centroids = None
+        self._centroids_mtime = None
+        logger.warning(f"Local index '{self.collection_name}' dropped")
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
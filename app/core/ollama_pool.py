@@ -0,0 +1,279 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.resilience import ResilientBackend
+
+
+def parse_urls(value: str) -> list[str]:
+    urls = [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+    return urls or [settings.OLLAMA_BASE_URL.rstrip("/")]
+
+
+class OllamaNode:
+    def __init__(self, url: str, client: Any):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.latency: float | None = None
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+
+class OllamaPool:
+    instances: dict[str, "OllamaPool"] = {}
+
+    def __init__(
+        self,
+        name: str,
+        urls: list[str],
+        factory: Callable[[str], Any],
+        hedge_after: float = 0.0,
+    ):
+        self.name = name
+        self.nodes = [OllamaNode(url, factory(url)) for url in urls]
+        self.hedge_after = hedge_after
+        self.hedged = 0
+        self.hedge_wins = 0
+        # Sync embedding calls come from worker threads (Chroma, local index).
+        self._lock = threading.Lock()
+        # Re-initializing a service replaces its pool instead of adding one.
+        OllamaPool.instances[name] = self
+        logger.info(f"Ollama {name} pool: {', '.join(urls)}")
+
+    def acquire(
+        self, exclude: set[OllamaNode] = frozenset(), prefer: str = None
+    ) -> OllamaNode | None:
+        with self._lock:
+            candidates = [n for n in self.nodes if n not in exclude and n.available]
+            # Sticking to one node lets it reuse the prompt prefix it cached.
+            preferred = [n for n in candidates if n.url == prefer]
+            if preferred:
+                preferred[0].outstanding += 1
+                return preferred[0]
+            if not candidates:
+                if exclude:
+                    return None
+                # Every node is ejected: fail open to the one due back first
+                # rather than refusing the request outright.
+                candidates = [min(self.nodes, key=lambda n: n.ejected_until)]
+
+            # Least outstanding requests; latency breaks ties between idle nodes.
+            node = min(candidates, key=lambda n: (n.outstanding, n.latency or 0.0))
+            node.outstanding += 1
+            return node
+
+    def release(
+        self, node: OllamaNode, elapsed: float, error: BaseException | None
+    ) -> None:
+        with self._lock:
+            node.outstanding -= 1
+            node.requests += 1
+            if error is None:
+                node.consecutive_failures = 0
+                node.latency = (
+                    elapsed
+                    if node.latency is None
+                    else 0.8 * node.latency + 0.2 * elapsed
+                )
+            elif not isinstance(error, asyncio.CancelledError):
+                # Cancellation is the caller giving up, not the node failing.
+                node.errors += 1
+                node.consecutive_failures += 1
+                if node.consecutive_failures >= settings.OLLAMA_EJECT_FAILURES:
+                    self._eject(node, str(error))
+
+    def _eject(self, node: OllamaNode, reason: str) -> None:
+        if node.available:
+            logger.warning(
+                f"Ejecting Ollama {self.name} node {node.url} for "
+                f"{settings.OLLAMA_EJECT_SECONDS}s: {reason}"
+            )
+        node.ejected_until = time.monotonic() + settings.OLLAMA_EJECT_SECONDS
+
+    def _restore(self, node: OllamaNode) -> None:
+        if not node.available:
+            logger.info(f"Ollama {self.name} node {node.url} is healthy again")
+        node.ejected_until = 0.0
+        node.consecutive_failures = 0
+
+    async def _attempt(self, node: OllamaNode, fn: Callable[[Any], Awaitable]):
+        start = time.monotonic()
+        error = None
+        try:
+            return await fn(node.client)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.release(node, time.monotonic() - start, error)
+
+    async def call(
+        self,
+        fn: Callable[[Any], Awaitable],
+        hedge_after: float = None,
+        prefer: str = None,
+    ):
+        hedge_after = self.hedge_after if hedge_after is None else hedge_after
+        node = self.acquire(prefer=prefer)
+        primary = asyncio.ensure_future(self._attempt(node, fn))
+        if not hedge_after or len(self.nodes) < 2:
+            return await primary
+
+        backup = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            # The primary is in the slow tail: race it against another node
+            # and take whichever answers first.
+            backup_node = self.acquire(exclude={node})
+            if backup_node is None:
+                return await primary
+            self.hedged += 1
+            backup = asyncio.ensure_future(self._attempt(backup_node, fn))
+
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def call_sync(self, fn: Callable[[Any], Any]):
+        node = self.acquire()
+        start = time.monotonic()
+        error = None
+        try:
+            return fn(node.client)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.release(node, time.monotonic() - start, error)
+
+    async def broadcast(self, fn: Callable[[Any], Awaitable]) -> None:
+        await asyncio.gather(*(fn(node.client) for node in self.nodes))
+
+    async def check_health(self) -> None:
+        import httpx
+
+        async def check(client: httpx.AsyncClient, node: OllamaNode):
+            try:
+                response = await client.get(f"{node.url}/api/tags")
+                response.raise_for_status()
+                self._restore(node)
+            except Exception as e:
+                self._eject(node, f"health check failed: {e}")
+
+        async with httpx.AsyncClient(
+            timeout=settings.OLLAMA_HEALTH_CHECK_TIMEOUT
+        ) as client:
+            await asyncio.gather(*(check(client, node) for node in self.nodes))
+
+    def url_of(self, client: Any) -> str | None:
+        return next((node.url for node in self.nodes if node.client is client), None)
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "nodes": [
+                {
+                    "url": node.url,
+                    "available": node.available,
+                    "outstanding": node.outstanding,
+                    "requests": node.requests,
+                    "errors": node.errors,
+                    "latency_ms": (
+                        round(node.latency * 1000, 1)
+                        if node.latency is not None
+                        else None
+                    ),
+                }
+                for node in self.nodes
+            ],
+        }
+
+
+class PooledEmbeddings(Embeddings):
+    def __init__(self, pool: OllamaPool, backend: ResilientBackend):
+        self.pool = pool
+        self.backend = backend
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.backend.call_sync(
+            lambda: self.pool.call_sync(lambda client: client.embed_documents(texts))
+        )
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.backend.call_sync(
+            lambda: self.pool.call_sync(lambda client: client.embed_query(text))
+        )
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.backend.call(
+            lambda: self.pool.call(lambda client: client.aembed_documents(texts))
+        )
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.backend.call(
+            lambda: self.pool.call(lambda client: client.aembed_query(text))
+        )
+
+
+class PoolHealthChecker:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.OLLAMA_HEALTH_CHECK_INTERVAL)
+            # Pools are created lazily, so look them up on every round.
+            for pool in list(OllamaPool.instances.values()):
+                try:
+                    await pool.check_health()
+                except Exception as e:
+                    logger.warning(f"Ollama {pool.name} health check failed: {e}")
+
+    def start(self) -> None:
+        if settings.OLLAMA_HEALTH_CHECK_INTERVAL <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_status(self) -> dict[str, Any]:
+        return {name: pool.get_status() for name, pool in OllamaPool.instances.items()}
+
+
+pool_health_checker = PoolHealthChecker()
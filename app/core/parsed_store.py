@@ -0,0 +1,195 @@
+import asyncio
+import json
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class ParsedTextStore:
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.PARSED_STORE_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "file_hash TEXT PRIMARY KEY, source TEXT, strategy TEXT, "
+                "updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "file_hash TEXT NOT NULL, position INTEGER NOT NULL, "
+                "content BLOB NOT NULL, metadata TEXT NOT NULL, "
+                "PRIMARY KEY (file_hash, position))"
+            )
+            self._initialized = True
+        return connection
+
+    @staticmethod
+    def _rows(file_hash: str, documents: list[Document], start: int) -> list[tuple]:
+        # Parsed text compresses 3-5x; metadata stays readable for debugging.
+        return [
+            (
+                file_hash,
+                start + i,
+                zlib.compress(doc.page_content.encode("utf-8")),
+                json.dumps(doc.metadata, ensure_ascii=False, default=str),
+            )
+            for i, doc in enumerate(documents)
+        ]
+
+    def _put(
+        self,
+        file_hash: str,
+        documents: list[Document],
+        strategy: str | None,
+        append: bool,
+    ) -> None:
+        source = documents[0].metadata.get("source") if documents else None
+        with closing(self._connect()) as connection, connection:
+            if append:
+                start = connection.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM documents "
+                    "WHERE file_hash = ?",
+                    (file_hash,),
+                ).fetchone()[0]
+            else:
+                start = 0
+                connection.execute(
+                    "DELETE FROM documents WHERE file_hash = ?", (file_hash,)
+                )
+            connection.execute(
+                "INSERT OR REPLACE INTO files "
+                "(file_hash, source, strategy, updated_at) VALUES (?, ?, ?, ?)",
+                (file_hash, source, strategy, time.time()),
+            )
+            connection.executemany(
+                "INSERT INTO documents (file_hash, position, content, metadata) "
+                "VALUES (?, ?, ?, ?)",
+                self._rows(file_hash, documents, start),
+            )
+
+    def _get(self, file_hash: str) -> list[Document] | None:
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT content, metadata FROM documents "
+                "WHERE file_hash = ? ORDER BY position",
+                (file_hash,),
+            ).fetchall()
+        if not rows:
+            return None
+        return [
+            Document(
+                page_content=zlib.decompress(content).decode("utf-8"),
+                metadata=json.loads(metadata),
+            )
+            for content, metadata in rows
+        ]
+
+    def _list_files(self) -> list[dict]:
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT file_hash, source, strategy, updated_at FROM files "
+                "ORDER BY updated_at"
+            ).fetchall()
+        return [
+            {"file_hash": h, "source": s, "strategy": st, "updated_at": u}
+            for h, s, st, u in rows
+        ]
+
+    def _file_rows(self) -> list[tuple]:
+        # One row per file: its fields and every parsed document, as plain text.
+        with closing(self._connect()) as connection, connection:
+            files = connection.execute(
+                "SELECT file_hash, source, strategy, updated_at FROM files"
+            ).fetchall()
+            rows = []
+            for file_hash, source, strategy, updated_at in files:
+                documents = connection.execute(
+                    "SELECT content, metadata FROM documents "
+                    "WHERE file_hash = ? ORDER BY position",
+                    (file_hash,),
+                ).fetchall()
+                documents = [
+                    (zlib.decompress(content).decode("utf-8"), metadata)
+                    for content, metadata in documents
+                ]
+                rows.append((file_hash, source, strategy, updated_at, documents))
+        return rows
+
+    def _restore(self, rows: list[tuple]) -> None:
+        with closing(self._connect()) as connection, connection:
+            for file_hash, source, strategy, updated_at, documents in rows:
+                connection.execute(
+                    "DELETE FROM documents WHERE file_hash = ?", (file_hash,)
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO files "
+                    "(file_hash, source, strategy, updated_at) VALUES (?, ?, ?, ?)",
+                    (file_hash, source, strategy, updated_at),
+                )
+                connection.executemany(
+                    "INSERT INTO documents (file_hash, position, content, metadata) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (file_hash, i, zlib.compress(content.encode("utf-8")), metadata)
+                        for i, (content, metadata) in enumerate(documents)
+                    ],
+                )
+
+    def _clear(self) -> None:
+        with closing(self._connect()) as connection, connection:
+            for table in ("documents", "files"):
+                connection.execute(f"DELETE FROM {table}")
+
+    def _delete(self, file_hash: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            for table in ("documents", "files"):
+                connection.execute(
+                    f"DELETE FROM {table} WHERE file_hash = ?", (file_hash,)
+                )
+
+    async def put(
+        self, file_hash: str, documents: list[Document], strategy: str | None = None
+    ) -> None:
+        await asyncio.to_thread(self._put, file_hash, documents, strategy, False)
+        logger.info(f"Stored {len(documents)} parsed documents for {file_hash[:12]}")
+
+    async def append(
+        self, file_hash: str, documents: list[Document], strategy: str | None = None
+    ) -> None:
+        await asyncio.to_thread(self._put, file_hash, documents, strategy, True)
+
+    async def get(self, file_hash: str) -> list[Document] | None:
+        return await asyncio.to_thread(self._get, file_hash)
+
+    async def list_files(self) -> list[dict]:
+        return await asyncio.to_thread(self._list_files)
+
+    async def delete(self, file_hash: str) -> None:
+        await asyncio.to_thread(self._delete, file_hash)
+
+    async def export_rows(self) -> list[tuple]:
+        return await asyncio.to_thread(self._file_rows)
+
+    async def restore(self, rows: list[tuple]) -> None:
+        await asyncio.to_thread(self._restore, rows)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+        logger.warning("Parsed texts cleared")
+
+
+parsed_store = ParsedTextStore()
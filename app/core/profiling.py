@@ -0,0 +1,307 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Any, Literal
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Leaf frames of threads that are waiting rather than working: an idle event
+# loop, thread pool workers with nothing queued, sleeping background threads.
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("connection.py", "_recv"),  # loguru's enqueue=True writer thread
+}
+
+Frame = tuple[str, str]  # (function, file)
+ProfileFormat = Literal["collapsed", "speedscope"]
+
+
+def _short_path(filename: str) -> str:
+    path = Path(filename)
+    try:
+        return str(path.relative_to(Path.cwd()))
+    except ValueError:
+        parts = path.parts
+        for marker in ("site-packages", "dist-packages"):
+            if marker in parts:
+                return "/".join(parts[parts.index(marker) + 1 :])
+        return "/".join(parts[-2:])
+
+
+def _walk(frame: FrameType) -> tuple[Frame, ...]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_qualname, _short_path(code.co_filename)))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+class Profile:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter[tuple[str, tuple[Frame, ...]]] = Counter()
+        self.samples = 0
+        self.duration = 0.0
+
+    def merge(self, other: "Profile") -> None:
+        self.stacks.update(other.stacks)
+        self.samples += other.samples
+        self.duration += other.duration
+
+    def to_collapsed(self) -> str:
+        # One "thread;outer;...;leaf count" line per stack: the input format of
+        # flamegraph.pl, inferno and speedscope.
+        lines = []
+        for (thread, stack), count in self.stacks.most_common():
+            frames = [thread, *(f"{name} ({path})" for name, path in stack)]
+            lines.append(";".join(frame.replace(";", ":") for frame in frames))
+            lines[-1] += f" {count}"
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str) -> dict[str, Any]:
+        frames: dict[Frame, int] = {}
+        profiles: dict[str, dict[str, Any]] = {}
+        for (thread, stack), count in self.stacks.items():
+            profile = profiles.setdefault(
+                thread,
+                {
+                    "type": "sampled",
+                    "name": thread,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": 0,
+                    "samples": [],
+                    "weights": [],
+                },
+            )
+            profile["samples"].append(
+                [frames.setdefault(frame, len(frames)) for frame in stack]
+            )
+            profile["weights"].append(count * self.interval)
+            profile["endValue"] += count * self.interval
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "langchain-document-service",
+            "shared": {
+                "frames": [{"name": name, "file": path} for name, path in frames]
+            },
+            "profiles": list(profiles.values()),
+        }
+
+
+class StackSampler:
+    # Samples the Python stacks of every thread from a background thread, so
+    # the event loop is profiled without being instrumented or paused.
+    def __init__(self, interval: float = None, idle: bool = False):
+        self.profile = Profile(interval or settings.PROFILE_SAMPLE_INTERVAL)
+        self.idle = idle
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_at = 0.0
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        self._thread.join()
+        self.profile.duration += time.monotonic() - self._started_at
+        return self.profile
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _walk(frame)
+                if not self.idle and (
+                    (Path(stack[-1][1]).name, stack[-1][0].rsplit(".", 1)[-1])
+                    in IDLE_FRAMES
+                ):
+                    continue
+                self.profile.stacks[(names.get(ident, str(ident)), stack)] += 1
+            self.profile.samples += 1
+            if self._stop.wait(self.profile.interval):
+                break
+
+
+async def profile_process(seconds: float, idle: bool = False) -> Profile:
+    sampler = StackSampler(idle=idle)
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile = sampler.stop()
+    logger.info(f"Profiled the process for {seconds}s: {profile.samples} samples")
+    return profile
+
+
+class RequestProfiler:
+    # Samples the process while the next N requests to one path are in
+    # flight. Other requests running at the same time land in the same
+    # profile, so it is clearest when the worker is not under full load.
+    def __init__(self):
+        self.path = None
+        self.remaining = 0
+        self.profiled = 0
+        self.profile = None
+        self._idle = False
+        self._sampler = None
+        self._in_flight = 0
+
+    def arm(self, path: str, count: int, idle: bool = False) -> dict[str, Any]:
+        if self.remaining:
+            raise RuntimeError(f"Already profiling requests to {self.path}")
+        self.path = path.rstrip("/") or "/"
+        self.remaining = count
+        self.profiled = 0
+        self.profile = Profile(settings.PROFILE_SAMPLE_INTERVAL)
+        self._idle = idle
+        logger.info(f"Profiling the next {count} requests to {self.path}")
+        return self.get_status()
+
+    def cancel(self) -> None:
+        self.remaining = 0
+
+    def matches(self, path: str) -> bool:
+        return self.remaining > 0 and (path.rstrip("/") or "/") == self.path
+
+    @asynccontextmanager
+    async def track(self):
+        self.remaining -= 1
+        if self._in_flight == 0:
+            self._sampler = StackSampler(idle=self._idle)
+            self._sampler.start()
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self.profiled += 1
+            if self._in_flight == 0:
+                self.profile.merge(self._sampler.stop())
+                self._sampler = None
+            if not self.remaining and not self._in_flight:
+                logger.info(f"Profiled {self.profiled} requests to {self.path}")
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "remaining": self.remaining,
+            "in_flight": self._in_flight,
+            "profiled": self.profiled,
+            "samples": self.profile.samples if self.profile else 0,
+            "done": self.profile is not None
+            and not self.remaining
+            and not self._in_flight,
+        }
+
+
+class LoopLagMonitor:
+    # A heartbeat task measures how late the event loop wakes it up; a
+    # watchdog thread notices when the heartbeat stalls past the threshold
+    # and captures the loop thread's stack while it is still blocked.
+    def __init__(self):
+        self.stalls = deque(maxlen=settings.LOOP_LAG_HISTORY)
+        self.max_lag = 0.0
+        self.blocked = 0
+        self._beat = 0.0
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if not settings.LOOP_LAG_MONITOR_ENABLED or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-monitor", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._stop.set()
+        await asyncio.to_thread(self._thread.join)
+        self._task = None
+        self._thread = None
+
+    async def _heartbeat(self) -> None:
+        interval = settings.LOOP_LAG_CHECK_INTERVAL
+        while True:
+            beat = time.monotonic()
+            self._beat = beat
+            await asyncio.sleep(interval)
+            lag = time.monotonic() - beat - interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= settings.LOOP_LAG_THRESHOLD:
+                self.blocked += 1
+                if self.stalls and self.stalls[-1]["beat"] == beat:
+                    self.stalls[-1]["lag"] = round(lag, 3)
+
+    def _watch(self) -> None:
+        threshold = settings.LOOP_LAG_THRESHOLD
+        interval = settings.LOOP_LAG_CHECK_INTERVAL
+        reported = None
+        while not self._stop.wait(threshold / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - interval
+            if stalled < threshold or beat == reported:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            reported = beat
+            stack = "".join(traceback.format_stack(frame))
+            self.stalls.append(
+                {
+                    "beat": beat,
+                    "at": time.time(),
+                    "lag": round(stalled, 3),
+                    "stack": stack,
+                }
+            )
+            logger.warning(
+                f"Event loop blocked for over {stalled:.3f}s, currently in:\n{stack}"
+            )
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "threshold": settings.LOOP_LAG_THRESHOLD,
+            "max_lag": round(self.max_lag, 3),
+            "blocked": self.blocked,
+            "stalls": [
+                {key: value for key, value in stall.items() if key != "beat"}
+                for stall in self.stalls
+            ],
+        }
+
+
+request_profiler = RequestProfiler()
+loop_lag_monitor = LoopLagMonitor()
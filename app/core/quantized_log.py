@@ -0,0 +1,67 @@
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+from app.core.config import settings
+
+
+class QuantizedChangeLog:
+    # Every worker keeps its own quantized index in memory. Writes are logged
+    # here so the other workers can replay them before their next search.
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.QUANTIZATION_LOG_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT NOT NULL, "
+                "op TEXT NOT NULL, ids TEXT NOT NULL)"
+            )
+            self._initialized = True
+        return connection
+
+    def append(self, collection: str, op: str, ids: list[str]) -> None:
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                "INSERT INTO changes (collection, op, ids) VALUES (?, ?, ?)",
+                (collection, op, json.dumps(ids)),
+            )
+            connection.execute(
+                "DELETE FROM changes WHERE seq <= ?",
+                (cursor.lastrowid - settings.QUANTIZATION_LOG_SIZE,),
+            )
+
+    def latest(self) -> int:
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM changes"
+            ).fetchone()[0]
+
+    def since(
+        self, collection: str, seq: int
+    ) -> tuple[int, list[tuple[str, list[str]]]] | None:
+        # None means entries after seq were already pruned.
+        with closing(self._connect()) as connection, connection:
+            oldest, latest = connection.execute(
+                "SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM changes"
+            ).fetchone()
+            if latest <= seq:
+                return latest, []
+            if oldest > seq + 1:
+                return None
+            rows = connection.execute(
+                "SELECT op, ids FROM changes "
+                "WHERE collection = ? AND seq > ? AND seq <= ? ORDER BY seq",
+                (collection, seq, latest),
+            ).fetchall()
+        return latest, [(op, json.loads(ids)) for op, ids in rows]
+
+
+quantized_log = QuantizedChangeLog()
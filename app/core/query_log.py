@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.casefold().split()).rstrip("?!. ")
+
+
+def query_key(question: str, params: dict[str, Any]) -> str:
+    data = json.dumps(
+        [normalize_question(question), params], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class QueryLog:
+    # One row per normalized question and parameter set, plus the answers
+    # precomputed for the most frequent ones. SQLite, so every worker serves
+    # the same answers and sees the same invalidations.
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.QUERY_LOG_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS queries ("
+                "key TEXT PRIMARY KEY, question TEXT NOT NULL, params TEXT NOT NULL, "
+                "count INTEGER NOT NULL, total_latency REAL NOT NULL, "
+                "last_latency REAL NOT NULL, sources TEXT NOT NULL, "
+                "last_asked REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, result TEXT, vector BLOB, chunk_ids TEXT, "
+                "collection TEXT, stale INTEGER NOT NULL DEFAULT 1, "
+                "computed_at REAL, claimed_until REAL NOT NULL DEFAULT 0)"
+            )
+            self._initialized = True
+        return connection
+
+    def _record(
+        self,
+        question: str,
+        params: dict[str, Any],
+        latency: float,
+        sources: list[str],
+    ) -> None:
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO queries (key, question, params, count, total_latency, "
+                "last_latency, sources, last_asked) VALUES (?, ?, ?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET question = excluded.question, "
+                "count = count + 1, "
+                "total_latency = total_latency + excluded.total_latency, "
+                "last_latency = excluded.last_latency, sources = excluded.sources, "
+                "last_asked = excluded.last_asked",
+                (
+                    query_key(question, params),
+                    question,
+                    json.dumps(params, sort_keys=True),
+                    latency,
+                    latency,
+                    json.dumps(sources, ensure_ascii=False),
+                    now,
+                ),
+            )
+            # Rare questions go first, then the ones not asked for longest.
+            connection.execute(
+                "DELETE FROM queries WHERE last_asked <= ? OR key NOT IN ("
+                "SELECT key FROM queries ORDER BY count DESC, last_asked DESC "
+                "LIMIT ?)",
+                (now - settings.QUERY_LOG_WINDOW, settings.QUERY_LOG_MAX_ENTRIES),
+            )
+
+    def _top(
+        self, limit: int, min_count: int, collection: str | None
+    ) -> list[dict[str, Any]]:
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT q.key, q.question, q.params, q.count, q.total_latency, "
+                "q.last_latency, q.sources, q.last_asked, "
+                "a.stale = 0 AND a.collection IS ?, a.computed_at "
+                "FROM queries q LEFT JOIN answers a ON a.key = q.key "
+                "WHERE q.count >= ? AND q.last_asked > ? "
+                "ORDER BY q.count DESC, q.last_asked DESC LIMIT ?",
+                (
+                    collection,
+                    min_count,
+                    time.time() - settings.QUERY_LOG_WINDOW,
+                    limit,
+                ),
+            ).fetchall()
+        return [
+            {
+                "key": key,
+                "question": question,
+                "params": json.loads(params),
+                "count": count,
+                "avg_latency": round(total_latency / count, 3),
+                "last_latency": round(last_latency, 3),
+                "sources": json.loads(sources),
+                "last_asked": last_asked,
+                "precomputed": bool(fresh),
+                "computed_at": computed_at,
+            }
+            for (
+                key,
+                question,
+                params,
+                count,
+                total_latency,
+                last_latency,
+                sources,
+                last_asked,
+                fresh,
+                computed_at,
+            ) in rows
+        ]
+
+    def _get_answer(self, key: str, collection: str) -> dict[str, Any] | None:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT result FROM answers "
+                "WHERE key = ? AND stale = 0 AND collection = ?",
+                (key, collection),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _claim(self, key: str, seconds: float) -> bool:
+        # Only one worker precomputes a given answer at a time.
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute("INSERT OR IGNORE INTO answers (key) VALUES (?)", (key,))
+            cursor = connection.execute(
+                "UPDATE answers SET claimed_until = ? "
+                "WHERE key = ? AND claimed_until < ?",
+                (now + seconds, key, now),
+            )
+        return cursor.rowcount > 0
+
+    def _put_answer(
+        self,
+        key: str,
+        result: dict[str, Any],
+        vector: list[float],
+        chunk_ids: list[str],
+        collection: str,
+    ) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE answers SET result = ?, vector = ?, chunk_ids = ?, "
+                "collection = ?, stale = 0, computed_at = ?, claimed_until = 0 "
+                "WHERE key = ?",
+                (
+                    json.dumps(result, ensure_ascii=False, default=str),
+                    np.asarray(vector, dtype=np.float32).tobytes(),
+                    json.dumps(chunk_ids),
+                    collection,
+                    time.time(),
+                    key,
+                ),
+            )
+
+    def _release(self, key: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE answers SET claimed_until = 0 WHERE key = ?", (key,)
+            )
+
+    def _fresh_answers(self, collection: str) -> list[dict[str, Any]]:
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT a.key, q.params, a.vector, a.chunk_ids FROM answers a "
+                "JOIN queries q ON q.key = a.key "
+                "WHERE a.stale = 0 AND a.collection = ?",
+                (collection,),
+            ).fetchall()
+        return [
+            {
+                "key": key,
+                "params": json.loads(params),
+                "vector": np.frombuffer(vector, dtype=np.float32).tolist(),
+                "chunk_ids": json.loads(chunk_ids),
+            }
+            for key, params, vector, chunk_ids in rows
+        ]
+
+    def _invalidate(self, keys: list[str]) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "UPDATE answers SET stale = 1 WHERE key = ?", [(key,) for key in keys]
+            )
+
+    def _invalidate_all(self) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute("UPDATE answers SET stale = 1")
+
+    def _retain(self, keys: list[str]) -> int:
+        # Answers for questions that fell out of the top are dropped.
+        placeholders = ",".join("?" * len(keys))
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                f"DELETE FROM answers WHERE key NOT IN ({placeholders})", keys
+            )
+        return cursor.rowcount
+
+    async def record(
+        self,
+        question: str,
+        params: dict[str, Any],
+        latency: float,
+        sources: list[str],
+    ) -> None:
+        await asyncio.to_thread(self._record, question, params, latency, sources)
+
+    async def top(
+        self, limit: int, min_count: int = 1, collection: str | None = None
+    ) -> list[dict[str, Any]]:
+        return await asyncio.to_thread(self._top, limit, min_count, collection)
+
+    async def get_answer(
+        self, question: str, params: dict[str, Any], collection: str
+    ) -> dict[str, Any] | None:
+        return await asyncio.to_thread(
+            self._get_answer, query_key(question, params), collection
+        )
+
+    async def claim(self, key: str, seconds: float) -> bool:
+        return await asyncio.to_thread(self._claim, key, seconds)
+
+    async def put_answer(
+        self,
+        key: str,
+        result: dict[str, Any],
+        vector: list[float],
+        chunk_ids: list[str],
+        collection: str,
+    ) -> None:
+        await asyncio.to_thread(
+            self._put_answer, key, result, vector, chunk_ids, collection
+        )
+
+    async def release(self, key: str) -> None:
+        await asyncio.to_thread(self._release, key)
+
+    async def fresh_answers(self, collection: str) -> list[dict[str, Any]]:
+        return await asyncio.to_thread(self._fresh_answers, collection)
+
+    async def invalidate(self, keys: list[str]) -> None:
+        if keys:
+            await asyncio.to_thread(self._invalidate, keys)
+
+    async def invalidate_all(self) -> None:
+        await asyncio.to_thread(self._invalidate_all)
+
+    async def retain(self, keys: list[str]) -> int:
+        return await asyncio.to_thread(self._retain, keys)
+
+
+query_log = QueryLog()
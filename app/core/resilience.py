@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.logger import logger
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self, name: str, failure_threshold: int = None, reset_timeout: float = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.BREAKER_RESET_TIMEOUT
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info(f"Circuit {self.name} half-open, probing")
+
+            # Half-open lets a single probe through; everyone else fails fast
+            # until it tells us whether the backend has recovered.
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+
+            self.rejected += 1
+            raise CircuitOpenError(self.name, max(self.reset_timeout - elapsed, 1.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"Circuit {self.name} opened after {self.failures} "
+                        f"failures: {error}"
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        # The probe was cancelled by its caller and proved nothing either way.
+        with self._lock:
+            self._probing = False
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    # Token bucket: every request earns `ratio` of a retry, so retries stay a
+    # bounded fraction of traffic instead of multiplying load during outages.
+    def __init__(self, ratio: float = None, burst: float = None):
+        self.ratio = settings.RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.max_tokens = settings.RETRY_BUDGET_BURST if burst is None else burst
+        self.tokens = self.max_tokens
+        self.retries = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                self.exhausted += 1
+                return False
+            self.tokens -= 1
+            self.retries += 1
+            return True
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "tokens": round(self.tokens, 2),
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+class ResilientBackend:
+    def __init__(self, name: str, retries: int = None):
+        self.name = name
+        self.retries = settings.RETRY_MAX_ATTEMPTS - 1 if retries is None else retries
+        self.breaker = CircuitBreaker(name)
+        self.budget = RetryBudget()
+
+    @staticmethod
+    def _is_failure(error: BaseException) -> bool:
+        # The caller running out of time or giving up says nothing about the
+        # backend's health.
+        return not isinstance(
+            error, (asyncio.CancelledError, DeadlineExceeded, CircuitOpenError)
+        )
+
+    async def call(self, fn: Callable[[], Awaitable]):
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                result = await fn()
+            except BaseException as e:
+                if not self._is_failure(e):
+                    if probe:
+                        self.breaker.release_probe()
+                    raise
+                self.breaker.record_failure(e)
+                if attempt >= self.retries or not self.budget.withdraw():
+                    raise
+                attempt += 1
+                logger.warning(f"{self.name} call failed, retry {attempt}: {e}")
+                await asyncio.sleep(settings.RETRY_BACKOFF * 2 ** (attempt - 1))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def call_sync(self, fn: Callable[[], Any]):
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = fn()
+            except Exception as e:
+                self.breaker.record_failure(e)
+                if attempt >= self.retries or not self.budget.withdraw():
+                    raise
+                attempt += 1
+                logger.warning(f"{self.name} call failed, retry {attempt}: {e}")
+                time.sleep(settings.RETRY_BACKOFF * 2 ** (attempt - 1))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def get_status(self) -> dict[str, Any]:
+        return {**self.breaker.get_status(), "retry_budget": self.budget.get_status()}
+
+
+backends = {
+    name: ResilientBackend(name) for name in ("generation", "embedding", "vectorstore")
+}
+
+
+def get_status() -> dict[str, Any]:
+    return {name: backend.get_status() for name, backend in backends.items()}
+
+
+def is_degraded() -> bool:
+    return any(
+        backend.breaker.state != CircuitBreaker.CLOSED for backend in backends.values()
+    )
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+
+class SessionStore:
+    # Bounded by age (SESSION_TTL) and count (SESSION_MAX_COUNT); the least
+    # recently used sessions go first. SQLite, so every worker sees a session.
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.SESSION_STORE_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated_at "
+                "ON sessions (updated_at)"
+            )
+            self._initialized = True
+        return connection
+
+    def _get(self, session_id: str) -> dict[str, Any] | None:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT state FROM sessions WHERE session_id = ? AND updated_at > ?",
+                (session_id, time.time() - settings.SESSION_TTL),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, session_id: str, state: dict[str, Any]) -> None:
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, state, updated_at) "
+                "VALUES (?, ?, ?)",
+                (session_id, json.dumps(state, ensure_ascii=False), now),
+            )
+            connection.execute(
+                "DELETE FROM sessions WHERE updated_at <= ?",
+                (now - settings.SESSION_TTL,),
+            )
+            connection.execute(
+                "DELETE FROM sessions WHERE session_id NOT IN ("
+                "SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+                (settings.SESSION_MAX_COUNT,),
+            )
+
+    def _delete(self, session_id: str) -> bool:
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+        return cursor.rowcount > 0
+
+    async def get(self, session_id: str) -> dict[str, Any] | None:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def put(self, session_id: str, state: dict[str, Any]) -> None:
+        await asyncio.to_thread(self._put, session_id, state)
+
+    async def delete(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self._delete, session_id)
+
+
+session_store = SessionStore()
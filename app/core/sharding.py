@@ -0,0 +1,385 @@
+import asyncio
+import bisect
+import hashlib
+import uuid
+from collections import Counter
+from typing import Any, Iterator
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+def shard_addresses(
+    hosts: str = None, per_host: int = None, name: str = None
+) -> list[tuple[str, int, str]]:
+    hosts = settings.CHROMA_SHARD_HOSTS if hosts is None else hosts
+    per_host = per_host or settings.CHROMA_COLLECTIONS_PER_HOST
+    name = name or settings.COLLECTION_NAME
+    addresses = [host.strip() for host in hosts.split(",") if host.strip()] or [
+        f"{settings.CHROMA_HOST}:{settings.CHROMA_PORT}"
+    ]
+
+    shards = []
+    for address in addresses:
+        host, port = parse_address(address)
+        for i in range(per_host):
+            # The first collection keeps the unsharded name, so turning
+            # sharding on leaves existing data where it already is.
+            shards.append((host, port, name if i == 0 else f"{name}_{i}"))
+    return shards
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.partition(":")
+    return host, int(port or settings.CHROMA_PORT)
+
+
+def parse_shard(spec: str) -> tuple[str, int, str]:
+    # "host:port/collection", as shown in /db/stats.
+    address, _, collection = spec.partition("/")
+    if not collection:
+        raise ValueError(f"Shard must look like host:port/collection: {spec}")
+    return (*parse_address(address), collection)
+
+
+def connect_client(host: str, port: int) -> Any:
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.HttpClient(
+        host=host,
+        port=port,
+        settings=Settings(anonymized_telemetry=False, allow_reset=True),
+    )
+    client.heartbeat()
+    return client
+
+
+def read_embedding_model(host: str, port: int, collection_name: str) -> str | None:
+    from chromadb.errors import NotFoundError
+
+    try:
+        collection = connect_client(host, port).get_collection(collection_name)
+    except NotFoundError:
+        return None
+    return (collection.metadata or {}).get("embedding_model")
+
+
+def chroma_results(found: dict) -> list[list[tuple[Document, float]]]:
+    return [
+        [
+            (Document(id=id_, page_content=text, metadata=metadata or {}), distance)
+            for id_, text, metadata, distance in zip(ids, texts, metadatas, distances)
+        ]
+        for ids, texts, metadatas, distances in zip(
+            found["ids"], found["documents"], found["metadatas"], found["distances"]
+        )
+    ]
+
+
+class HashRing:
+    def __init__(self, nodes: list[str], replicas: int = None):
+        replicas = replicas or settings.SHARD_VIRTUAL_NODES
+        # Virtual nodes spread each shard around the ring, so adding a shard
+        # takes an even slice from every existing one.
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._positions = [position for position, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._positions, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ChromaShard:
+    def __init__(
+        self,
+        client: Any,
+        host: str,
+        port: int,
+        collection_name: str,
+        embeddings: Embeddings,
+    ):
+        from langchain_chroma import Chroma
+
+        self.name = f"{host}:{port}/{collection_name}"
+        self.client = client
+        self.collection_name = collection_name
+        self.vectorstore = Chroma(
+            client=client,
+            collection_name=collection_name,
+            embedding_function=embeddings,
+        )
+        self.collection = client.get_collection(collection_name)
+        self.queries = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "count": self.collection.count(),
+            "queries": self.queries,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+        }
+
+
+class ShardSet:
+    def __init__(self, shards: list):
+        self.shards = shards
+        self.by_name = {shard.name: shard for shard in shards}
+        self.ring = HashRing(list(self.by_name))
+        self.partial_results = 0
+
+    @classmethod
+    def connect(
+        cls, addresses: list[tuple[str, int, str]], embeddings: Embeddings
+    ) -> "ShardSet":
+        clients = {}
+        shards = []
+        for host, port, collection_name in addresses:
+            if (host, port) not in clients:
+                client = connect_client(host, port)
+                logger.info(f"Successfully connected to ChromaDB at {host}:{port}")
+                clients[(host, port)] = client
+            client = clients[(host, port)]
+            shards.append(ChromaShard(client, host, port, collection_name, embeddings))
+        return cls(shards)
+
+    @staticmethod
+    def shard_key(id_: str, metadata: dict | None) -> str:
+        # Chunks of one file share a doc_id and therefore land on one shard.
+        return (metadata or {}).get("doc_id") or id_
+
+    def shard_for(self, key: str):
+        return self.by_name[self.ring.node_for(key)]
+
+    async def add_texts(
+        self, texts: list[str], metadatas: list[dict] | None = None
+    ) -> list[str]:
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [str(uuid.uuid4()) for _ in texts]
+
+        groups: dict[Any, list[int]] = {}
+        for i, (id_, metadata) in enumerate(zip(ids, metadatas)):
+            shard = self.shard_for(self.shard_key(id_, metadata))
+            groups.setdefault(shard, []).append(i)
+
+        await asyncio.gather(
+            *(
+                shard.vectorstore.aadd_texts(
+                    texts=[texts[i] for i in indices],
+                    metadatas=[metadatas[i] for i in indices],
+                    ids=[ids[i] for i in indices],
+                )
+                for shard, indices in groups.items()
+            )
+        )
+        return ids
+
+    def add_embeddings(
+        self,
+        ids: list[str],
+        embeddings: list[list[float]],
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> None:
+        groups: dict[Any, list[int]] = {}
+        for i, (id_, metadata) in enumerate(zip(ids, metadatas)):
+            shard = self.shard_for(self.shard_key(id_, metadata))
+            groups.setdefault(shard, []).append(i)
+
+        for shard, indices in groups.items():
+            shard.collection.upsert(
+                ids=[ids[i] for i in indices],
+                embeddings=[embeddings[i] for i in indices],
+                documents=[documents[i] for i in indices],
+                # Chroma rejects empty metadata dicts.
+                metadatas=[metadatas[i] or None for i in indices],
+            )
+
+    def iter_batches(
+        self, batch_size: int = 1000
+    ) -> Iterator[tuple[list[str], list, list[str], list[dict]]]:
+        for shard in self.shards:
+            offset = 0
+            while True:
+                batch = shard.collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=batch_size,
+                    offset=offset,
+                )
+                if not batch["ids"]:
+                    break
+                yield (
+                    batch["ids"],
+                    batch["embeddings"],
+                    batch["documents"],
+                    [metadata or {} for metadata in batch["metadatas"]],
+                )
+                offset += len(batch["ids"])
+
+    async def query(
+        self, vectors: list[list[float]], k: int, where: dict | None = None
+    ) -> list[list[tuple[Document, float]]]:
+        answers = await asyncio.gather(
+            *(self._query_shard(shard, vectors, k, where) for shard in self.shards)
+        )
+        answered = [answer for answer in answers if answer is not None]
+        if not answered:
+            raise RuntimeError(f"None of {len(self.shards)} shards answered")
+        if len(answered) < len(self.shards):
+            if not settings.SHARD_ALLOW_PARTIAL:
+                raise RuntimeError(
+                    f"{len(self.shards) - len(answered)} of {len(self.shards)} "
+                    "shards did not answer"
+                )
+            self.partial_results += 1
+
+        # Every shard returned its own top k; the global top k is among them.
+        merged = []
+        for per_vector in zip(*answered):
+            hits = [hit for shard_hits in per_vector for hit in shard_hits]
+            hits.sort(key=lambda hit: hit[1])
+            merged.append(hits[:k])
+        return merged
+
+    async def _query_shard(
+        self, shard, vectors: list[list[float]], k: int, where: dict | None
+    ) -> list[list[tuple[Document, float]]] | None:
+        try:
+            found = await asyncio.wait_for(
+                asyncio.to_thread(
+                    shard.collection.query,
+                    query_embeddings=vectors,
+                    n_results=k,
+                    where=where,
+                    include=["documents", "metadatas", "distances"],
+                ),
+                settings.SHARD_TIMEOUT or None,
+            )
+        except asyncio.TimeoutError:
+            shard.timeouts += 1
+            logger.warning(f"Shard {shard.name} timed out")
+            return None
+        except Exception as e:
+            shard.failures += 1
+            logger.warning(f"Shard {shard.name} failed: {e}")
+            return None
+
+        shard.queries += 1
+        return chroma_results(found)
+
+    def rebalance(
+        self, drain: list = (), batch_size: int = 500, dry_run: bool = False
+    ) -> dict[str, int]:
+        # Moves stored vectors, embeddings included, to the shard the ring now
+        # assigns them to. Drained shards are emptied completely.
+        moved = Counter()
+        for source in [*self.shards, *drain]:
+            offset = 0
+            while True:
+                batch = source.collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=batch_size,
+                    offset=offset,
+                )
+                if not batch["ids"]:
+                    break
+
+                moves: dict[Any, list[int]] = {}
+                for i, (id_, metadata) in enumerate(
+                    zip(batch["ids"], batch["metadatas"])
+                ):
+                    target = self.shard_for(self.shard_key(id_, metadata))
+                    if target is not source:
+                        moves.setdefault(target, []).append(i)
+
+                for target, indices in moves.items():
+                    moved[f"{source.name} -> {target.name}"] += len(indices)
+                    if dry_run:
+                        continue
+                    target.collection.upsert(
+                        ids=[batch["ids"][i] for i in indices],
+                        embeddings=[batch["embeddings"][i] for i in indices],
+                        documents=[batch["documents"][i] for i in indices],
+                        metadatas=[batch["metadatas"][i] for i in indices],
+                    )
+
+                if dry_run:
+                    offset += len(batch["ids"])
+                    continue
+                if moves:
+                    source.collection.delete(
+                        ids=[batch["ids"][i] for ids in moves.values() for i in ids]
+                    )
+                # Deleted rows shift the rest down; step past the kept ones only.
+                offset += len(batch["ids"]) - sum(map(len, moves.values()))
+
+            logger.info(f"Rebalanced shard {source.name}")
+        return dict(moved)
+
+    def count(self) -> int:
+        return sum(shard.collection.count() for shard in self.shards)
+
+    def ids(self, batch_size: int = 10000) -> set[str]:
+        ids = set()
+        for shard in self.shards:
+            offset = 0
+            while batch := shard.collection.get(
+                include=[], limit=batch_size, offset=offset
+            )["ids"]:
+                ids.update(batch)
+                offset += len(batch)
+        return ids
+
+    def get_by_ids(self, ids: list[str]) -> list[Document]:
+        documents = []
+        for shard in self.shards:
+            found = shard.collection.get(ids=ids, include=["documents", "metadatas"])
+            documents.extend(
+                Document(id=id_, page_content=text, metadata=metadata or {})
+                for id_, text, metadata in zip(
+                    found["ids"], found["documents"], found["metadatas"]
+                )
+            )
+        return documents
+
+    def delete_ids(self, ids: list[str]) -> None:
+        for shard in self.shards:
+            shard.collection.delete(ids=ids)
+
+    def recorded_embedding_model(self) -> str | None:
+        return (self.shards[0].collection.metadata or {}).get("embedding_model")
+
+    def record_embedding_model(self, model: str) -> None:
+        for shard in self.shards:
+            metadata = shard.collection.metadata or {}
+            if metadata.get("embedding_model"):
+                continue
+            # hnsw:* settings are fixed at creation and cannot be modified.
+            metadata = {k: v for k, v in metadata.items() if not k.startswith("hnsw:")}
+            shard.collection.modify(metadata={**metadata, "embedding_model": model})
+
+    def delete_where(self, where: dict) -> None:
+        for shard in self.shards:
+            shard.collection.delete(where=where)
+
+    def delete(self) -> None:
+        for shard in self.shards:
+            shard.client.delete_collection(shard.collection_name)
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "partial_results": self.partial_results,
+            "shards": [shard.get_status() for shard in self.shards],
+        }
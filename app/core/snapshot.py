@@ -0,0 +1,164 @@
+import hashlib
+import io
+import json
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+from app.core.logger import logger
+
+MANIFEST_FILE = "manifest.json"
+REGISTRY_FILE = "registry.jsonl"
+PARENTS_FILE = "parents.jsonl"
+PARSED_FILE = "parsed.jsonl"
+# Version 1 snapshots have no parent documents or parsed texts.
+FORMAT_VERSION = 2
+
+# ids, embeddings, documents, metadatas
+Batch = tuple[list[str], np.ndarray, list[str], list[dict]]
+
+
+def _pack(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    # Variable-length UTF-8 with an offsets column, as Arrow lays out strings;
+    # fixed-width numpy unicode would pad every text to the longest one.
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack(data: np.ndarray, offsets: np.ndarray) -> list[str]:
+    raw = data.tobytes()
+    return [
+        raw[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_rows(directory: Path, name: str, rows: Iterable) -> dict[str, Any]:
+    lines = [json.dumps(row, ensure_ascii=False) + "\n" for row in rows]
+    data = "".join(lines).encode("utf-8")
+    (directory / name).write_bytes(data)
+    return {"file": name, "count": len(lines), "sha256": _sha256(data)}
+
+
+def write_snapshot(
+    directory: str | Path,
+    batches: Iterable[Batch],
+    registry_rows: list[tuple[str, str, float]],
+    info: dict[str, Any],
+    parent_rows: Iterable[tuple] = (),
+    parsed_files: Iterable[tuple] = (),
+) -> dict[str, Any]:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    if (directory / MANIFEST_FILE).exists():
+        raise ValueError(f"Snapshot already exists: {directory}")
+
+    files = []
+    dimension = None
+    for index, (ids, embeddings, documents, metadatas) in enumerate(batches):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        dimension = embeddings.shape[1]
+        ids_data, ids_offsets = _pack(ids)
+        documents_data, documents_offsets = _pack(documents)
+        metadatas_data, metadatas_offsets = _pack(
+            [json.dumps(metadata, ensure_ascii=False) for metadata in metadatas]
+        )
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            embeddings=embeddings,
+            ids=ids_data,
+            ids_offsets=ids_offsets,
+            documents=documents_data,
+            documents_offsets=documents_offsets,
+            metadatas=metadatas_data,
+            metadatas_offsets=metadatas_offsets,
+        )
+        data = buffer.getvalue()
+        name = f"batch-{index:06d}.npz"
+        (directory / name).write_bytes(data)
+        files.append({"file": name, "count": len(ids), "sha256": _sha256(data)})
+
+    # Parent documents and parsed texts let a restored collection serve
+    # parent_child chunks and be re-indexed.
+    registry = _write_rows(directory, REGISTRY_FILE, registry_rows)
+    parents = _write_rows(directory, PARENTS_FILE, parent_rows)
+    parsed = _write_rows(directory, PARSED_FILE, parsed_files)
+
+    # Written last: a snapshot without a manifest is an interrupted export.
+    manifest = {
+        "version": FORMAT_VERSION,
+        "created_at": time.time(),
+        **info,
+        "dimension": dimension,
+        "count": sum(batch["count"] for batch in files),
+        "batches": files,
+        "registry": registry,
+        "parents": parents,
+        "parsed": parsed,
+    }
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    logger.info(
+        f"Snapshot written to {directory}: {manifest['count']} vectors "
+        f"in {len(files)} batches"
+    )
+    return manifest
+
+
+def read_manifest(directory: str | Path) -> dict[str, Any]:
+    path = Path(directory) / MANIFEST_FILE
+    if not path.exists():
+        raise ValueError(f"No snapshot manifest in {directory}")
+    manifest = json.loads(path.read_text())
+    if manifest.get("version") not in (1, FORMAT_VERSION):
+        raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+    return manifest
+
+
+def _read_verified(directory: Path, entry: dict[str, Any]) -> bytes:
+    data = (directory / entry["file"]).read_bytes()
+    if _sha256(data) != entry["sha256"]:
+        raise ValueError(f"Checksum mismatch in {entry['file']}")
+    return data
+
+
+def iter_snapshot(directory: str | Path, manifest: dict[str, Any]) -> Iterator[Batch]:
+    directory = Path(directory)
+    for entry in manifest["batches"]:
+        with np.load(io.BytesIO(_read_verified(directory, entry))) as batch:
+            metadatas = _unpack(batch["metadatas"], batch["metadatas_offsets"])
+            yield (
+                _unpack(batch["ids"], batch["ids_offsets"]),
+                batch["embeddings"],
+                _unpack(batch["documents"], batch["documents_offsets"]),
+                [json.loads(metadata) for metadata in metadatas],
+            )
+
+
+def _read_rows(directory: str | Path, entry: dict[str, Any] | None) -> list[tuple]:
+    if entry is None:
+        return []
+    data = _read_verified(Path(directory), entry)
+    return [tuple(json.loads(line)) for line in data.decode("utf-8").splitlines()]
+
+
+def read_registry(
+    directory: str | Path, manifest: dict[str, Any]
+) -> list[tuple[str, str, float]]:
+    return _read_rows(directory, manifest["registry"])
+
+
+def read_parents(directory: str | Path, manifest: dict[str, Any]) -> list[tuple]:
+    return _read_rows(directory, manifest.get("parents"))
+
+
+def read_parsed(directory: str | Path, manifest: dict[str, Any]) -> list[tuple]:
+    return _read_rows(directory, manifest.get("parsed"))
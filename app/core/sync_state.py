@@ -0,0 +1,79 @@
+import asyncio
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+
+class SyncState:
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or settings.SYNC_STATE_PATH)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, root TEXT NOT NULL, size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, file_hash TEXT NOT NULL, "
+                "synced_at REAL NOT NULL)"
+            )
+            self._initialized = True
+        return connection
+
+    def _list(self, root: str) -> dict[str, dict[str, Any]]:
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT path, size, mtime_ns, file_hash FROM files WHERE root = ?",
+                (root,),
+            ).fetchall()
+        return {
+            path: {"size": size, "mtime_ns": mtime_ns, "file_hash": file_hash}
+            for path, size, mtime_ns, file_hash in rows
+        }
+
+    def _put(
+        self, path: str, root: str, size: int, mtime_ns: int, file_hash: str
+    ) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, root, size, mtime_ns, file_hash, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, root, size, mtime_ns, file_hash, time.time()),
+            )
+
+    def _delete(self, path: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _hash_in_use(self, file_hash: str) -> bool:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT 1 FROM files WHERE file_hash = ? LIMIT 1", (file_hash,)
+            ).fetchone()
+        return row is not None
+
+    async def list(self, root: str) -> dict[str, dict[str, Any]]:
+        return await asyncio.to_thread(self._list, root)
+
+    async def put(
+        self, path: str, root: str, size: int, mtime_ns: int, file_hash: str
+    ) -> None:
+        await asyncio.to_thread(self._put, path, root, size, mtime_ns, file_hash)
+
+    async def delete(self, path: str) -> None:
+        await asyncio.to_thread(self._delete, path)
+
+    async def hash_in_use(self, file_hash: str) -> bool:
+        return await asyncio.to_thread(self._hash_in_use, file_hash)
+
+
+sync_state = SyncState()
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
@@ -8,6 +9,15 @@ from app.api.routes import router
 from app.core.logger import logger
 from app.core.database import db
 from app.core.config import settings
+from app.core import resilience
+from app.core.ollama_pool import pool_health_checker
+from app.core.profiling import loop_lag_monitor, request_profiler
+from app.services.conversation import conversation_service
+from app.services.pdf_extraction import pdf_extractor
+from app.services.precompute import answer_precomputer
+from app.services.migration import embedding_migration
+from app.services.sync import directory_sync
+from app.services.warmup import warmup_service
 
 
 @asynccontextmanager
@@ -24,9 +34,24 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize database: {e}")
         raise
 
+    loop_lag_monitor.start()
+    warmup_service.start()
+    pool_health_checker.start()
+    directory_sync.start()
+    answer_precomputer.watch_index()
+    answer_precomputer.start()
+    conversation_service.watch_index()
+
     yield
 
     logger.info("Shutting down application...")
+    await warmup_service.stop()
+    await directory_sync.stop()
+    await answer_precomputer.stop()
+    await embedding_migration.stop()
+    await pool_health_checker.stop()
+    pdf_extractor.shutdown()
+    await loop_lag_monitor.stop()
 
 
 app = FastAPI(
@@ -53,6 +78,21 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def refresh_collection(request: Request, call_next):
+    # Another worker may have swapped the alias or started a migration.
+    await db.refresh()
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not request_profiler.matches(request.url.path):
+        return await call_next(request)
+    async with request_profiler.track():
+        return await call_next(request)
+
+
 app.include_router(router, prefix="/api/v1", tags=["documents"])
 
 
@@ -64,3 +104,22 @@ async def root():
         "service": "langchain-document-service",
         "environment": settings.APP_ENV,
     }
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the models are warmed up."""
+    status = warmup_service.get_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/health")
+async def health():
+    """Breaker, Ollama node and vector store state; "degraded" if any is impaired."""
+    degraded = resilience.is_degraded() or db.read_only
+    return {
+        "status": "degraded" if degraded else "ok",
+        "breakers": resilience.get_status(),
+        "vector_store": {"backend": db.backend, "read_only": db.read_only},
+        "ollama_pools": pool_health_checker.get_status(),
+    }
@@ -1,7 +1,9 @@
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
+
 
 class UploadResponse(BaseModel):
     filename: str
@@ -13,6 +15,9 @@ class UploadResponse(BaseModel):
 class AddChunksRequest(BaseModel):
     text: str
     metadata: dict[str, Any] | None = None
+    chunking_strategy: Literal["recursive", "semantic", "parent_child"] = Field(
+        default="recursive", description="Chunking strategy"
+    )
 
 
 class AddChunksResponse(BaseModel):
@@ -29,9 +34,15 @@ class AskRequest(BaseModel):
     temperature: float = Field(
         default=0.7, description="Generation temperature", ge=0.0, le=2.0
     )
+    max_tokens: int | None = Field(
+        default=None, ge=1, description="Answer length cap, LLM_NUM_PREDICT if unset"
+    )
     score_threshold: float = Field(
         default=0.0, description="Min threshold", ge=0.0, le=1.0
     )
+    timeout: float | None = Field(
+        default=None, description="Deadline for the whole request, seconds", gt=0
+    )
 
 
 class AskResponse(BaseModel):
@@ -42,3 +53,92 @@ class AskResponse(BaseModel):
     model: str | None = None
     metrics: dict[str, Any]
     error: str | None = None
+    degraded: bool = False
+
+
+class SessionAskRequest(AskRequest):
+    session_id: str | None = Field(
+        default=None, description="Omit to start a new session"
+    )
+
+
+class SessionAskResponse(AskResponse):
+    session_id: str
+    context_reused: bool
+
+
+class AskBatchRequest(BaseModel):
+    questions: list[str] = Field(
+        min_length=1, max_length=settings.ASK_BATCH_MAX_QUESTIONS
+    )
+    top_k: int = Field(
+        default=4, description="Documents count for context", ge=1, le=10
+    )
+    temperature: float = Field(
+        default=0.7, description="Generation temperature", ge=0.0, le=2.0
+    )
+    max_tokens: int | None = Field(
+        default=None, ge=1, description="Answer length cap, LLM_NUM_PREDICT if unset"
+    )
+    score_threshold: float = Field(
+        default=0.0, description="Min threshold", ge=0.0, le=1.0
+    )
+    timeout: float | None = Field(
+        default=None, description="Deadline for the whole batch, seconds", gt=0
+    )
+
+
+class AskBatchResponse(BaseModel):
+    results: list[AskResponse]
+
+
+class SearchRequest(BaseModel):
+    query: str
+    limit: int = Field(default=10, description="Results per page", ge=1, le=100)
+    cursor: str | None = Field(
+        default=None, description="next_cursor from the previous page"
+    )
+    score_threshold: float = Field(
+        default=0.0, description="Min threshold", ge=0.0, le=1.0
+    )
+    filter: dict[str, str | int | float | bool] | None = Field(
+        default=None, description="Exact-match metadata filter"
+    )
+    fields: list[str] | None = Field(
+        default=None, description="Metadata fields to return, all if omitted"
+    )
+    include_content: bool = True
+    highlight: bool = False
+    expand_parents: bool = False
+
+
+class SearchResult(BaseModel):
+    id: str | None = None
+    score: float | None = None
+    content: str | None = None
+    highlight: str | None = None
+    metadata: dict[str, Any]
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: list[SearchResult]
+    next_cursor: str | None = None
+
+
+class MigrationRequest(BaseModel):
+    embedding_model: str = Field(min_length=1)
+    rate: float | None = Field(
+        default=None, description="Chunks re-embedded per second, 0 = no limit", ge=0
+    )
+    swap: bool = Field(
+        default=True, description="Switch the alias as soon as the copy is ready"
+    )
+
+
+class RouteProfileRequest(BaseModel):
+    path: str = Field(
+        min_length=1, description="Request path, e.g. /api/v1/ask-question"
+    )
+    count: int = Field(default=10, ge=1, description="Number of requests to profile")
+    idle: bool = Field(default=False, description="Keep samples of waiting threads")
@@ -0,0 +1,122 @@
+"""Compare chunking strategies on retrieval hit rate and context size.
+
+Usage:
+    python -m app.scripts.benchmark_chunking --questions eval.jsonl docs/*.pdf
+
+Each line of the questions file is ``{"question": ..., "expected": ...}`` where
+``expected`` is a text snippet that must appear in the retrieved context for
+the question to count as a hit.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+
+import chromadb
+from chromadb.config import Settings
+from langchain_chroma import Chroma
+from langchain_ollama import OllamaEmbeddings
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.chunking import ChunkingService, estimate_tokens
+from app.services.document_loader import DocumentLoader
+
+STRATEGIES = ["recursive", "semantic"]
+
+
+def load_questions(path: Path) -> list[dict]:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def evaluate_strategy(
+    strategy: str,
+    documents: list,
+    questions: list[dict],
+    embeddings: OllamaEmbeddings,
+    client,
+    top_k: int,
+) -> dict:
+    service = ChunkingService()
+    service.semantic_chunker.embeddings = embeddings
+
+    start = time.perf_counter()
+    chunks = await service.split_documents(
+        [doc.model_copy(deep=True) for doc in documents], strategy=strategy
+    )
+    vectorstore = Chroma(
+        client=client,
+        collection_name=f"bench_{strategy}_{uuid.uuid4().hex[:8]}",
+        embedding_function=embeddings,
+    )
+    await vectorstore.aadd_texts(
+        texts=[c.page_content for c in chunks], metadatas=[c.metadata for c in chunks]
+    )
+    index_time = time.perf_counter() - start
+
+    hits = 0
+    context_tokens = 0
+    for item in questions:
+        results = await vectorstore.asimilarity_search(item["question"], k=top_k)
+        context = "\n".join(doc.page_content for doc in results)
+        context_tokens += estimate_tokens(context)
+        if item["expected"].lower() in context.lower():
+            hits += 1
+
+    return {
+        "strategy": strategy,
+        "chunks": len(chunks),
+        "avg_chunk_tokens": sum(estimate_tokens(c.page_content) for c in chunks)
+        / max(len(chunks), 1),
+        "hit_rate": hits / max(len(questions), 1),
+        "avg_context_tokens": context_tokens / max(len(questions), 1),
+        "index_time": index_time,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--questions", required=True, type=Path)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES)
+    args = parser.parse_args()
+
+    embeddings = OllamaEmbeddings(
+        base_url=settings.OLLAMA_BASE_URL, model=settings.OLLAMA_EMBEDDING_MODEL
+    )
+    client = chromadb.EphemeralClient(Settings(anonymized_telemetry=False))
+
+    documents = []
+    for path in args.files:
+        documents.extend(await DocumentLoader.load_document(path))
+    questions = load_questions(args.questions)
+    logger.info(f"Benchmark: {len(documents)} documents, {len(questions)} questions")
+
+    rows = [
+        await evaluate_strategy(
+            strategy, documents, questions, embeddings, client, args.top_k
+        )
+        for strategy in args.strategies
+    ]
+
+    print(
+        f"{'strategy':<12}{'chunks':>8}{'avg_chunk_tok':>15}"
+        f"{'hit_rate@' + str(args.top_k):>13}{'avg_ctx_tok':>13}{'index_s':>10}"
+    )
+    for row in rows:
+        print(
+            f"{row['strategy']:<12}{row['chunks']:>8}{row['avg_chunk_tokens']:>15.1f}"
+            f"{row['hit_rate']:>13.3f}{row['avg_context_tokens']:>13.1f}"
+            f"{row['index_time']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
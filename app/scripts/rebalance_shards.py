@@ -0,0 +1,58 @@
+"""Move vectors to the shards the hash ring assigns them to.
+
+Usage:
+    python -m app.scripts.rebalance_shards --dry-run
+    python -m app.scripts.rebalance_shards
+    python -m app.scripts.rebalance_shards --drain chroma-c:8000/documents
+
+Run after changing CHROMA_SHARD_HOSTS or CHROMA_COLLECTIONS_PER_HOST. With
+consistent hashing only the vectors whose shard changed are moved; stored
+embeddings are copied as they are, so nothing is re-embedded. Shards that are
+being removed are no longer in the configuration and have to be listed with
+--drain so their vectors are moved to the remaining shards.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.database import db
+from app.core.sharding import ShardSet, parse_shard
+
+
+async def run(args) -> None:
+    await db.initialize()
+    if db.shards is None:
+        raise SystemExit("Sharding needs VECTOR_BACKEND=chroma")
+
+    drain = []
+    if args.drain:
+        drain = ShardSet.connect(
+            [parse_shard(spec) for spec in args.drain], db.embeddings
+        ).shards
+
+    start = time.time()
+    moved = await asyncio.to_thread(
+        db.shards.rebalance,
+        drain=drain,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+    )
+    for route, count in sorted(moved.items()):
+        print(f"{route}: {count}")
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"{verb} {sum(moved.values())} vectors in {time.time() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--drain", nargs="*", default=[], metavar="HOST:PORT/COLLECTION"
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Rebuild the vector collection from the parsed-text store.
+
+Usage:
+    python -m app.scripts.reindex
+    python -m app.scripts.reindex --strategy semantic --concurrency 8
+
+Re-chunks and re-embeds every stored document with the current
+CHUNK_SIZE/CHUNK_OVERLAP and embedding model into a new collection, then points
+the COLLECTION_NAME alias at it. The current collection keeps serving searches
+until then and is kept for rollback. Original files and the document loaders
+are not needed. Without --strategy each file keeps the chunking strategy it
+was uploaded with.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.database import db
+from app.services.ingestion import ingestion_service
+from app.services.precompute import answer_precomputer
+
+
+async def run(args) -> None:
+    await db.initialize()
+    answer_precomputer.watch_index()
+    start = time.time()
+    status = await ingestion_service.reindex(
+        strategy=args.strategy, concurrency=args.concurrency
+    )
+    print(
+        f"Re-indexed {status['files_done']}/{status['files_total']} files into "
+        f"{status['chunks']} chunks in {time.time() - start:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--strategy", choices=["recursive", "semantic", "parent_child"], default=None
+    )
+    parser.add_argument("--concurrency", type=int, default=settings.REINDEX_CONCURRENCY)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
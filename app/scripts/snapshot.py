@@ -0,0 +1,57 @@
+"""Export the vector collection to a snapshot or import one, without re-embedding.
+
+Usage:
+    python -m app.scripts.snapshot export /backups/documents-2026-10-19
+    python -m app.scripts.snapshot import /backups/documents-2026-10-19
+    python -m app.scripts.snapshot import /backups/documents-2026-10-19 --replace
+
+A snapshot is a directory of NumPy .npz batches (ids, embeddings, texts and
+metadata as columns) plus the document registry, parent documents, parsed
+texts and a manifest with a SHA-256 checksum per file. Import refuses a non-empty collection unless --replace is
+given, and a snapshot made with another embedding model or reduction unless
+--force is given.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.database import db
+from app.services.precompute import answer_precomputer
+
+
+async def run(args) -> None:
+    await db.initialize()
+    answer_precomputer.watch_index()
+    start = time.time()
+    if args.command == "export":
+        manifest = await db.export_snapshot(args.path, batch_size=args.batch_size)
+        count, batches = manifest["count"], len(manifest["batches"])
+        print(f"Exported {count} vectors in {batches} batches", end="")
+    else:
+        result = await db.import_snapshot(
+            args.path, replace=args.replace, force=args.force
+        )
+        count, batches = result["count"], result["batches"]
+        print(f"Imported {count} vectors in {batches} batches", end="")
+    print(f" in {time.time() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export")
+    export.add_argument("path")
+    export.add_argument("--batch-size", type=int, default=1000)
+
+    load = commands.add_parser("import")
+    load.add_argument("path")
+    load.add_argument("--replace", action="store_true")
+    load.add_argument("--force", action="store_true")
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
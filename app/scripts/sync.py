@@ -0,0 +1,43 @@
+"""Index new, changed and deleted files from SYNC_DIRECTORIES once.
+
+Usage:
+    python -m app.scripts.sync
+    python -m app.scripts.sync --strategy semantic
+
+Files are compared with the previous run by size and mtime first and by
+content hash only when those differ, so an unchanged tree costs one directory
+walk. Meant for cron when the API runs with SYNC_INTERVAL=0.
+"""
+
+import argparse
+import asyncio
+
+from app.core.database import db
+from app.services.precompute import answer_precomputer
+from app.services.sync import directory_sync
+
+
+async def run(args) -> None:
+    if not directory_sync.directories():
+        raise SystemExit("SYNC_DIRECTORIES is not set")
+    await db.initialize()
+    answer_precomputer.watch_index()
+    summary = await directory_sync.sync(strategy=args.strategy)
+    print(
+        f"Added {summary['added']}, changed {summary['changed']}, "
+        f"deleted {summary['deleted']}, unchanged {summary['unchanged']}, "
+        f"failed {summary['failed']}: {summary['chunks']} chunks "
+        f"in {summary['duration']:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--strategy", choices=["recursive", "semantic", "parent_child"], default=None
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
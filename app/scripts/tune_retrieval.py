@@ -0,0 +1,274 @@
+"""Evaluate retrieval over a grid of chunking parameters, top_k and thresholds.
+
+Usage:
+    python -m app.scripts.tune_retrieval --dataset eval.jsonl docs/*.pdf \\
+        --chunk-sizes 500 1000 1500 --overlaps 0 100 200 --top-k 2 4 8 \\
+        --score-thresholds 0 0.3 --min-recall 0.9
+
+Each line of the dataset is ``{"question": ..., "sources": ["report.pdf"]}``
+(``"source": "report.pdf"`` for a single file): the files that hold the
+answer. Every chunk size and overlap pair gets its own temporary local index,
+built in parallel; each question is embedded once and searched in every
+index. For each configuration the report gives recall@k, MRR, the average
+context size in tokens and search latency, and recommends the cheapest one
+that meets --min-recall and --min-mrr.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.database import VectorDatabase
+from app.core.local_index import LocalVectorStore
+from app.core.logger import logger
+from app.services.chunking import ChunkingService
+from app.services.document_loader import DocumentLoader
+from app.services.llm import llm_service
+from app.services.retrieval import retrieval_service
+
+
+def load_dataset(path: Path) -> list[dict]:
+    text = path.read_text(encoding="utf-8")
+    items = (
+        json.loads(text)
+        if path.suffix == ".json"
+        else [json.loads(line) for line in text.splitlines() if line.strip()]
+    )
+    for item in items:
+        sources = item.get("sources") or item.get("source") or []
+        if isinstance(sources, str):
+            sources = [sources]
+        item["sources"] = {Path(source).name for source in sources}
+    return items
+
+
+def score_question(
+    expected: set[str], ranked: list[tuple[Document, float]]
+) -> tuple[float, float]:
+    found = [Path(doc.metadata.get("source", "")).name for doc, _ in ranked]
+    recall = len(expected & set(found)) / max(len(expected), 1)
+    rank = next((i for i, source in enumerate(found, 1) if source in expected), 0)
+    return recall, 1 / rank if rank else 0.0
+
+
+def summarize(
+    config: dict, results: list[list[tuple[Document, float]]], dataset: list[dict]
+) -> dict:
+    recalls, reciprocal_ranks, context_tokens = [], [], []
+    for item, ranked in zip(dataset, results):
+        ranked = [
+            (doc, score)
+            for doc, score in ranked[: config["top_k"]]
+            if score >= config["score_threshold"]
+        ]
+        recall, reciprocal_rank = score_question(item["sources"], ranked)
+        recalls.append(recall)
+        reciprocal_ranks.append(reciprocal_rank)
+        context = (
+            retrieval_service.format_context([doc for doc, _ in ranked])
+            if ranked
+            else ""
+        )
+        context_tokens.append(llm_service.count_tokens(context))
+    return {
+        **config,
+        "recall": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "avg_context_tokens": float(np.mean(context_tokens)),
+    }
+
+
+def pick(rows: list[dict], min_recall: float, min_mrr: float) -> dict | None:
+    # Context size drives prompt size and with it generation latency.
+    passing = [
+        row for row in rows if row["recall"] >= min_recall and row["mrr"] >= min_mrr
+    ]
+    return min(
+        passing,
+        key=lambda row: (row["avg_context_tokens"], row["search_ms"]),
+        default=None,
+    )
+
+
+async def evaluate_chunking(
+    chunk_size: int,
+    chunk_overlap: int,
+    documents: list[Document],
+    dataset: list[dict],
+    vectors: list[list[float]],
+    embeddings: Embeddings,
+    directory: Path,
+    top_ks: list[int],
+    score_thresholds: list[float],
+    semaphore: asyncio.Semaphore,
+) -> list[dict]:
+    async with semaphore:
+        start = time.perf_counter()
+        service = ChunkingService(chunk_size, chunk_overlap)
+        chunks = await asyncio.to_thread(
+            service.text_splitter.split_documents,
+            [doc.model_copy(deep=True) for doc in documents],
+        )
+        store = LocalVectorStore(
+            embedding_function=embeddings,
+            collection_name=f"tune_{chunk_size}_{chunk_overlap}",
+            path=directory,
+        )
+        await store.aadd_texts(
+            [chunk.page_content for chunk in chunks],
+            [chunk.metadata for chunk in chunks],
+        )
+        index_time = time.perf_counter() - start
+
+    relevance = store._select_relevance_score_fn()
+    results, latencies = [], []
+    for vector in vectors:
+        search_start = time.perf_counter()
+        found = await asyncio.to_thread(
+            store.similarity_search_by_vector_with_score, vector, max(top_ks)
+        )
+        latencies.append(time.perf_counter() - search_start)
+        results.append([(doc, relevance(distance)) for doc, distance in found])
+    logger.info(
+        f"Evaluated chunk_size={chunk_size}, overlap={chunk_overlap}: "
+        f"{len(chunks)} chunks indexed in {index_time:.1f}s"
+    )
+
+    common = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunks": len(chunks),
+        "index_s": index_time,
+        "search_ms": float(np.mean(latencies)) * 1000,
+        "search_p95_ms": float(np.percentile(latencies, 95)) * 1000,
+    }
+    return [
+        summarize(
+            {**common, "top_k": top_k, "score_threshold": threshold}, results, dataset
+        )
+        for top_k, threshold in itertools.product(top_ks, score_thresholds)
+    ]
+
+
+async def tune(
+    documents: list[Document],
+    dataset: list[dict],
+    embeddings: Embeddings,
+    chunk_sizes: list[int],
+    overlaps: list[int],
+    top_ks: list[int],
+    score_thresholds: list[float],
+    concurrency: int = 2,
+) -> list[dict]:
+    grid = [
+        (size, overlap)
+        for size, overlap in itertools.product(chunk_sizes, overlaps)
+        if overlap < size
+    ]
+    vectors = await asyncio.gather(
+        *(embeddings.aembed_query(item["question"]) for item in dataset)
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    with tempfile.TemporaryDirectory(prefix="tune_retrieval_") as directory:
+        per_chunking = await asyncio.gather(
+            *(
+                evaluate_chunking(
+                    size,
+                    overlap,
+                    documents,
+                    dataset,
+                    vectors,
+                    embeddings,
+                    Path(directory),
+                    top_ks,
+                    score_thresholds,
+                    semaphore,
+                )
+                for size, overlap in grid
+            )
+        )
+    return [row for rows in per_chunking for row in rows]
+
+
+def print_report(rows: list[dict], best: dict | None) -> None:
+    print(
+        f"{'size':>6}{'overlap':>9}{'chunks':>8}{'top_k':>7}{'thresh':>8}"
+        f"{'recall':>8}{'mrr':>7}{'ctx_tok':>9}{'search_ms':>11}{'p95_ms':>8}"
+    )
+    for row in sorted(rows, key=lambda row: row["avg_context_tokens"]):
+        print(
+            f"{row['chunk_size']:>6}{row['chunk_overlap']:>9}{row['chunks']:>8}"
+            f"{row['top_k']:>7}{row['score_threshold']:>8.2f}{row['recall']:>8.3f}"
+            f"{row['mrr']:>7.3f}{row['avg_context_tokens']:>9.0f}"
+            f"{row['search_ms']:>11.2f}{row['search_p95_ms']:>8.2f}"
+            + ("  <- best" if row is best else "")
+        )
+    if best is None:
+        print("\nNo configuration meets the quality bar.")
+    else:
+        print(
+            f"\nCHUNK_SIZE={best['chunk_size']} "
+            f"CHUNK_OVERLAP={best['chunk_overlap']} top_k={best['top_k']} "
+            f"score_threshold={best['score_threshold']}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--dataset", required=True, type=Path)
+    parser.add_argument(
+        "--chunk-sizes", nargs="+", type=int, default=[settings.CHUNK_SIZE]
+    )
+    parser.add_argument(
+        "--overlaps", nargs="+", type=int, default=[settings.CHUNK_OVERLAP]
+    )
+    parser.add_argument("--top-k", nargs="+", type=int, default=[4])
+    parser.add_argument("--score-thresholds", nargs="+", type=float, default=[0.0])
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--min-mrr", type=float, default=0.0)
+    parser.add_argument(
+        "--concurrency", type=int, default=2, help="indexes built at once"
+    )
+    parser.add_argument("--output", type=Path, help="write all rows as JSON")
+    args = parser.parse_args()
+
+    _, embeddings = VectorDatabase.create_embeddings(settings.OLLAMA_EMBEDDING_MODEL)
+
+    documents = []
+    for path in args.files:
+        documents.extend(await DocumentLoader.load_document(path))
+    dataset = load_dataset(args.dataset)
+    known = {Path(doc.metadata.get("source", "")).name for doc in documents}
+    for item in dataset:
+        if missing := item["sources"] - known:
+            logger.warning(f"'{item['question'][:50]}': unknown sources {missing}")
+    logger.info(f"Tuning: {len(documents)} documents, {len(dataset)} questions")
+
+    rows = await tune(
+        documents,
+        dataset,
+        embeddings,
+        args.chunk_sizes,
+        args.overlaps,
+        args.top_k,
+        args.score_thresholds,
+        concurrency=args.concurrency,
+    )
+    best = pick(rows, args.min_recall, args.min_mrr)
+    print_report(rows, best)
+    if args.output:
+        args.output.write_text(json.dumps({"rows": rows, "best": best}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
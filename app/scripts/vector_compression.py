@@ -0,0 +1,196 @@
+"""Measure recall@k against memory and latency for embedding compression.
+
+Usage:
+    python -m app.scripts.vector_compression evaluate --sample 5000 --k 10
+    python -m app.scripts.vector_compression fit-pca --sample 5000 --dimension 256
+
+Both commands sample chunk texts from the configured Chroma collection and
+re-embed them with the full-size Ollama model, so results reflect our own data
+regardless of how the collection is currently compressed.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+from langchain_ollama import OllamaEmbeddings
+
+from app.core.compression import EmbeddingCompressor, QuantizedIndex, normalize
+from app.core.config import settings
+from app.core.logger import logger
+
+
+def sample_texts(sample: int, seed: int, page_size: int = 100) -> list[str]:
+    client = chromadb.HttpClient(
+        host=settings.CHROMA_HOST,
+        port=settings.CHROMA_PORT,
+        settings=Settings(anonymized_telemetry=False),
+    )
+    collection = client.get_collection(settings.COLLECTION_NAME)
+    total = collection.count()
+
+    # Random pages instead of random rows keep the number of round-trips low.
+    pages = range(0, total, page_size)
+    wanted = min(len(pages), -(-sample // page_size))
+    texts = []
+    for offset in sorted(random.Random(seed).sample(pages, wanted)):
+        batch = collection.get(include=["documents"], offset=offset, limit=page_size)
+        texts.extend(text for text in batch["documents"] if text)
+
+    texts = texts[:sample]
+    logger.info(f"Sampled {len(texts)} of {total} chunks from the collection")
+    return texts
+
+
+async def embed(texts: list[str], batch_size: int) -> np.ndarray:
+    embeddings = OllamaEmbeddings(
+        base_url=settings.OLLAMA_BASE_URL, model=settings.OLLAMA_EMBEDDING_MODEL
+    )
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(
+            await embeddings.aembed_documents(texts[start : start + batch_size])
+        )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def evaluate_config(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    compressor: EmbeddingCompressor | None,
+    quantization: str,
+    k: int,
+    oversample: int,
+) -> dict:
+    reduced_corpus = compressor.transform(corpus) if compressor else normalize(corpus)
+    reduced_queries = (
+        compressor.transform(queries) if compressor else normalize(queries)
+    )
+    dimension = reduced_corpus.shape[1]
+
+    index = None
+    if quantization != "none":
+        index = QuantizedIndex(quantization)
+        index.add([str(i) for i in range(len(reduced_corpus))], reduced_corpus)
+
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(reduced_queries, truth):
+        if index is None:
+            found = np.argsort(-(reduced_corpus @ query))[:k]
+        else:
+            candidates = np.array(
+                [int(i) for i in index.search(query, k * oversample)], dtype=np.int64
+            )
+            rescored = reduced_corpus[candidates] @ query
+            found = candidates[np.argsort(-rescored)[:k]]
+        hits += len(set(found.tolist()) & set(expected.tolist()))
+    latency = (time.perf_counter() - start) / max(len(queries), 1)
+
+    return {
+        "dimension": dimension,
+        "quantization": quantization,
+        "recall": hits / (len(queries) * k),
+        "float_bytes": dimension * 4,
+        "code_bytes": index.nbytes // len(index) if index else dimension * 4,
+        "latency_ms": latency * 1000,
+    }
+
+
+async def run_evaluate(args) -> None:
+    texts = await asyncio.to_thread(sample_texts, args.sample + args.queries, args.seed)
+    vectors = await embed(texts, args.batch_size)
+    queries, corpus = (
+        normalize(vectors[: args.queries]),
+        normalize(vectors[args.queries :]),
+    )
+    truth = exact_top_k(corpus, queries, args.k)
+
+    rows = []
+    for dimension in args.dimensions:
+        compressor = None
+        if dimension < corpus.shape[1]:
+            compressor = EmbeddingCompressor(args.method, dimension, args.pca_path)
+            if args.method == "pca":
+                compressor.fit_pca(corpus, save=False)
+        for quantization in args.quantization:
+            rows.append(
+                evaluate_config(
+                    corpus,
+                    queries,
+                    truth,
+                    compressor,
+                    quantization,
+                    args.k,
+                    args.oversample,
+                )
+            )
+
+    print(
+        f"{'dims':>6}{'quant':>8}{'recall@' + str(args.k):>11}"
+        f"{'float_B/vec':>13}{'code_B/vec':>12}{'corpus_MB':>11}{'ms/query':>10}"
+    )
+    for row in rows:
+        corpus_mb = row["code_bytes"] * len(corpus) / 1024 / 1024
+        print(
+            f"{row['dimension']:>6}{row['quantization']:>8}{row['recall']:>11.3f}"
+            f"{row['float_bytes']:>13}{row['code_bytes']:>12}{corpus_mb:>11.2f}"
+            f"{row['latency_ms']:>10.2f}"
+        )
+
+
+async def run_fit_pca(args) -> None:
+    texts = await asyncio.to_thread(sample_texts, args.sample, args.seed)
+    vectors = await embed(texts, args.batch_size)
+    compressor = EmbeddingCompressor("pca", args.dimension, args.pca_path)
+    compressor.fit_pca(vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sample", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--pca-path", default=settings.EMBEDDING_PCA_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    evaluate = commands.add_parser("evaluate")
+    evaluate.add_argument("--queries", type=int, default=200)
+    evaluate.add_argument("--k", type=int, default=10)
+    evaluate.add_argument(
+        "--method", choices=["matryoshka", "pca"], default="matryoshka"
+    )
+    evaluate.add_argument(
+        "--dimensions", nargs="+", type=int, default=[768, 512, 256, 128]
+    )
+    evaluate.add_argument(
+        "--quantization", nargs="+", default=["none", "int8", "binary"]
+    )
+    evaluate.add_argument(
+        "--oversample", type=int, default=settings.QUANTIZATION_OVERSAMPLE
+    )
+
+    fit_pca = commands.add_parser("fit-pca")
+    fit_pca.add_argument(
+        "--dimension", type=int, default=settings.EMBEDDING_DIMENSION or 256
+    )
+
+    args = parser.parse_args()
+    if args.command == "evaluate":
+        asyncio.run(run_evaluate(args))
+    else:
+        asyncio.run(run_fit_pca(args))
+
+
+if __name__ == "__main__":
+    main()
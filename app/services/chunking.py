@@ -1,47 +1,236 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import re
+import uuid
+from functools import cached_property
+from typing import Any, AsyncIterator, Literal
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_core.documents import Document
 from app.core.logger import logger
 from app.core.config import settings
+from app.core.database import db
+
+ChunkingStrategy = Literal["recursive", "semantic", "parent_child"]
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class SemanticChunker:
+    def __init__(
+        self,
+        embeddings: Embeddings | None = None,
+        min_tokens: int = None,
+        max_tokens: int = None,
+        breakpoint_percentile: float = None,
+        batch_size: int = None,
+    ):
+        self.embeddings = embeddings
+        self.min_tokens = min_tokens or settings.SEMANTIC_MIN_CHUNK_TOKENS
+        self.max_tokens = max_tokens or settings.SEMANTIC_MAX_CHUNK_TOKENS
+        self.breakpoint_percentile = (
+            breakpoint_percentile or settings.SEMANTIC_BREAKPOINT_PERCENTILE
+        )
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+
+    @cached_property
+    def sentence_splitter(self):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        # Sentences longer than the upper bound are pre-split so a single
+        # run-on sentence cannot produce an oversized chunk.
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.max_tokens * 4,
+            chunk_overlap=0,
+            separators=["\n", "; ", ", ", " ", ""],
+        )
+
+    def split_sentences(self, text: str) -> list[str]:
+        sentences = []
+        for sentence in SENTENCE_PATTERN.split(text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if estimate_tokens(sentence) > self.max_tokens:
+                sentences.extend(self.sentence_splitter.split_text(sentence))
+            else:
+                sentences.append(sentence)
+        return sentences
+
+    async def embed_sentences(self, sentences: list[str]) -> np.ndarray:
+        embeddings = self.embeddings or db.embeddings
+        if embeddings is None:
+            raise ValueError("Embeddings not initialized")
+
+        vectors = []
+        for start in range(0, len(sentences), self.batch_size):
+            vectors.extend(
+                await embeddings.aembed_documents(
+                    sentences[start : start + self.batch_size]
+                )
+            )
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def adjacent_distances(vectors: np.ndarray) -> np.ndarray:
+        if len(vectors) < 2:
+            return np.zeros(0, dtype=np.float32)
+        return 1.0 - np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+
+    def group_sentences(
+        self, sentences: list[str], breakpoints: np.ndarray
+    ) -> list[str]:
+        chunks = []
+        current: list[str] = []
+        current_tokens = 0
+
+        for i, sentence in enumerate(sentences):
+            tokens = estimate_tokens(sentence)
+            if current and current_tokens + tokens > self.max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+
+            current.append(sentence)
+            current_tokens += tokens
+
+            if i < len(breakpoints) and breakpoints[i]:
+                if current_tokens >= self.min_tokens:
+                    chunks.append(" ".join(current))
+                    current, current_tokens = [], 0
+
+        if current:
+            chunks.append(" ".join(current))
+
+        return chunks
+
+    async def split_documents(self, documents: list[Document]) -> list[Document]:
+        # Sentences of all documents are embedded together so that short pages
+        # still fill whole batches, and the breakpoint threshold is computed
+        # over the whole upload rather than per page.
+        sentences_per_doc = [self.split_sentences(d.page_content) for d in documents]
+        flat_sentences = [s for sentences in sentences_per_doc for s in sentences]
+        if not flat_sentences:
+            return []
+
+        vectors = await self.embed_sentences(flat_sentences)
+
+        distances_per_doc = []
+        offset = 0
+        for sentences in sentences_per_doc:
+            distances_per_doc.append(
+                self.adjacent_distances(vectors[offset : offset + len(sentences)])
+            )
+            offset += len(sentences)
+
+        all_distances = np.concatenate(distances_per_doc)
+        threshold = (
+            np.percentile(all_distances, self.breakpoint_percentile)
+            if len(all_distances)
+            else 0.0
+        )
+
+        chunks = []
+        for document, sentences, distances in zip(
+            documents, sentences_per_doc, distances_per_doc
+        ):
+            for piece in self.group_sentences(sentences, distances > threshold):
+                chunks.append(
+                    Document(page_content=piece, metadata=dict(document.metadata))
+                )
+
+        logger.info(
+            f"Semantic split: {len(flat_sentences)} sentences → {len(chunks)} chunks "
+            f"(breakpoint distance > {threshold:.3f})"
+        )
+        return chunks
 
 
 class ChunkingService:
     def __init__(self, chunk_size: int = None, chunk_overlap: int = None):
         self.chunk_size = chunk_size or settings.CHUNK_SIZE
-        self.chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""],
+        self.chunk_overlap = (
+            settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
         )
+        self.semantic_chunker = SemanticChunker()
 
         logger.info(
             f"ChunkingService initialized: chunk_size={self.chunk_size}, "
             f"overlap={self.chunk_overlap}"
         )
 
-    async def split_documents(self, documents: list[Document]) -> list[Document]:
+    @staticmethod
+    def _create_splitter(chunk_size: int, chunk_overlap: int):
+        # langchain_text_splitters is imported lazily to keep cold start fast.
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", ". ", " ", ""],
+        )
+
+    @cached_property
+    def text_splitter(self):
+        return self._create_splitter(self.chunk_size, self.chunk_overlap)
+
+    @cached_property
+    def parent_splitter(self):
+        return self._create_splitter(settings.PARENT_CHUNK_SIZE, 0)
+
+    @cached_property
+    def child_splitter(self):
+        return self._create_splitter(
+            settings.CHILD_CHUNK_SIZE, settings.CHILD_CHUNK_OVERLAP
+        )
+
+    def _annotate_chunk(
+        self, chunk: Document, index: int, strategy: ChunkingStrategy = "recursive"
+    ) -> Document:
+        chunk.metadata["chunk_id"] = index
+        chunk.metadata["chunk_size"] = len(chunk.page_content)
+        chunk.metadata["chunking_strategy"] = strategy
+        if "filename" not in chunk.metadata:
+            logger.warning(f"Chunk {index} missing 'filename' metadata!")
+            chunk.metadata["filename"] = "Unknown"
+
+        if "file_type" not in chunk.metadata:
+            logger.warning(f"Chunk {index} missing 'file_type' metadata!")
+            chunk.metadata["file_type"] = ""
+
+        logger.debug(
+            f"Chunk {index}: filename={chunk.metadata.get('filename')}, "
+            f"file_type={chunk.metadata.get('file_type')}, "
+            f"size={chunk.metadata.get('chunk_size')}"
+        )
+        return chunk
+
+    async def split_documents(
+        self, documents: list[Document], strategy: ChunkingStrategy = "recursive"
+    ) -> list[Document]:
         try:
-            chunks = self.text_splitter.split_documents(documents)
+            if strategy == "semantic":
+                chunks = await self.semantic_chunker.split_documents(documents)
+            elif strategy == "recursive":
+                chunks = self.text_splitter.split_documents(documents)
+            else:
+                raise ValueError(
+                    f"Strategy '{strategy}' is not supported by split_documents"
+                )
 
             for i, chunk in enumerate(chunks):
-                chunk.metadata["chunk_id"] = i
-                chunk.metadata["chunk_size"] = len(chunk.page_content)
-                if "filename" not in chunk.metadata:
-                    logger.warning(f"Chunk {i} missing 'filename' metadata!")
-                    chunk.metadata["filename"] = "Unknown"
-
-                if "file_type" not in chunk.metadata:
-                    logger.warning(f"Chunk {i} missing 'file_type' metadata!")
-                    chunk.metadata["file_type"] = ""
-
-                logger.debug(
-                    f"Chunk {i}: filename={chunk.metadata.get('filename')}, "
-                    f"file_type={chunk.metadata.get('file_type')}, "
-                    f"size={chunk.metadata.get('chunk_size')}"
-                )
+                self._annotate_chunk(chunk, i, strategy)
 
-            logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks")
+            logger.info(
+                f"Split {len(documents)} documents into {len(chunks)} chunks "
+                f"(strategy={strategy})"
+            )
 
             return chunks
 
@@ -49,6 +238,107 @@ class ChunkingService:
             logger.error(f"Failed to split documents: {e}")
             raise
 
+    async def split_parent_child(
+        self, documents: list[Document]
+    ) -> tuple[list[Document], list[Document]]:
+        try:
+            parents = self.parent_splitter.split_documents(documents)
+            children = []
+
+            for i, parent in enumerate(parents):
+                parent_id = uuid.uuid4().hex
+                parent.metadata["parent_id"] = parent_id
+                self._annotate_chunk(parent, i, "parent_child")
+
+                for child in self.child_splitter.split_documents([parent]):
+                    children.append(
+                        self._annotate_chunk(child, len(children), "parent_child")
+                    )
+
+            logger.info(
+                f"Split {len(documents)} documents into {len(parents)} parents "
+                f"and {len(children)} children"
+            )
+
+            return parents, children
+
+        except Exception as e:
+            logger.error(f"Failed to split documents into parents: {e}")
+            raise
+
+    async def split_text(
+        self,
+        text: str,
+        metadata: dict[str, Any] | None = None,
+        strategy: ChunkingStrategy = "recursive",
+    ) -> list[Document]:
+        try:
+            if strategy != "recursive":
+                return await self.split_documents(
+                    [Document(page_content=text, metadata=dict(metadata or {}))],
+                    strategy=strategy,
+                )
+
+            chunks = [
+                self._annotate_chunk(
+                    Document(page_content=piece, metadata=dict(metadata or {})), i
+                )
+                for i, piece in enumerate(self.text_splitter.split_text(text))
+            ]
+
+            logger.info(f"Split text of {len(text)} chars into {len(chunks)} chunks")
+
+            return chunks
+
+        except Exception as e:
+            logger.error(f"Failed to split text: {e}")
+            raise
+
+    async def split_text_stream(
+        self,
+        parts: AsyncIterator[str],
+        metadata: dict[str, Any] | None = None,
+        window_size: int | None = None,
+    ) -> AsyncIterator[Document]:
+        # Only a window of the incoming text is kept in memory: the buffer is
+        # split once it grows past the window, every finished chunk is yielded
+        # and the last (possibly incomplete) chunk is carried over as the start
+        # of the next window, so chunk boundaries and overlap stay intact.
+        window_size = max(window_size or settings.STREAM_WINDOW_SIZE, self.chunk_size)
+        buffer = ""
+        chunk_index = 0
+        total_chars = 0
+
+        async for part in parts:
+            buffer += part
+            total_chars += len(part)
+            if len(buffer) < window_size:
+                continue
+
+            pieces = self.text_splitter.split_text(buffer)
+            if not pieces:
+                buffer = ""
+                continue
+            # The splitter strips whitespace around chunks, so carry over the raw
+            # tail of the buffer to avoid gluing words across the window edge.
+            buffer = buffer[buffer.rfind(pieces.pop()) :]
+            for piece in pieces:
+                yield self._annotate_chunk(
+                    Document(page_content=piece, metadata=dict(metadata or {})),
+                    chunk_index,
+                )
+                chunk_index += 1
+
+        if buffer.strip():
+            for piece in self.text_splitter.split_text(buffer):
+                yield self._annotate_chunk(
+                    Document(page_content=piece, metadata=dict(metadata or {})),
+                    chunk_index,
+                )
+                chunk_index += 1
+
+        logger.info(f"Streamed {total_chars} chars into {chunk_index} chunks")
+
     def get_optimal_chunk_size(self, text_length: int) -> int:
         if text_length < 1000:
             return 256
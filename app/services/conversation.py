@@ -0,0 +1,189 @@
+import asyncio
+import time
+import uuid
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.deadline import guard
+from app.core.logger import logger
+from app.core.sessions import session_store
+from app.services.llm import llm_service
+from app.services.retrieval import retrieval_service
+
+NO_CONTEXT_ANSWER = (
+    "I couldn't find any relevant information in the database to answer your question."
+)
+
+
+class ConversationService:
+    def __init__(self):
+        # When this worker last changed the index; other workers' deletions
+        # are caught by checking the cached chunks still exist.
+        self._changed_at = 0.0
+
+    def watch_index(self) -> None:
+        if self.on_index_change not in db.change_listeners:
+            db.change_listeners.append(self.on_index_change)
+
+    async def on_index_change(self) -> None:
+        self._changed_at = time.time()
+
+    @staticmethod
+    def _new_state() -> dict[str, Any]:
+        return {
+            "anchor": None,
+            "collection": None,
+            "generation": None,
+            "retrieved_at": 0.0,
+            "chunk_ids": [],
+            "context": "",
+            "sources": [],
+            "top_k": None,
+            "score_threshold": None,
+            "summary": "",
+            "turns": [],
+            "node": None,
+        }
+
+    @staticmethod
+    def _similarity(vector: list[float], anchor: list[float] | None) -> float:
+        if anchor is None or len(anchor) != len(vector):
+            return 0.0
+        a = np.asarray(vector, dtype=np.float32)
+        b = np.asarray(anchor, dtype=np.float32)
+        return float(a @ b / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
+
+    async def ask(
+        self,
+        question: str,
+        session_id: str | None = None,
+        top_k: int = 4,
+        temperature: float = 0.7,
+        score_threshold: float = 0.0,
+        max_tokens: int | None = None,
+    ) -> dict[str, Any]:
+        start_time = time.time()
+        session_id = session_id or uuid.uuid4().hex
+        state = await session_store.get(session_id) or self._new_state()
+
+        search_start = time.time()
+        vector = await guard(db.embeddings.aembed_query(question), "retrieval")
+        similarity = self._similarity(vector, state["anchor"])
+        # A follow-up close to the question that retrieved the cached context
+        # is answered from it; drifting further away retrieves again.
+        reused = (
+            bool(state["context"])
+            and (state["top_k"], state["score_threshold"]) == (top_k, score_threshold)
+            and similarity >= settings.SESSION_DRIFT_THRESHOLD
+            and await self._context_current(state)
+        )
+        if not reused:
+            documents = await retrieval_service.search(
+                query=question, k=top_k, score_threshold=score_threshold, vector=vector
+            )
+            state.update(
+                anchor=vector,
+                collection=db.collection_name,
+                generation=db.generation,
+                retrieved_at=time.time(),
+                chunk_ids=[
+                    doc.id or doc.metadata.get("parent_id") for doc in documents
+                ],
+                context=(
+                    retrieval_service.format_context(documents) if documents else ""
+                ),
+                sources=retrieval_service.get_sources(documents),
+                top_k=top_k,
+                score_threshold=score_threshold,
+            )
+        search_time = time.time() - search_start
+        logger.info(
+            f"Session {session_id}: context "
+            f"{'reused' if reused else 'retrieved'} (similarity={similarity:.3f})"
+        )
+
+        generation_start = time.time()
+        options = {}
+        if state["context"]:
+            prompt = llm_service.build_conversation_prompt(
+                question, state["context"], state["summary"], state["turns"]
+            )
+            answer, state["node"], options = await llm_service.complete(
+                prompt, temperature, max_tokens=max_tokens, prefer=state["node"]
+            )
+        else:
+            answer = NO_CONTEXT_ANSWER
+        generation_time = time.time() - generation_start
+
+        state["turns"].append([question, answer])
+        if len(state["turns"]) > settings.SESSION_MAX_TURNS:
+            await self._compact(state)
+        await session_store.put(session_id, state)
+
+        return {
+            "session_id": session_id,
+            "answer": answer,
+            "question": question,
+            "sources": state["sources"],
+            "context_used": bool(state["context"]),
+            "context_reused": reused,
+            "model": settings.OLLAMA_MODEL,
+            "metrics": {
+                "search_time": search_time,
+                "generation_time": generation_time,
+                "total_time": time.time() - start_time,
+                "documents_found": len(state["chunk_ids"]),
+                "turns": len(state["turns"]),
+                **options,
+            },
+        }
+
+    async def _context_current(self, state: dict[str, Any]) -> bool:
+        # Stale once the alias moved, this worker changed the index, or any of
+        # the cached chunks (or the parents they expanded to) is gone.
+        if (state.get("collection"), state.get("generation")) != (
+            db.collection_name,
+            db.generation,
+        ):
+            return False
+        if self._changed_at >= state.get("retrieved_at", 0.0):
+            return False
+        ids = state["chunk_ids"]
+        found = {doc.id for doc in await asyncio.to_thread(db.get_by_ids, ids)}
+        missing = [id for id in ids if id not in found]
+        if missing:
+            parents = await db.get_parent_documents(missing)
+            missing = [id for id in missing if id not in parents]
+        return not missing
+
+    @staticmethod
+    async def _compact(state: dict[str, Any]) -> None:
+        # Older turns are folded into the summary. This changes the prompt
+        # prefix, so it happens once every few turns rather than on each one.
+        split = len(state["turns"]) - settings.SESSION_MAX_TURNS // 2
+        folded, state["turns"] = state["turns"][:split], state["turns"][split:]
+        try:
+            state["summary"] = await llm_service.summarize(state["summary"], folded)
+        except Exception as e:
+            logger.warning(f"Failed to summarize conversation, dropping turns: {e}")
+
+    async def get(self, session_id: str) -> dict[str, Any] | None:
+        state = await session_store.get(session_id)
+        if state is None:
+            return None
+        return {
+            "session_id": session_id,
+            "turns": len(state["turns"]),
+            "summary": state["summary"],
+            "chunk_ids": state["chunk_ids"],
+            "sources": state["sources"],
+        }
+
+    async def delete(self, session_id: str) -> bool:
+        return await session_store.delete(session_id)
+
+
+conversation_service = ConversationService()
@@ -1,30 +1,28 @@
+import asyncio
 import hashlib
+import importlib
 import os
 import tempfile
 from pathlib import Path
+from typing import AsyncIterator
 
 from fastapi import UploadFile
-from langchain_community.document_loaders import (
-    TextLoader,
-    PyPDFLoader,
-    Docx2txtLoader,
-    UnstructuredMarkdownLoader,
-    UnstructuredEPubLoader,
-)
-from langchain_community.document_loaders.parsers.audio import FasterWhisperParser
-from langchain_community.document_loaders.generic import GenericLoader
-from langchain_community.document_loaders.blob_loaders import FileSystemBlobLoader
 from langchain_core.documents import Document
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.parsed_store import parsed_store
+from app.services.pdf_extraction import count_pages, pdf_extractor
 
 
 class DocumentLoader:
+    # Loader classes are imported on first use: the Unstructured and Whisper
+    # stacks take seconds and hundreds of MB to import.
     LOADER_MAPPING = {
-        ".txt": TextLoader,
-        ".pdf": PyPDFLoader,
-        ".docx": Docx2txtLoader,
-        ".md": UnstructuredMarkdownLoader,
-        ".epub": UnstructuredEPubLoader,
+        ".txt": "langchain_community.document_loaders:TextLoader",
+        ".pdf": "langchain_community.document_loaders:PyPDFLoader",
+        ".docx": "langchain_community.document_loaders:Docx2txtLoader",
+        ".md": "langchain_community.document_loaders:UnstructuredMarkdownLoader",
+        ".epub": "langchain_community.document_loaders:UnstructuredEPubLoader",
         ".mp3": "audio",
         ".wav": "audio",
         ".m4a": "audio",
@@ -32,6 +30,11 @@ class DocumentLoader:
         ".flac": "audio",
     }
 
+    @classmethod
+    def _get_loader_class(cls, extension: str) -> type:
+        module_name, class_name = cls.LOADER_MAPPING[extension].split(":")
+        return getattr(importlib.import_module(module_name), class_name)
+
     @classmethod
     def _get_file_hash(cls, file_path: Path) -> str:
         try:
@@ -42,27 +45,36 @@ class DocumentLoader:
             return ""
 
     @classmethod
-    def _enrich_metadata(
-        cls, docs: list[Document], file_path: Path, original_name: str | None = None
-    ) -> None:
-        file_name = original_name or file_path.name
+    def _file_metadata(
+        cls, file_path: Path, original_name: str | None, file_hash: str | None
+    ) -> dict:
         file_stats = file_path.stat()
+        if file_hash is None:
+            file_hash = cls._get_file_hash(file_path)
+
+        return {
+            "source": original_name or file_path.name,
+            "file_type": file_path.suffix.lower()[1:],
+            "file_path": str(file_path),
+            "file_size": file_stats.st_size,
+            "created_at": file_stats.st_ctime,
+            "modified_at": file_stats.st_mtime,
+            "file_hash": file_hash,
+        }
 
-        file_hash = cls._get_file_hash(file_path)
+    @classmethod
+    def _enrich_metadata(
+        cls,
+        docs: list[Document],
+        file_path: Path,
+        original_name: str | None = None,
+        file_hash: str | None = None,
+    ) -> None:
+        file_metadata = cls._file_metadata(file_path, original_name, file_hash)
 
         for i, doc in enumerate(docs):
             doc.metadata.update(
-                {
-                    "source": file_name,
-                    "file_type": file_path.suffix.lower()[1:],
-                    "file_path": str(file_path),
-                    "file_size": file_stats.st_size,
-                    "created_at": file_stats.st_ctime,
-                    "modified_at": file_stats.st_mtime,
-                    "file_hash": file_hash,
-                    "chunk_index": i,
-                    "total_chunks": len(docs),
-                }
+                {**file_metadata, "chunk_index": i, "total_chunks": len(docs)}
             )
             # for .pdf, .docx
             if "page" in doc.metadata:
@@ -70,6 +82,10 @@ class DocumentLoader:
 
     @classmethod
     async def load_document(cls, file_path: str | Path) -> list[Document] | None:
+        return [doc async for doc in cls.iter_document(file_path)]
+
+    @classmethod
+    async def iter_document(cls, file_path: str | Path) -> AsyncIterator[Document]:
         file_path = Path(file_path)
 
         if not file_path.exists():
@@ -83,51 +99,113 @@ class DocumentLoader:
                 f"Supported formats: {list(cls.LOADER_MAPPING.keys())}"
             )
 
-        try:
-            if extension in {".mp3", ".wav", ".m4a", ".ogg", ".flac"}:
-                parser = FasterWhisperParser(
-                    model_size="tiny",
-                    device="cpu",
-                )
-                blob_loader = FileSystemBlobLoader(
-                    str(file_path.parent), glob=file_path.name
+        # Parsing and especially transcription are the slow part of ingestion;
+        # a file we've seen before is served from the parsed-text store.
+        file_hash = cls._get_file_hash(file_path)
+        if file_hash:
+            cached = await parsed_store.get(file_hash)
+            if cached is not None:
+                cls._enrich_metadata(cached, file_path, file_hash=file_hash)
+                logger.info(
+                    f"Parsed text cache hit: {file_path.name} → {len(cached)} parts"
                 )
-                loader = GenericLoader(blob_loader, parser)
+                for doc in cached:
+                    yield doc
+                return
 
-                documents = loader.load()
-                cls._enrich_metadata(documents, file_path)
-                for doc in documents:
+        try:
+            if extension == ".pdf" and (
+                await asyncio.to_thread(count_pages, str(file_path))
+                >= settings.PDF_PARALLEL_MIN_PAGES
+            ):
+                file_metadata = cls._file_metadata(file_path, None, file_hash)
+                count = 0
+                async for doc in pdf_extractor.iter_pages(file_path):
                     doc.metadata.update(
                         {
-                            "transcription": True,
-                            "transcription_model": "faster-whisper",
-                            "transcription_model_size": "tiny",
+                            **file_metadata,
+                            "chunk_index": doc.metadata["page"],
+                            "total_chunks": doc.metadata["total_pages"],
+                            "page_number": doc.metadata["page"] + 1,
                         }
                     )
+                    count += 1
+                    yield doc
+                logger.info(f"Extracted {count} pages from {file_path.name}")
+                return
 
-                logger.info(
-                    f"Audio transcribed: {file_path.name} → {len(documents)} segments"
-                )
-            else:
-                loader_class = cls.LOADER_MAPPING[extension]
-                loader = loader_class(str(file_path))
-
-                documents = loader.load()
-                cls._enrich_metadata(documents, file_path)
-                logger.info(
-                    f"Successfully loaded {len(documents)} pages from {file_path.name}"
-                )
-            return documents
+            documents = await asyncio.to_thread(
+                cls._parse, file_path, extension, file_hash
+            )
         except Exception as e:
             logger.error(f"Failed to load document {file_path}: {e}")
             raise
 
+        for doc in documents:
+            yield doc
+
+    @classmethod
+    def _parse(cls, file_path: Path, extension: str, file_hash: str) -> list[Document]:
+        if extension in {".mp3", ".wav", ".m4a", ".ogg", ".flac"}:
+            from langchain_community.document_loaders.blob_loaders import (
+                FileSystemBlobLoader,
+            )
+            from langchain_community.document_loaders.generic import GenericLoader
+            from langchain_community.document_loaders.parsers.audio import (
+                FasterWhisperParser,
+            )
+
+            parser = FasterWhisperParser(
+                model_size="tiny",
+                device="cpu",
+            )
+            blob_loader = FileSystemBlobLoader(
+                str(file_path.parent), glob=file_path.name
+            )
+            loader = GenericLoader(blob_loader, parser)
+
+            documents = loader.load()
+            cls._enrich_metadata(documents, file_path, file_hash=file_hash)
+            for doc in documents:
+                doc.metadata.update(
+                    {
+                        "transcription": True,
+                        "transcription_model": "faster-whisper",
+                        "transcription_model_size": "tiny",
+                    }
+                )
+
+            logger.info(
+                f"Audio transcribed: {file_path.name} → {len(documents)} segments"
+            )
+        else:
+            loader_class = cls._get_loader_class(extension)
+            loader = loader_class(str(file_path))
+
+            documents = loader.load()
+            cls._enrich_metadata(documents, file_path, file_hash=file_hash)
+            logger.info(
+                f"Successfully loaded {len(documents)} pages from {file_path.name}"
+            )
+        return documents
+
     @classmethod
     async def load_from_uploaded_file(
         cls,
         uploaded_file: UploadFile,
         original_filename: str | None = None,
     ) -> list[Document]:
+        return [
+            doc
+            async for doc in cls.iter_uploaded_file(uploaded_file, original_filename)
+        ]
+
+    @classmethod
+    async def iter_uploaded_file(
+        cls,
+        uploaded_file: UploadFile,
+        original_filename: str | None = None,
+    ) -> AsyncIterator[Document]:
         filename = original_filename or uploaded_file.filename or "unknown"
         suffix = Path(filename).suffix.lower()
 
@@ -137,20 +215,22 @@ class DocumentLoader:
                 f"Unsupported format: {suffix}. Supported formats are: {supported}"
             )
 
+        # The temporary file has to outlive the whole iteration: large PDFs are
+        # still being extracted while the first pages are chunked.
         tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
         try:
             content = await uploaded_file.read()
             tmp_file.write(content)
             tmp_file.close()
 
-            file_path = Path(tmp_file.name)
-            documents = await cls.load_document(file_path)
-            for doc in documents:
+            count = 0
+            async for doc in cls.iter_document(Path(tmp_file.name)):
                 doc.metadata["source"] = filename
+                count += 1
+                yield doc
             logger.info(
-                f"The document was uploaded successfully: {filename} → {len(documents)} parts"
+                f"The document was uploaded successfully: {filename} → {count} parts"
             )
-            return documents
 
         except Exception as e:
             logger.error(f"Error while uploading a document {filename}: {e}")
@@ -1,46 +1,71 @@
-from typing import TypedDict, Literal, Any
+import re
+from typing import TypedDict, Any
 
-from langgraph.graph import StateGraph, END
 from langchain_core.documents import Document
 
+from app.core.config import settings
+from app.core.database import db
+from app.core.deadline import DeadlineExceeded, guard
 from app.core.logger import logger
+from app.core.resilience import CircuitOpenError
+from app.services.intent import intent_router
 from app.services.retrieval import retrieval_service
 from app.services.llm import llm_service
 
 
 class GraphState(TypedDict):
     query: str
-    query_type: Literal["search", "question", "greeting"]
+    # "question", "search" or the name of an intent answered directly
+    query_type: str
+    query_vector: list[float] | None
     documents: list[Document]
     context: str
     answer: str
     sources: list[dict[str, Any]]
     error: str | None
+    degraded: bool
     top_k: int
     temperature: float
+    max_tokens: int | None
+    llm_options: dict[str, int]
 
 
 class QueryRouter:
-    GREETING_KEYWORDS = ["hello", "hey"]
-    SEARCH_KEYWORDS = ["find", "search", "show", "list"]
+    GREETING_KEYWORDS = {"hello", "hey"}
+    SEARCH_KEYWORDS = {"find", "search", "show", "list"}
 
     @staticmethod
-    def route(state: GraphState) -> GraphState:
-        query = state["query"].lower()
-        if any(keyword in query for keyword in QueryRouter.GREETING_KEYWORDS):
-            logger.info("Query type: greeting")
-            state["query_type"] = "greeting"
-            return state
-
-        if any(keyword in query for keyword in QueryRouter.SEARCH_KEYWORDS):
-            logger.info("Query type: search")
-            state["query_type"] = "search"
-            return state
+    async def route(state: GraphState) -> GraphState:
+        if settings.INTENT_ROUTER_ENABLED:
+            try:
+                # The search node reuses this vector instead of embedding again.
+                vector = await guard(
+                    db.embeddings.aembed_query(state["query"]), "retrieval"
+                )
+                query_type, score = await intent_router.classify(vector)
+                logger.info(f"Query type: {query_type} (similarity={score:.3f})")
+                state["query_vector"] = vector
+                state["query_type"] = query_type
+                return state
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning(f"Intent routing failed, using keywords: {e}")
 
-        logger.info("Query type: question")
-        state["query_type"] = "question"
+        state["query_type"] = QueryRouter.route_by_keywords(state["query"])
+        logger.info(f"Query type: {state['query_type']}")
         return state
 
+    @staticmethod
+    def route_by_keywords(query: str) -> str:
+        # Whole words only: "showcase" is not "show", "they" is not "hey".
+        words = set(re.findall(r"\w+", query.lower()))
+        if words & QueryRouter.GREETING_KEYWORDS:
+            return "greeting"
+        if words & QueryRouter.SEARCH_KEYWORDS:
+            return "search"
+        return "question"
+
 
 class GraphNodes:
     @staticmethod
@@ -49,7 +74,10 @@ class GraphNodes:
             logger.info(f"Searching for: '{state['query']}'")
 
             documents = await retrieval_service.search(
-                query=state["query"], k=state.get("top_k", 4), score_threshold=0.0
+                query=state["query"],
+                k=state.get("top_k", 4),
+                score_threshold=0.0,
+                vector=state.get("query_vector"),
             )
 
             state["documents"] = documents
@@ -57,6 +85,8 @@ class GraphNodes:
 
             return state
 
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Search node failed: {e}")
             state["error"] = str(e)
@@ -99,13 +129,25 @@ class GraphNodes:
                 question=state["query"],
                 context=state.get("context", ""),
                 temperature=state.get("temperature", 0.7),
+                max_tokens=state.get("max_tokens"),
             )
 
             state["answer"] = response["answer"]
+            state["llm_options"] = response.get("options", {})
             logger.info("Answer generated")
 
             return state
 
+        except DeadlineExceeded:
+            raise
+        except CircuitOpenError as e:
+            # Generation is down: answer with the retrieved passages instead.
+            logger.warning(f"Generate answer node degraded: {e}")
+            state["answer"] = retrieval_service.format_results(
+                state.get("documents", [])
+            )
+            state["degraded"] = True
+            return state
         except Exception as e:
             logger.error(f"Generate answer node failed: {e}")
             state["error"] = str(e)
@@ -113,36 +155,18 @@ class GraphNodes:
             return state
 
     @staticmethod
-    async def greeting_node(state: GraphState) -> GraphState:
-        state["answer"] = (
-            "Hello! I'm a RAG-powered assistant. "
-            "I can help you find information in the uploaded documents. "
-            "Just ask me a question!"
-        )
+    async def reply_node(state: GraphState) -> GraphState:
+        state["answer"] = intent_router.response(state["query_type"])
         state["sources"] = []
         state["context"] = ""
 
-        logger.info("Greeting response generated")
+        logger.info(f"Replied to {state['query_type']} without retrieval")
 
         return state
 
     @staticmethod
     def search_only_node(state: GraphState) -> GraphState:
-        documents = state.get("documents", [])
-
-        if not documents:
-            state["answer"] = "No documents found matching your query."
-        else:
-            results = []
-            for i, doc in enumerate(documents, 1):
-                filename = doc.metadata.get("filename", "Unknown")
-                score = doc.metadata.get("relevance_score", 0)
-                results.append(
-                    f"{i}. {filename} (relevance: {score:.2f})\n"
-                    f"   {doc.page_content[:200]}..."
-                )
-
-            state["answer"] = "Found documents:\n\n" + "\n\n".join(results)
+        state["answer"] = retrieval_service.format_results(state.get("documents", []))
 
         logger.info("Search results formatted")
 
@@ -151,15 +175,24 @@ class GraphNodes:
 
 class LangGraphService:
     def __init__(self):
-        self.graph = self._build_graph()
+        self._graph = None
+
+    @property
+    def graph(self):
+        # langgraph is heavy to import; compile the graph on first request.
+        if self._graph is None:
+            self._graph = self._build_graph()
+        return self._graph
+
+    def _build_graph(self):
+        from langgraph.graph import StateGraph, END
 
-    def _build_graph(self) -> StateGraph:
         workflow = StateGraph(GraphState)
         workflow.add_node("route", QueryRouter.route)
         workflow.add_node("search", GraphNodes.search_node)
         workflow.add_node("format_context", GraphNodes.format_context_node)
         workflow.add_node("generate_answer", GraphNodes.generate_answer_node)
-        workflow.add_node("greeting", GraphNodes.greeting_node)
+        workflow.add_node("reply", GraphNodes.reply_node)
         workflow.add_node("search_only", GraphNodes.search_only_node)
 
         workflow.set_entry_point("route")
@@ -167,24 +200,24 @@ class LangGraphService:
         def route_query(state: GraphState) -> str:
             query_type = state.get("query_type", "question")
 
-            if query_type == "greeting":
-                return "greeting"
-            elif query_type == "search":
+            if query_type == "search":
                 return "search_for_list"
-            else:
+            elif query_type == "question":
                 return "search_for_qa"
+            else:
+                return "reply"
 
         workflow.add_conditional_edges(
             "route",
             route_query,
             {
-                "greeting": "greeting",
+                "reply": "reply",
                 "search_for_list": "search",
                 "search_for_qa": "search",
             },
         )
 
-        workflow.add_edge("greeting", END)
+        workflow.add_edge("reply", END)
 
         workflow.add_conditional_edges(
             "search",
@@ -199,20 +232,28 @@ class LangGraphService:
         return workflow.compile()
 
     async def process(
-        self, query: str, top_k: int = 4, temperature: float = 0.7
+        self,
+        query: str,
+        top_k: int = 4,
+        temperature: float = 0.7,
+        max_tokens: int | None = None,
     ) -> dict[str, Any]:
         try:
             logger.info(f"Processing query through graph: '{query[:50]}...'")
             initial_state: GraphState = {
                 "query": query,
                 "query_type": "question",
+                "query_vector": None,
                 "documents": [],
                 "context": "",
                 "answer": "",
                 "sources": [],
                 "error": None,
+                "degraded": False,
                 "top_k": top_k,
                 "temperature": temperature,
+                "max_tokens": max_tokens,
+                "llm_options": {},
             }
 
             result = await self.graph.ainvoke(initial_state)
@@ -226,8 +267,13 @@ class LangGraphService:
                 "sources": result.get("sources", []),
                 "context_used": bool(result.get("context")),
                 "error": result.get("error"),
+                "degraded": result.get("degraded", False),
+                "llm_options": result.get("llm_options", {}),
             }
 
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.warning(f"Graph processing aborted: {e}")
+            raise
         except Exception as e:
             logger.error(f"Graph processing failed: {e}", exc_info=True)
             return {
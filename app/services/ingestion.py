@@ -0,0 +1,379 @@
+import asyncio
+import codecs
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, AsyncIterable, AsyncIterator
+
+from langchain_core.documents import Document
+
+from app.core.aliases import collection_aliases
+from app.core.config import settings
+from app.core.database import db
+from app.core.document_registry import document_registry
+from app.core.leases import leases
+from app.core.logger import logger
+from app.core.parsed_store import parsed_store
+from app.services.chunking import ChunkingStrategy, chunking_service
+from app.services.migration import SHADOW_LEASE, ShadowCollection, point_alias
+
+
+async def iterate(items: list) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+class IngestionService:
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.reindex_status: dict[str, Any] = {"running": False}
+        self._reindex_task: asyncio.Task | None = None
+
+    @staticmethod
+    async def decode_stream(
+        byte_stream: AsyncIterator[bytes], encoding: str = "utf-8"
+    ) -> AsyncIterator[str]:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        async for data in byte_stream:
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    @staticmethod
+    async def iter_ndjson(
+        parts: AsyncIterator[str],
+    ) -> AsyncIterator[dict[str, Any]]:
+        pending: list[str] = []
+        async for part in parts:
+            *lines, rest = part.split("\n")
+            if lines:
+                lines[0] = "".join(pending) + lines[0]
+                pending = []
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+            if rest:
+                pending.append(rest)
+
+        line = "".join(pending)
+        if line.strip():
+            yield json.loads(line)
+
+    async def chunk_ndjson(
+        self, parts: AsyncIterator[str], metadata: dict[str, Any] | None = None
+    ) -> AsyncIterator[Document]:
+        async for record in self.iter_ndjson(parts):
+            if "text" not in record:
+                raise ValueError("NDJSON record is missing the 'text' field")
+            record_metadata = {**(metadata or {}), **(record.get("metadata") or {})}
+            for chunk in await chunking_service.split_text(
+                text=record["text"], metadata=record_metadata
+            ):
+                yield chunk
+
+    async def index_documents(
+        self,
+        documents: list[Document],
+        strategy: ChunkingStrategy = "recursive",
+        record: bool = True,
+        into: ShadowCollection | None = None,
+    ) -> list[str]:
+        if into is None:
+            db.check_writable()
+        if record:
+            await self._record(documents, strategy)
+
+        if strategy == "parent_child":
+            parents, chunks = await chunking_service.split_parent_child(documents)
+            await db.add_parent_documents(
+                parents, collection=into.name if into is not None else None
+            )
+        else:
+            chunks = await chunking_service.split_documents(
+                documents, strategy=strategy
+            )
+
+        return await self.add_chunks(iterate(chunks), into=into)
+
+    async def index_document_stream(
+        self,
+        documents: AsyncIterable[Document],
+        strategy: ChunkingStrategy = "recursive",
+    ) -> list[str]:
+        return await self.add_chunks(self._chunk_stream(documents, strategy))
+
+    async def _chunk_stream(
+        self, documents: AsyncIterable[Document], strategy: ChunkingStrategy
+    ) -> AsyncIterator[Document]:
+        # Pages are chunked and embedded as they arrive, so a large PDF's first
+        # batches are indexed while later pages are still being extracted.
+        recorded: set[str] = set()
+        offset = 0
+        async for doc in documents:
+            file_hash = doc.metadata.get("file_hash")
+            if file_hash in recorded:
+                await parsed_store.append(file_hash, [doc], strategy)
+            else:
+                await self._record([doc], strategy)
+                recorded.add(doc.metadata["file_hash"])
+
+            if strategy == "parent_child":
+                parents, chunks = await chunking_service.split_parent_child([doc])
+                await db.add_parent_documents(parents)
+            else:
+                chunks = await chunking_service.split_documents([doc], strategy)
+
+            for chunk in chunks:
+                chunk.metadata["chunk_id"] += offset
+                yield chunk
+            offset += len(chunks)
+
+    async def _record(
+        self, documents: list[Document], strategy: ChunkingStrategy
+    ) -> None:
+        # Keep the parsed text so the corpus can be re-chunked and re-embedded
+        # without the original files.
+        by_hash: dict[str, list[Document]] = {}
+        for doc in documents:
+            file_hash = doc.metadata.get("file_hash")
+            if not file_hash:
+                file_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+                doc.metadata["file_hash"] = file_hash
+            by_hash.setdefault(file_hash, []).append(doc)
+
+        for file_hash, file_documents in by_hash.items():
+            await parsed_store.put(file_hash, file_documents, strategy)
+
+    async def add_chunks(
+        self,
+        chunks: AsyncIterable[Document],
+        record_as: str | None = None,
+        into: ShadowCollection | None = None,
+    ) -> list[str]:
+        if into is None:
+            db.check_writable()
+        ids = []
+        batch = []
+        try:
+            async for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= self.batch_size:
+                    ids.extend(await self._flush(batch, record_as, into))
+                    batch = []
+
+            if batch:
+                ids.extend(await self._flush(batch, record_as, into))
+
+            logger.info(f"Ingested {len(ids)} chunks in batches of {self.batch_size}")
+            return ids
+
+        except Exception as e:
+            logger.error(f"Ingestion failed after {len(ids)} chunks: {e}")
+            raise
+
+    async def _flush(
+        self,
+        batch: list[Document],
+        record_as: str | None = None,
+        into: ShadowCollection | None = None,
+    ) -> list[str]:
+        if record_as:
+            # Streams are never held in memory whole, so their chunks are
+            # what gets kept for re-indexing.
+            for chunk in batch:
+                chunk.metadata["file_hash"] = record_as
+            await parsed_store.append(record_as, batch, "recursive")
+
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = await document_registry.register(
+            [chunk.metadata for chunk in batch]
+        )
+        if into is not None:
+            ids = [str(uuid.uuid4()) for _ in batch]
+            await into.embed_and_write(ids, texts, metadatas)
+            return ids
+        return await db.add_documents(texts, metadatas)
+
+    async def delete_documents(self, filter: dict[str, Any]) -> None:
+        # Filters name file-level fields, so resolve them to doc_ids first.
+        resolved = await document_registry.resolve_filter(filter)
+        if resolved is not None:
+            await self.delete_resolved(resolved)
+
+    @staticmethod
+    async def delete_resolved(resolved: dict[str, Any]) -> None:
+        await db.delete_where(resolved)
+        # Only whole documents take their registry entries with them; a filter
+        # with chunk-level conditions leaves other chunks pointing at them.
+        if resolved.keys() == {"doc_id"}:
+            await document_registry.delete(resolved["doc_id"]["$in"])
+
+    async def reindex(
+        self, strategy: ChunkingStrategy | None = None, concurrency: int = None
+    ) -> dict[str, Any]:
+        async with leases.hold(SHADOW_LEASE) as held:
+            if not held:
+                raise RuntimeError(
+                    "A migration or re-index is running in another worker"
+                )
+            return await self._reindex(strategy, concurrency)
+
+    async def _reindex(
+        self, strategy: ChunkingStrategy | None, concurrency: int | None
+    ) -> dict[str, Any]:
+        # The new collection is built next to the live one, which keeps
+        # serving searches, and the alias is pointed at it only once complete.
+        alias = settings.COLLECTION_NAME
+        job = await asyncio.to_thread(collection_aliases.shadow_job, alias)
+        if job is not None and job["kind"] != "reindex":
+            raise RuntimeError(f"Collection '{job['name']}' belongs to a {job['kind']}")
+        if job is not None:
+            # Left behind by a worker that died mid re-index.
+            await self._discard(
+                await asyncio.to_thread(ShadowCollection, job["name"], job["model"])
+            )
+        await db.refresh(force=True)
+        db.check_writable()
+
+        target = f"{alias}_reindex_{int(time.time())}"
+        self.reindex_status = {
+            "running": True,
+            "source": db.collection_name,
+            "target": target,
+            "files_total": None,
+            "files_done": 0,
+            "chunks": 0,
+            "duplicates": 0,
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+        }
+
+        collection = None
+        swapped = False
+        try:
+            collection = await asyncio.to_thread(
+                ShadowCollection, target, db.embedding_model
+            )
+            # Uploads and deletes made meanwhile reach it too, in every worker.
+            db.shadow = collection
+            await asyncio.to_thread(
+                collection_aliases.set_shadow,
+                alias,
+                target,
+                db.embedding_model,
+                "reindex",
+            )
+            # Listed only once the shadow is published: a file recorded later
+            # is dual-written by its upload instead.
+            files = await parsed_store.list_files()
+            # Chunks restored from a version 1 snapshot have no parsed text.
+            if not files and await asyncio.to_thread(db.count):
+                raise RuntimeError("No parsed texts to re-index the collection from")
+            self.reindex_status["files_total"] = len(files)
+            logger.warning(f"Re-indexing {len(files)} files into '{target}'")
+
+            semaphore = asyncio.Semaphore(concurrency or settings.REINDEX_CONCURRENCY)
+            written: dict[str, list[str]] = {}
+
+            async def reindex_file(entry: dict) -> None:
+                async with semaphore:
+                    documents = await parsed_store.get(entry["file_hash"])
+                    if documents:
+                        ids = await self.index_documents(
+                            documents,
+                            strategy=strategy or entry["strategy"] or "recursive",
+                            record=False,
+                            into=collection,
+                        )
+                        written[entry["file_hash"]] = ids
+                        self.reindex_status["chunks"] += len(ids)
+                    self.reindex_status["files_done"] += 1
+
+            await asyncio.gather(*(reindex_file(entry) for entry in files))
+            await self._drop_duplicates(collection, written)
+
+            self.reindex_status["previous"] = await point_alias(target)
+            swapped = True
+            logger.info(
+                f"Re-indexed {len(files)} files into "
+                f"{self.reindex_status['chunks']} chunks in '{target}'"
+            )
+        except Exception as e:
+            logger.error(f"Re-index failed: {e}")
+            self.reindex_status["error"] = str(e)
+            raise
+        finally:
+            if not swapped:
+                await self._discard(collection)
+            self.reindex_status["running"] = False
+            self.reindex_status["finished_at"] = time.time()
+
+        return self.reindex_status
+
+    async def _drop_duplicates(
+        self, collection: ShadowCollection, written: dict[str, list[str]]
+    ) -> None:
+        # A file uploaded while it was being re-indexed is in the collection
+        # twice: rebuilt from its parsed text and dual-written by the upload.
+        # The upload's copy is the one the live collection has, so it stays.
+        ours = {id for ids in written.values() for id in ids}
+        parent_ids: dict[str, str] = {}
+        doc_ids = set()
+        batches = collection.iter_batches(settings.MIGRATION_BATCH_SIZE)
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            ids, _, _, metadatas = batch
+            for id, metadata in zip(ids, metadatas):
+                metadata = metadata or {}
+                if id in ours:
+                    if metadata.get("parent_id"):
+                        parent_ids[id] = metadata["parent_id"]
+                elif metadata.get("doc_id"):
+                    doc_ids.add(metadata["doc_id"])
+
+        registered = await document_registry.get_many(list(doc_ids))
+        uploaded = {metadata.get("file_hash") for metadata in registered.values()}
+        duplicates = [id for h in uploaded & written.keys() for id in written[h]]
+        if not duplicates:
+            return
+        await asyncio.to_thread(collection.delete_ids, duplicates)
+        parents = list({parent_ids[id] for id in duplicates if id in parent_ids})
+        if parents:
+            await db.docstore.delete_where(
+                collection.name, {"parent_id": {"$in": parents}}
+            )
+        self.reindex_status["chunks"] -= len(duplicates)
+        self.reindex_status["duplicates"] = len(duplicates)
+        logger.info(f"Dropped {len(duplicates)} re-indexed chunks of uploaded files")
+
+    @staticmethod
+    async def _discard(collection: ShadowCollection | None) -> None:
+        # The live collection was never touched, so search is unaffected.
+        db.shadow = None
+        await asyncio.to_thread(
+            collection_aliases.set_shadow, settings.COLLECTION_NAME, None
+        )
+        if collection is None:
+            return
+        try:
+            await collection.drop()
+        except Exception as e:
+            logger.warning(f"Failed to drop collection '{collection.name}': {e}")
+
+    async def start_reindex(
+        self, strategy: ChunkingStrategy | None = None, concurrency: int = None
+    ) -> None:
+        if self.reindex_status.get("running") or await leases.held(SHADOW_LEASE):
+            raise RuntimeError("A migration or re-index is already running")
+
+        task = asyncio.create_task(self.reindex(strategy, concurrency))
+        # Failures are recorded in reindex_status; don't let them go unretrieved.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._reindex_task = task
+
+
+ingestion_service = IngestionService()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.logger import logger
+
+# "search" lists matching documents without generation; any intent with a
+# "response" is answered with it directly, skipping retrieval entirely.
+DEFAULT_INTENTS = {
+    "greeting": {
+        "examples": [
+            "hello",
+            "hi there",
+            "hey, how are you?",
+            "good morning",
+            "thanks, bye",
+            "привет",
+            "здравствуйте",
+            "спасибо, пока",
+        ],
+        "response": (
+            "Hello! I'm a RAG-powered assistant. "
+            "I can help you find information in the uploaded documents. "
+            "Just ask me a question!"
+        ),
+    },
+    "search": {
+        "examples": [
+            "find documents about",
+            "search for files mentioning",
+            "show me all documents on",
+            "list the reports about",
+            "найди документы про",
+            "покажи все файлы о",
+        ],
+    },
+}
+
+
+class IntentRouter:
+    # Classifies the query embedding against one centroid per intent. The
+    # same vector is reused for retrieval, so routing costs one matrix-vector
+    # product once the centroids are built.
+    def __init__(self, intents: dict[str, dict[str, Any]] = None):
+        self.intents = intents or self.load_intents()
+        self.names = list(self.intents)
+        self.thresholds = np.array(
+            [
+                intent.get("threshold", settings.INTENT_THRESHOLD)
+                for intent in self.intents.values()
+            ],
+            dtype=np.float32,
+        )
+        self._centroids: np.ndarray | None = None
+        self._model: str | None = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def load_intents() -> dict[str, dict[str, Any]]:
+        if not settings.INTENTS_PATH:
+            return DEFAULT_INTENTS
+        intents = json.loads(Path(settings.INTENTS_PATH).read_text())
+        for name, intent in intents.items():
+            if not intent.get("examples"):
+                raise ValueError(f"Intent '{name}' has no examples")
+            if name not in ("search", "greeting") and not intent.get("response"):
+                raise ValueError(f"Intent '{name}' has no response")
+        return intents
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    async def get_centroids(self) -> np.ndarray:
+        # Rebuilt when the collection switches embedding models.
+        if self._centroids is not None and self._model == db.embedding_model:
+            return self._centroids
+
+        async with self._lock:
+            if self._centroids is None or self._model != db.embedding_model:
+                model = db.embedding_model
+                examples = [
+                    example
+                    for intent in self.intents.values()
+                    for example in intent["examples"]
+                ]
+                vectors = self._normalize(
+                    np.asarray(
+                        await db.embeddings.aembed_documents(examples),
+                        dtype=np.float32,
+                    )
+                )
+                centroids, start = [], 0
+                for intent in self.intents.values():
+                    end = start + len(intent["examples"])
+                    centroids.append(vectors[start:end].mean(axis=0))
+                    start = end
+                self._centroids = self._normalize(np.stack(centroids))
+                self._model = model
+                logger.info(
+                    f"Intent centroids built for {', '.join(self.names)} "
+                    f"from {len(examples)} examples"
+                )
+        return self._centroids
+
+    async def classify(self, vector: list[float]) -> tuple[str, float]:
+        centroids = await self.get_centroids()
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        similarities = centroids @ query
+        best = int(np.argmax(similarities))
+        score = float(similarities[best])
+        if score >= self.thresholds[best]:
+            return self.names[best], score
+        return "question", score
+
+    def response(self, intent: str) -> str:
+        return (
+            self.intents.get(intent, {}).get("response")
+            or DEFAULT_INTENTS["greeting"]["response"]
+        )
+
+
+intent_router = IntentRouter()
@@ -1,29 +1,45 @@
+import asyncio
+from pathlib import Path
 from typing import Any
 
 from app.core.cache import get_llm_cache_key, llm_response_cache
+from app.core.deadline import guard
 from app.core.logger import logger
-from langchain_community.llms import Ollama
-from langchain_core.prompts import PromptTemplate
-from langchain_classic.chains import LLMChain
+from app.core.ollama_pool import OllamaPool, parse_urls
+from app.core.resilience import backends
+from app.services.chunking import estimate_tokens
 
 from app.core.config import settings
 
 
 class LLMService:
     def __init__(self):
-        self.llm = None
-        self._initialize_llm()
+        self._pool = None
+        self._tokenizer = None
+
+    @property
+    def pool(self) -> OllamaPool:
+        # Created on first use so that importing the service stays cheap.
+        if self._pool is None:
+            self._initialize_pool()
+        return self._pool
+
+    def _initialize_pool(self):
+        from langchain_community.llms import Ollama
 
-    def _initialize_llm(self):
         try:
             logger.info(f"Initializing Ollama LLM: {settings.OLLAMA_MODEL}")
-            logger.info(f"Ollama URL: {settings.OLLAMA_BASE_URL}")
 
-            self.llm = Ollama(
-                base_url=settings.OLLAMA_BASE_URL,
-                model=settings.OLLAMA_MODEL,
-                temperature=0.7,
-                timeout=settings.OLLAMA_TIMEOUT,
+            self._pool = OllamaPool(
+                "generation",
+                parse_urls(settings.OLLAMA_GENERATION_URLS),
+                lambda url: Ollama(
+                    base_url=url,
+                    model=settings.OLLAMA_MODEL,
+                    temperature=0.7,
+                    timeout=settings.OLLAMA_TIMEOUT,
+                    keep_alive=settings.OLLAMA_KEEP_ALIVE,
+                ),
             )
 
             logger.info("✅ Ollama LLM initialized successfully")
@@ -32,7 +48,9 @@ class LLMService:
             logger.error(f"Failed to initialize Ollama LLM: {e}")
             raise
 
-    def get_prompt_template(self) -> PromptTemplate:
+    def get_prompt_template(self):
+        from langchain_core.prompts import PromptTemplate
+
         template = """You are a helpful AI assistant. Use the following context to answer the user's question.
 If you cannot find the answer in the context, say so honestly. Do not make up information.
 
@@ -47,31 +65,101 @@ Answer:"""
             template=template, input_variables=["context", "question"]
         )
 
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None and settings.LLM_TOKENIZER:
+            try:
+                from tokenizers import Tokenizer
+
+                path = Path(settings.LLM_TOKENIZER)
+                self._tokenizer = (
+                    Tokenizer.from_file(str(path))
+                    if path.is_file()
+                    else Tokenizer.from_pretrained(settings.LLM_TOKENIZER)
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Tokenizer '{settings.LLM_TOKENIZER}' unavailable, "
+                    f"estimating prompt sizes instead: {e}"
+                )
+                # Not retried on every request.
+                self._tokenizer = False
+        return self._tokenizer or None
+
+    def count_tokens(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text).ids)
+        # A rough estimate; err on the large side rather than truncate.
+        return int(estimate_tokens(text) * settings.LLM_TOKEN_ESTIMATE_MARGIN)
+
+    def plan_options(self, prompt: str, max_tokens: int = None) -> dict[str, int]:
+        # num_ctx is the same for every request, worker and node: Ollama
+        # reloads the model whenever it changes, which would also discard the
+        # cached prompt prefix of conversations. Only num_predict is sized.
+        prompt_tokens = self.count_tokens(prompt)
+        num_predict = max_tokens or settings.LLM_NUM_PREDICT
+        num_ctx = settings.LLM_NUM_CTX
+        if prompt_tokens >= num_ctx:
+            logger.warning(
+                f"Prompt of ~{prompt_tokens} tokens exceeds the context window "
+                f"({num_ctx}); Ollama will truncate it"
+            )
+        elif prompt_tokens + num_predict > num_ctx:
+            # Keep the whole prompt and shorten the answer instead.
+            num_predict = num_ctx - prompt_tokens
+        return {
+            "prompt_tokens": prompt_tokens,
+            "num_ctx": num_ctx,
+            "num_predict": num_predict,
+        }
+
+    async def _generate(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int = None,
+        prefer: str = None,
+    ) -> tuple[str, str | None, dict[str, int]]:
+        options = self.plan_options(prompt, max_tokens)
+
+        async def invoke(llm):
+            text = await llm.ainvoke(
+                prompt,
+                temperature=temperature,
+                num_ctx=options["num_ctx"],
+                num_predict=options["num_predict"],
+            )
+            return text, self.pool.url_of(llm)
+
+        # Cancelling the call closes the HTTP request, which makes Ollama
+        # stop generating instead of finishing an answer nobody will read.
+        text, node = await guard(
+            backends["generation"].call(lambda: self.pool.call(invoke, prefer=prefer)),
+            "generation",
+        )
+        return text.strip(), node, options
+
     async def generate_answer(
-        self, question: str, context: str, temperature: float = 0.7
+        self,
+        question: str,
+        context: str,
+        temperature: float = 0.7,
+        max_tokens: int = None,
     ) -> dict[str, Any]:
         try:
             logger.info(f"Generating answer for: '{question[:50]}...'")
 
-            cache_key = get_llm_cache_key(question, context, temperature)
+            cache_key = get_llm_cache_key(question, context, temperature, max_tokens)
 
             if cache_key in llm_response_cache:
                 cached = llm_response_cache[cache_key]
                 logger.success(f"LLM answer from cache! (key: {cache_key[:8]}...)")
                 return cached
 
-            prompt = self.get_prompt_template()
-
-            chain = LLMChain(llm=self.llm, prompt=prompt)
-
-            original_temp = self.llm.temperature
-            self.llm.temperature = temperature
-
-            result = await chain.ainvoke({"context": context, "question": question})
-
-            self.llm.temperature = original_temp
-
-            answer = result.get("text", "").strip()
+            prompt = self.get_prompt_template().format(
+                context=context, question=question
+            )
+            answer, _, options = await self._generate(prompt, temperature, max_tokens)
 
             logger.info(f"Answer generated: {answer[:100]}...")
 
@@ -80,6 +168,7 @@ Answer:"""
                 "question": question,
                 "model": settings.OLLAMA_MODEL,
                 "temperature": temperature,
+                "options": options,
             }
             llm_response_cache[cache_key] = response_data
 
@@ -89,9 +178,89 @@ Answer:"""
             logger.error(f"Failed to generate answer: {e}")
             raise
 
+    async def generate_answers(
+        self,
+        questions: list[str],
+        context: str,
+        temperature: float = 0.7,
+        max_tokens: int = None,
+    ) -> list[dict[str, Any]]:
+        # Questions that retrieved the same context are answered one after
+        # another: every prompt starts with that context, so Ollama reuses its
+        # cached prefix instead of re-reading it. Each answer keeps its own
+        # token budget and cache entry.
+        logger.info(f"Generating {len(questions)} answers from a shared context")
+        return [
+            await self.generate_answer(question, context, temperature, max_tokens)
+            for question in questions
+        ]
+
+    @staticmethod
+    def build_conversation_prompt(
+        question: str, context: str, summary: str, turns: list[list[str]]
+    ) -> str:
+        # Only ever appended to between turns, so each prompt starts with the
+        # previous one and Ollama reuses its cached prefix instead of
+        # re-reading the whole context.
+        parts = [
+            "You are a helpful AI assistant. Use the following context to answer "
+            "the user's questions.\nIf you cannot find the answer in the context, "
+            "say so honestly. Do not make up information.",
+            f"Context:\n{context}",
+        ]
+        if summary:
+            parts.append(f"Conversation so far:\n{summary}")
+        parts.extend(f"Question: {q}\nAnswer: {a}" for q, a in turns)
+        parts.append(f"Question: {question}\nAnswer:")
+        return "\n\n".join(parts)
+
+    async def complete(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = None,
+        prefer: str = None,
+    ) -> tuple[str, str | None, dict[str, int]]:
+        return await self._generate(prompt, temperature, max_tokens, prefer)
+
+    async def summarize(self, summary: str, turns: list[list[str]]) -> str:
+        conversation = "\n\n".join(
+            [summary, *(f"Question: {q}\nAnswer: {a}" for q, a in turns)]
+        ).strip()
+        prompt = (
+            "Summarize the conversation below in a few sentences. Keep names, "
+            "numbers and facts the user may refer back to.\n\n"
+            f"{conversation}\n\nSummary:"
+        )
+        text, _, _ = await self.complete(prompt, temperature=0.0)
+        return text
+
+    async def load_model(self) -> None:
+        import httpx
+
+        # An empty prompt makes Ollama load the model without generating. It
+        # is loaded with the num_ctx every request uses, or the first request
+        # would reload it.
+        async def load(client: httpx.AsyncClient, url: str):
+            response = await client.post(
+                f"{url}/api/generate",
+                json={
+                    "model": settings.OLLAMA_MODEL,
+                    "prompt": "",
+                    "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+                    "options": {"num_ctx": settings.LLM_NUM_CTX},
+                },
+            )
+            response.raise_for_status()
+
+        async with httpx.AsyncClient(timeout=settings.OLLAMA_TIMEOUT) as client:
+            await asyncio.gather(*(load(client, node.url) for node in self.pool.nodes))
+
     async def test_connection(self) -> bool:
         try:
-            response = await self.llm.ainvoke("Hello, respond with 'OK'")
+            response = await self.pool.call(
+                lambda llm: llm.ainvoke("Hello, respond with 'OK'")
+            )
             logger.info(f"Test response: {response}")
             return True
         except Exception as e:
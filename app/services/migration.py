@@ -0,0 +1,446 @@
+import asyncio
+import re
+import time
+from typing import Any
+
+from app.core.aliases import collection_aliases
+from app.core.config import settings
+from app.core.database import db
+from app.core.leases import leases
+from app.core.logger import logger
+from app.core.ollama_pool import OllamaPool
+from app.core.sharding import ShardSet
+
+POOL_NAME = "embedding-migration"
+# Migrations, re-indexes and rollbacks each replace the collection behind the
+# alias, so only one of them runs at a time across workers.
+SHADOW_LEASE = "shadow"
+
+
+class ShadowCollection:
+    # The collection being built by a migration or a re-index. Until it is
+    # swapped in it also receives every write made to the live collection.
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+        # A re-index keeps the model, and with it any embedding reduction.
+        self.pool_name = None if model == db.embedding_model else POOL_NAME
+        if self.pool_name is None:
+            self.embeddings = db.embeddings
+        else:
+            _, self.embeddings = db.create_embeddings(model, self.pool_name)
+        self.store = db.open_collection(name, self.embeddings)
+        self.store.record_embedding_model(model)
+
+    @classmethod
+    def existing(cls, name: str) -> "ShadowCollection":
+        # An existing collection keeps the model it was built with.
+        recorded = db.open_collection(name, None).recorded_embedding_model()
+        return cls(name, recorded or settings.OLLAMA_EMBEDDING_MODEL)
+
+    def write(self, ids, vectors, documents, metadatas) -> None:
+        if isinstance(self.store, ShardSet):
+            self.store.add_embeddings(ids, vectors, documents, metadatas)
+        else:
+            self.store.add_vectors(vectors, documents, metadatas, ids)
+
+    async def embed_and_write(self, ids, documents, metadatas) -> None:
+        vectors = await self.embeddings.aembed_documents(documents)
+        await asyncio.to_thread(self.write, ids, vectors, documents, metadatas)
+
+    async def add(self, ids, documents, metadatas) -> None:
+        try:
+            await self.embed_and_write(ids, documents, metadatas or [{} for _ in ids])
+        except Exception as e:
+            # Caught up by the reconciliation pass before the swap.
+            logger.warning(f"Shadow write to '{self.name}' failed: {e}")
+
+    def _delete_where(self, filter: dict) -> None:
+        if isinstance(self.store, ShardSet):
+            self.store.delete_where(db.metadata_filter(filter))
+        else:
+            self.store.delete_where(filter)
+
+    async def delete_where(self, filter: dict) -> None:
+        try:
+            await asyncio.to_thread(self._delete_where, filter)
+        except Exception as e:
+            logger.warning(f"Shadow delete from '{self.name}' failed: {e}")
+
+    def ids(self) -> set[str]:
+        return self.store.ids()
+
+    def iter_batches(self, batch_size: int):
+        if isinstance(self.store, ShardSet):
+            return self.store.iter_batches(batch_size)
+        return self.store.iter_vectors(batch_size)
+
+    def delete_ids(self, ids: list[str]) -> None:
+        if isinstance(self.store, ShardSet):
+            self.store.delete_ids(ids)
+        else:
+            self.store.delete(ids)
+
+    async def catch_up(self) -> tuple[int, int]:
+        # Matches the live collection document by document: chunks of documents
+        # missing here are copied over, documents gone from it are removed.
+        # Chunk ids can't be compared when the chunking differs.
+        batch_size = settings.MIGRATION_BATCH_SIZE
+        live = await asyncio.to_thread(db.doc_ids, db.iter_batches(batch_size))
+        own = await asyncio.to_thread(db.doc_ids, self.iter_batches(batch_size))
+
+        stale = list(own - live)
+        if stale:
+            await asyncio.to_thread(self._delete_where, {"doc_id": {"$in": stale}})
+            await db.docstore.delete_where(self.name, {"doc_id": {"$in": stale}})
+
+        missing = live - own
+        if missing:
+            await db.docstore.copy(db.collection_name, self.name, list(missing))
+            batches = db.iter_batches(batch_size)
+            while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                ids, vectors, documents, metadatas = batch
+                keep = [
+                    i
+                    for i, metadata in enumerate(metadatas)
+                    if metadata and metadata.get("doc_id") in missing
+                ]
+                if not keep:
+                    continue
+                args = (
+                    [ids[i] for i in keep],
+                    [documents[i] for i in keep],
+                    [metadatas[i] for i in keep],
+                )
+                if self.model == db.embedding_model:
+                    # Same embeddings, so the vectors are copied as they are.
+                    vectors = [vectors[i] for i in keep]
+                    await asyncio.to_thread(
+                        self.write, args[0], vectors, args[1], args[2]
+                    )
+                else:
+                    await self.embed_and_write(*args)
+
+        logger.info(
+            f"Caught up '{self.name}': {len(missing)} documents added, "
+            f"{len(stale)} removed"
+        )
+        return len(missing), len(stale)
+
+    async def drop(self) -> None:
+        if isinstance(self.store, ShardSet):
+            await asyncio.to_thread(self.store.delete)
+        else:
+            await asyncio.to_thread(self.store.drop)
+        await db.docstore.clear(self.name)
+
+    def close(self) -> None:
+        if self.pool_name is not None:
+            OllamaPool.instances.pop(self.pool_name, None)
+
+
+# Every worker dual-writes once a migration registers its shadow collection.
+db.shadow_factory = ShadowCollection
+
+
+async def point_alias(target: str) -> str:
+    # Bumps the alias generation, so the other workers re-initialize too.
+    alias = settings.COLLECTION_NAME
+    job = await asyncio.to_thread(collection_aliases.shadow_job, alias)
+    previous = await asyncio.to_thread(collection_aliases.set, alias, target)
+    try:
+        await db.initialize()
+    except Exception:
+        await asyncio.to_thread(collection_aliases.set, alias, previous)
+        if job is not None:
+            await asyncio.to_thread(
+                collection_aliases.set_shadow,
+                alias,
+                job["name"],
+                job["model"],
+                job["kind"],
+                job["ready"],
+            )
+        await db.initialize()
+        raise
+    return previous
+
+
+class EmbeddingMigration:
+    def __init__(self):
+        self.status: dict[str, Any] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @staticmethod
+    def shadow_name(model: str) -> str:
+        slug = re.sub(r"[^a-zA-Z0-9]+", "-", model).strip("-").lower()
+        return f"{settings.COLLECTION_NAME}_{slug}_{int(time.time())}"
+
+    async def start(
+        self, model: str, rate: float = None, swap: bool = True
+    ) -> dict[str, Any]:
+        if self.running:
+            raise RuntimeError("An embedding migration is already running")
+        db.check_writable()
+        job = await asyncio.to_thread(
+            collection_aliases.shadow_job, settings.COLLECTION_NAME
+        )
+        if job is not None:
+            raise RuntimeError(f"Collection '{job['name']}' belongs to a {job['kind']}")
+        if await leases.held(SHADOW_LEASE):
+            raise RuntimeError("A migration or re-index is running in another worker")
+        if model == db.embedding_model:
+            raise ValueError(f"Collection is already embedded with '{model}'")
+        if db.compressor.enabled:
+            raise ValueError(
+                "EMBEDDING_REDUCTION is fitted to the current model; "
+                "disable it before migrating"
+            )
+
+        self.status = {
+            "state": "starting",
+            "source": db.collection_name,
+            "target": self.shadow_name(model),
+            "source_model": db.embedding_model,
+            "target_model": model,
+            "rate": settings.MIGRATION_RATE if rate is None else rate,
+            "swap": swap,
+            "copied": 0,
+            "total": None,
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+        }
+        self._task = asyncio.create_task(self._run())
+        return self.status
+
+    async def _run(self) -> None:
+        status = self.status
+        shadow = None
+        # Held until the shadow is ready or swapped in, so no other migration,
+        # re-index or rollback can replace it meanwhile.
+        async with leases.hold(SHADOW_LEASE) as held:
+            try:
+                if not held:
+                    raise RuntimeError(
+                        "A migration or re-index is running in another worker"
+                    )
+                job = await asyncio.to_thread(
+                    collection_aliases.shadow_job, settings.COLLECTION_NAME
+                )
+                if job is not None:
+                    raise RuntimeError(
+                        f"Collection '{job['name']}' belongs to a {job['kind']}"
+                    )
+                shadow = await asyncio.to_thread(
+                    ShadowCollection, status["target"], status["target_model"]
+                )
+                # Writes go to both collections from here on, in every worker.
+                db.shadow = shadow
+                await asyncio.to_thread(
+                    collection_aliases.set_shadow,
+                    settings.COLLECTION_NAME,
+                    shadow.name,
+                    shadow.model,
+                    "migration",
+                )
+                # Children keep their parent_id, so their parents are copied as is.
+                await db.docstore.copy(status["source"], shadow.name)
+                status["state"] = "copying"
+                await self._copy(shadow, status["rate"])
+                status["state"] = "reconciling"
+                await self._reconcile(shadow)
+                await asyncio.to_thread(
+                    collection_aliases.mark_ready, settings.COLLECTION_NAME
+                )
+                status["state"] = "ready"
+                logger.info(
+                    f"Collection '{shadow.name}' re-embedded with '{shadow.model}'"
+                )
+                if status["swap"]:
+                    await self._swap()
+            except asyncio.CancelledError:
+                status["state"] = "cancelled"
+                await self._discard(shadow)
+                raise
+            except Exception as e:
+                logger.error(f"Embedding migration failed: {e}")
+                status["state"] = "failed"
+                status["error"] = str(e)
+                await self._discard(shadow)
+            finally:
+                status["finished_at"] = time.time()
+
+    async def _copy(self, shadow: ShadowCollection, rate: float) -> None:
+        self.status["total"] = await asyncio.to_thread(db.count)
+        batches = db.iter_batches(settings.MIGRATION_BATCH_SIZE)
+        start = time.monotonic()
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            ids, _, documents, metadatas = batch
+            await shadow.embed_and_write(ids, documents, metadatas)
+            self.status["copied"] += len(ids)
+            if rate > 0:
+                # Paced so the embedding nodes keep capacity for live queries.
+                delay = self.status["copied"] / rate - (time.monotonic() - start)
+                await asyncio.sleep(max(delay, 0))
+
+    async def _reconcile(self, shadow: ShadowCollection) -> None:
+        # Writes racing with the copy can leave chunks missing from the shadow
+        # or bring back deleted ones; diff the id sets to settle both.
+        live = await asyncio.to_thread(db.ids)
+        copied = await asyncio.to_thread(shadow.ids)
+
+        stale = list(copied - live)
+        if stale:
+            await asyncio.to_thread(shadow.delete_ids, stale)
+
+        missing = list(live - copied)
+        batch_size = settings.MIGRATION_BATCH_SIZE
+        for i in range(0, len(missing), batch_size):
+            documents = await asyncio.to_thread(
+                db.get_by_ids, missing[i : i + batch_size]
+            )
+            await shadow.embed_and_write(
+                [doc.id for doc in documents],
+                [doc.page_content for doc in documents],
+                [doc.metadata for doc in documents],
+            )
+        logger.info(
+            f"Reconciled '{shadow.name}': {len(missing)} added, {len(stale)} removed"
+        )
+
+    async def _discard(self, shadow: ShadowCollection | None) -> None:
+        # Only called with the shadow lease held.
+        db.shadow = None
+        OllamaPool.instances.pop(POOL_NAME, None)
+        if shadow is None:
+            return
+        await asyncio.to_thread(
+            collection_aliases.set_shadow, settings.COLLECTION_NAME, None
+        )
+        try:
+            await shadow.drop()
+        except Exception as e:
+            logger.warning(f"Failed to drop collection '{shadow.name}': {e}")
+
+    async def swap(self) -> dict[str, Any]:
+        # Any worker can swap in a ready migration, whichever one built it.
+        async with leases.hold(SHADOW_LEASE) as held:
+            if not held:
+                raise RuntimeError("A migration or re-index is running")
+            return await self._swap()
+
+    async def _swap(self) -> dict[str, Any]:
+        job = await asyncio.to_thread(
+            collection_aliases.shadow_job, settings.COLLECTION_NAME
+        )
+        if job is None or job["kind"] != "migration" or not job["ready"]:
+            raise RuntimeError("No migrated collection is ready to swap in")
+
+        previous = await point_alias(job["name"])
+        OllamaPool.instances.pop(POOL_NAME, None)
+        logger.info(f"Swapped '{previous}' for '{job['name']}'")
+        result = {"state": "swapped", "target": job["name"], "previous": previous}
+        if self.status is not None and self.status["target"] == job["name"]:
+            self.status.update(result)
+            return self.status
+        return result
+
+    async def rollback(self) -> dict[str, Any]:
+        alias = settings.COLLECTION_NAME
+        async with leases.hold(SHADOW_LEASE) as held:
+            if not held:
+                raise RuntimeError("A migration or re-index is running")
+            job = await asyncio.to_thread(collection_aliases.shadow_job, alias)
+            # A rollback interrupted by a crash is simply run again.
+            if job is not None and job["kind"] != "rollback":
+                raise RuntimeError(
+                    f"Collection '{job['name']}' belongs to a {job['kind']}"
+                )
+            previous = await asyncio.to_thread(collection_aliases.previous, alias)
+            if previous is None:
+                raise RuntimeError("No previous collection to roll back to")
+
+            await db.refresh(force=True)
+            target = await asyncio.to_thread(ShadowCollection.existing, previous)
+            # Writes made since the swap are only in the current collection.
+            # The previous one catches up on them and dual-writes until the
+            # alias is back on it.
+            db.shadow = target
+            await asyncio.to_thread(
+                collection_aliases.set_shadow, alias, previous, target.model, "rollback"
+            )
+            swapped = False
+            try:
+                added, removed = await target.catch_up()
+                current = await point_alias(previous)
+                swapped = True
+            finally:
+                if not swapped:
+                    # The previous collection is kept either way.
+                    db.shadow = None
+                    target.close()
+                    await asyncio.to_thread(collection_aliases.set_shadow, alias, None)
+
+        logger.warning(f"Rolled back from '{current}' to '{previous}'")
+        return {
+            "collection": previous,
+            "previous": current,
+            "documents_added": added,
+            "documents_removed": removed,
+        }
+
+    async def cancel(self) -> None:
+        if self.running:
+            await self.stop()
+            return
+        # Holding the lease means no worker is building the shadow: it is a
+        # ready migration or one left behind by a crashed worker.
+        async with leases.hold(SHADOW_LEASE) as held:
+            if not held:
+                raise RuntimeError(
+                    "A migration or re-index is running in another worker"
+                )
+            job = await asyncio.to_thread(
+                collection_aliases.shadow_job, settings.COLLECTION_NAME
+            )
+            if job is None:
+                return
+            if job["kind"] != "migration":
+                raise RuntimeError(
+                    f"Collection '{job['name']}' belongs to a {job['kind']}"
+                )
+            if self.status is not None and self.status["target"] == job["name"]:
+                self.status["state"] = "cancelled"
+            shadow = await asyncio.to_thread(
+                ShadowCollection, job["name"], job["model"]
+            )
+            await self._discard(shadow)
+
+    async def stop(self) -> None:
+        # Cancels this worker's own run; a ready migration stays for any
+        # worker to swap in or cancel.
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def get_status(self) -> dict[str, Any]:
+        return {
+            "collection": db.collection_name,
+            "embedding_model": db.embedding_model,
+            "running": self.running,
+            "shadow": await asyncio.to_thread(
+                collection_aliases.shadow_job, settings.COLLECTION_NAME
+            ),
+            "migration": self.status,
+        }
+
+
+embedding_migration = EmbeddingMigration()
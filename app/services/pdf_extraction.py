@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+def count_pages(path: str) -> int:
+    import pypdf
+
+    return len(pypdf.PdfReader(path).pages)
+
+
+def extract_page_range(
+    path: str, start: int, end: int
+) -> list[tuple[int, str | None, str | None, str | None]]:
+    # Runs in a worker process: each worker opens the file itself, so only
+    # the path and the extracted text cross the process boundary.
+    import pypdf
+
+    reader = pypdf.PdfReader(path)
+    pages = []
+    for index in range(start, end):
+        try:
+            text = reader.pages[index].extract_text()
+            pages.append((index, text, reader.page_labels[index], None))
+        except Exception as e:
+            pages.append((index, None, None, f"{type(e).__name__}: {e}"))
+    return pages
+
+
+class PdfExtractor:
+    def __init__(self, workers: int = None, pages_per_task: int = None):
+        self.workers = workers or settings.PDF_WORKERS or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked: forking a process that already runs an
+        # event loop and worker threads can deadlock the children.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def iter_pages(self, path: str | Path) -> AsyncIterator[Document]:
+        path = str(path)
+        total = await asyncio.to_thread(count_pages, path)
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                self.executor,
+                extract_page_range,
+                path,
+                start,
+                min(start + self.pages_per_task, total),
+            )
+            for start in range(0, total, self.pages_per_task)
+        ]
+        logger.info(
+            f"Extracting {total} PDF pages in {len(futures)} ranges "
+            f"on {self.workers} processes"
+        )
+
+        skipped = 0
+        try:
+            # Awaiting in submission order keeps pages ordered while later
+            # ranges keep extracting in the background.
+            for future in futures:
+                for index, text, label, error in await future:
+                    if error is not None:
+                        skipped += 1
+                        logger.warning(f"Skipping page {index + 1} of {path}: {error}")
+                        continue
+                    yield Document(
+                        page_content=text.strip(),
+                        metadata={
+                            "page": index,
+                            "page_label": label,
+                            "total_pages": total,
+                        },
+                    )
+        finally:
+            for future in futures:
+                future.cancel()
+
+        if skipped:
+            logger.warning(f"{skipped} of {total} pages could not be extracted")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pdf_extractor = PdfExtractor()
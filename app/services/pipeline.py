@@ -1,7 +1,15 @@
-from typing import Any
+import asyncio
+from typing import Any, AsyncIterator
 from app.core.logger import logger
 import time
 
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.deadline import DeadlineExceeded
+from app.core.query_log import query_log
+from app.core.resilience import CircuitOpenError
 from app.services.retrieval import retrieval_service
 from app.services.llm import llm_service
 
@@ -17,16 +25,31 @@ class QueryPipeline:
         top_k: int = 4,
         temperature: float = 0.7,
         score_threshold: float = 0.0,
+        max_tokens: int | None = None,
+        vector: list[float] | None = None,
+        use_query_log: bool = True,
     ) -> dict[str, Any]:
         start_time = time.time()
+        params = {
+            "top_k": top_k,
+            "temperature": temperature,
+            "score_threshold": score_threshold,
+            "max_tokens": max_tokens,
+        }
+        use_query_log = use_query_log and settings.QUERY_LOG_ENABLED
 
         try:
             logger.info(f"Processing question: '{question[:100]}...'")
             logger.info(f"Parameters: top_k={top_k}, temperature={temperature}")
 
+            if use_query_log:
+                result = await self._precomputed(question, params, start_time)
+                if result is not None:
+                    return result
+
             search_start = time.time()
             documents = await self.retrieval.search(
-                query=question, k=top_k, score_threshold=score_threshold
+                query=question, k=top_k, score_threshold=score_threshold, vector=vector
             )
             search_time = time.time() - search_start
 
@@ -34,70 +57,336 @@ class QueryPipeline:
                 f"Search completed in {search_time:.2f}s, found {len(documents)} documents"
             )
 
-            if not documents:
-                return {
-                    "answer": "I couldn't find any relevant information in the database to answer your question.",
-                    "question": question,
-                    "sources": [],
-                    "context_used": False,
-                    "metrics": {
-                        "search_time": search_time,
-                        "generation_time": 0,
-                        "total_time": time.time() - start_time,
-                        "documents_found": 0,
-                    },
-                }
-
-            context = self.retrieval.format_context(documents)
-            sources = self.retrieval.get_sources(documents)
+            result = await self._answer(
+                question, documents, temperature, search_time, start_time, max_tokens
+            )
+            if use_query_log and not result.get("degraded"):
+                await self._log(question, params, result)
+            return result
 
-            logger.info(
-                f"Context formatted: {len(context)} chars from {len(sources)} sources"
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.warning(f"Pipeline aborted: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Pipeline failed: {e}", exc_info=True)
+            return self._error_result(question, e, start_time)
+
+    async def ask_batch_stream(
+        self,
+        questions: list[str],
+        top_k: int = 4,
+        temperature: float = 0.7,
+        score_threshold: float = 0.0,
+        max_tokens: int | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        start_time = time.time()
+
+        # Duplicate questions are retrieved and generated once and fanned out
+        # to every position they were asked at.
+        positions: dict[str, list[int]] = {}
+        for index, question in enumerate(questions):
+            positions.setdefault(question, []).append(index)
+        unique_questions = list(positions)
+
+        logger.info(
+            f"Processing batch of {len(questions)} questions "
+            f"({len(unique_questions)} unique)"
+        )
+
+        try:
+            search_start = time.time()
+            documents_per_question = await self.retrieval.search_batch(
+                queries=unique_questions, k=top_k, score_threshold=score_threshold
             )
+            search_time = time.time() - search_start
+        except Exception as e:
+            logger.error(f"Batch search failed: {e}", exc_info=True)
+            for index, question in enumerate(questions):
+                yield {"index": index, **self._error_result(question, e, start_time)}
+            return
 
-            generation_start = time.time()
-            response = await self.llm.generate_answer(
-                question=question, context=context, temperature=temperature
+        # Questions that retrieved the same chunks share one formatted context.
+        groups: dict[tuple[str, ...], list[str]] = {}
+        contexts: dict[tuple[str, ...], list[Document]] = {}
+        for question, documents in zip(unique_questions, documents_per_question):
+            key = tuple(doc.id or doc.page_content for doc in documents)
+            groups.setdefault(key, []).append(question)
+            contexts[key] = documents
+        size = max(1, settings.ASK_BATCH_SHARED_CONTEXT_MAX)
+        batches = [
+            (group[i : i + size], contexts[key])
+            for key, group in groups.items()
+            for i in range(0, len(group), size)
+        ]
+        if len(batches) < len(unique_questions):
+            logger.info(
+                f"{len(unique_questions)} questions share {len(batches)} contexts"
             )
-            generation_time = time.time() - generation_start
 
-            logger.info(f"Answer generated in {generation_time:.2f}s")
+        semaphore = asyncio.Semaphore(settings.ASK_BATCH_CONCURRENCY)
+
+        async def answer_one(question: str, documents: list[Document]):
+            try:
+                return await self._answer(
+                    question,
+                    documents,
+                    temperature,
+                    search_time,
+                    start_time,
+                    max_tokens,
+                )
+            except Exception as e:
+                logger.error(f"Batch question failed: {e}")
+                return self._error_result(question, e, start_time)
+
+        async def answer(group: list[str], documents: list[Document]):
+            async with semaphore:
+                if len(group) > 1 and documents:
+                    try:
+                        return group, await self._answer_shared(
+                            group,
+                            documents,
+                            temperature,
+                            search_time,
+                            start_time,
+                            max_tokens,
+                        )
+                    except Exception as e:
+                        logger.warning(
+                            f"Shared answer failed, answering separately: {e}"
+                        )
+                return group, [
+                    await answer_one(question, documents) for question in group
+                ]
+
+        tasks = [
+            asyncio.create_task(answer(group, documents))
+            for group, documents in batches
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                group, results = await next_done
+                for question, result in zip(group, results):
+                    for index in positions[question]:
+                        yield {"index": index, **result}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        logger.info(
+            f"Batch of {len(questions)} questions processed "
+            f"in {time.time() - start_time:.2f}s"
+        )
 
-            total_time = time.time() - start_time
+    async def ask_batch(
+        self,
+        questions: list[str],
+        top_k: int = 4,
+        temperature: float = 0.7,
+        score_threshold: float = 0.0,
+        max_tokens: int | None = None,
+    ) -> list[dict[str, Any]]:
+        results = [None] * len(questions)
+        async for result in self.ask_batch_stream(
+            questions, top_k, temperature, score_threshold, max_tokens
+        ):
+            results[result.pop("index")] = result
+        return results
 
-            result = {
-                "answer": response["answer"],
+    async def _answer(
+        self,
+        question: str,
+        documents: list[Document],
+        temperature: float,
+        search_time: float,
+        start_time: float,
+        max_tokens: int | None = None,
+    ) -> dict[str, Any]:
+        if not documents:
+            return {
+                "answer": "I couldn't find any relevant information in the database to answer your question.",
                 "question": question,
-                "sources": sources,
-                "context_used": True,
-                "model": response["model"],
+                "sources": [],
+                "context_used": False,
                 "metrics": {
                     "search_time": search_time,
-                    "generation_time": generation_time,
-                    "total_time": total_time,
-                    "documents_found": len(documents),
-                    "context_length": len(context),
+                    "generation_time": 0,
+                    "total_time": time.time() - start_time,
+                    "documents_found": 0,
                 },
             }
 
-            logger.info(f"Question processed successfully in {total_time:.2f}s")
+        context = self.retrieval.format_context(documents)
+        sources = self.retrieval.get_sources(documents)
 
-            return result
-
-        except Exception as e:
-            logger.error(f"Pipeline failed: {e}", exc_info=True)
+        logger.info(
+            f"Context formatted: {len(context)} chars from {len(sources)} sources"
+        )
 
+        generation_start = time.time()
+        try:
+            response = await self.llm.generate_answer(
+                question=question,
+                context=context,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+        except CircuitOpenError as e:
+            # Cached answers are served before the breaker is consulted, so
+            # reaching this point means falling back to retrieval-only output.
+            logger.warning(f"Generation unavailable, degrading: {e}")
             return {
-                "answer": f"I encountered an error while processing your question: {str(e)}",
+                "answer": self.retrieval.format_results(documents),
                 "question": question,
-                "sources": [],
-                "context_used": False,
-                "error": str(e),
+                "sources": sources,
+                "context_used": True,
+                "degraded": True,
                 "metrics": {
+                    "search_time": search_time,
+                    "generation_time": 0,
                     "total_time": time.time() - start_time,
-                    "documents_found": 0,
+                    "documents_found": len(documents),
                 },
             }
+        generation_time = time.time() - generation_start
+
+        logger.info(f"Answer generated in {generation_time:.2f}s")
+
+        result = self._result(
+            question,
+            response,
+            sources,
+            len(documents),
+            len(context),
+            search_time,
+            generation_time,
+            start_time,
+        )
+
+        total_time = result["metrics"]["total_time"]
+        logger.info(f"Question processed successfully in {total_time:.2f}s")
+
+        return result
+
+    async def _answer_shared(
+        self,
+        questions: list[str],
+        documents: list[Document],
+        temperature: float,
+        search_time: float,
+        start_time: float,
+        max_tokens: int | None = None,
+    ) -> list[dict[str, Any]]:
+        context = self.retrieval.format_context(documents)
+        sources = self.retrieval.get_sources(documents)
+
+        generation_start = time.time()
+        responses = await self.llm.generate_answers(
+            questions=questions,
+            context=context,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        generation_time = time.time() - generation_start
+
+        logger.info(
+            f"{len(questions)} answers generated from one context "
+            f"in {generation_time:.2f}s"
+        )
+
+        results = []
+        for question, response in zip(questions, responses):
+            result = self._result(
+                question,
+                response,
+                sources,
+                len(documents),
+                len(context),
+                search_time,
+                generation_time,
+                start_time,
+            )
+            result["metrics"]["shared_context"] = len(questions)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _result(
+        question: str,
+        response: dict[str, Any],
+        sources: list[dict[str, Any]],
+        documents_found: int,
+        context_length: int,
+        search_time: float,
+        generation_time: float,
+        start_time: float,
+    ) -> dict[str, Any]:
+        return {
+            "answer": response["answer"],
+            "question": question,
+            "sources": sources,
+            "context_used": True,
+            "model": response["model"],
+            "metrics": {
+                "search_time": search_time,
+                "generation_time": generation_time,
+                "total_time": time.time() - start_time,
+                "documents_found": documents_found,
+                "context_length": context_length,
+                **response.get("options", {}),
+            },
+        }
+
+    async def _precomputed(
+        self, question: str, params: dict[str, Any], start_time: float
+    ) -> dict[str, Any] | None:
+        try:
+            result = await query_log.get_answer(question, params, db.collection_name)
+        except Exception as e:
+            logger.warning(f"Failed to read precomputed answers: {e}")
+            return None
+        if result is None:
+            return None
+
+        logger.info("Serving precomputed answer")
+        result["question"] = question
+        result["metrics"].update(
+            search_time=0,
+            generation_time=0,
+            total_time=time.time() - start_time,
+            precomputed=True,
+        )
+        await self._log(question, params, result)
+        return result
+
+    @staticmethod
+    async def _log(
+        question: str, params: dict[str, Any], result: dict[str, Any]
+    ) -> None:
+        try:
+            await query_log.record(
+                question,
+                params,
+                result["metrics"]["total_time"],
+                [source["filename"] for source in result["sources"]],
+            )
+        except Exception as e:
+            logger.warning(f"Failed to log query: {e}")
+
+    def _error_result(
+        self, question: str, error: Exception, start_time: float
+    ) -> dict[str, Any]:
+        return {
+            "answer": f"I encountered an error while processing your question: {str(error)}",
+            "question": question,
+            "sources": [],
+            "context_used": False,
+            "error": str(error),
+            "metrics": {
+                "total_time": time.time() - start_time,
+                "documents_found": 0,
+            },
+        }
 
 
 query_pipeline = QueryPipeline()
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.logger import logger
+from app.core.query_log import query_log
+from app.core.resilience import CircuitOpenError
+from app.services.pipeline import query_pipeline
+
+
+class AnswerPrecomputer:
+    # Keeps answers for the most frequent questions ready. An answer stays
+    # valid until a change to the index alters the chunks its question
+    # retrieves, however long that takes.
+    def __init__(self):
+        self.last_run: dict[str, Any] | None = None
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._changes = 0
+        self._checked = 0
+
+    @staticmethod
+    async def _search_ids(
+        vectors: list[list[float]], top_k: int, score_threshold: float
+    ) -> list[list[str]]:
+        # The same raw search retrieval starts from, before parent expansion.
+        results = await db.similarity_search_by_vectors(
+            vectors,
+            k=top_k * settings.PARENT_FETCH_FACTOR,
+            score_threshold=score_threshold,
+        )
+        return [[doc.id for doc, _ in hits] for hits in results]
+
+    def watch_index(self) -> None:
+        if self.on_index_change not in db.change_listeners:
+            db.change_listeners.append(self.on_index_change)
+
+    async def on_index_change(self) -> None:
+        if not settings.QUERY_LOG_ENABLED:
+            return
+        self._changes += 1
+        target = self._changes
+        async with self._lock:
+            # A re-check started after this change already covers it.
+            if self._checked >= target:
+                return
+            self._checked = self._changes
+            try:
+                await self.recheck()
+            except Exception as e:
+                logger.error(f"Failed to re-check precomputed answers: {e}")
+                await query_log.invalidate_all()
+                self._wake.set()
+
+    async def recheck(self) -> int:
+        # Each precomputed question is searched again; only answers whose
+        # retrieved chunks differ are invalidated.
+        answers = await query_log.fresh_answers(db.collection_name)
+        groups: dict[tuple[int, float], list[dict[str, Any]]] = {}
+        for answer in answers:
+            params = answer["params"]
+            groups.setdefault((params["top_k"], params["score_threshold"]), []).append(
+                answer
+            )
+
+        changed = []
+        for (top_k, score_threshold), group in groups.items():
+            found = await self._search_ids(
+                [answer["vector"] for answer in group], top_k, score_threshold
+            )
+            changed.extend(
+                answer["key"]
+                for answer, ids in zip(group, found)
+                if ids != answer["chunk_ids"]
+            )
+
+        if changed:
+            await query_log.invalidate(changed)
+            logger.info(
+                f"Invalidated {len(changed)} of {len(answers)} precomputed answers"
+            )
+            self._wake.set()
+        return len(changed)
+
+    async def _precompute(self, entry: dict[str, Any]) -> None:
+        question, params = entry["question"], entry["params"]
+        vector = await db.embeddings.aembed_query(question)
+        [chunk_ids] = await self._search_ids(
+            [vector], params["top_k"], params["score_threshold"]
+        )
+        result = await query_pipeline.ask(
+            question, **params, vector=vector, use_query_log=False
+        )
+        if result.get("error") or result.get("degraded"):
+            raise RuntimeError(result.get("error") or "generation unavailable")
+
+        await query_log.put_answer(
+            entry["key"], result, vector, chunk_ids, db.collection_name
+        )
+        # Another worker may have changed the index while the answer was being
+        # generated, before this answer was there for it to re-check.
+        [current] = await self._search_ids(
+            [vector], params["top_k"], params["score_threshold"]
+        )
+        if current != chunk_ids:
+            await query_log.invalidate([entry["key"]])
+
+    async def refresh(self) -> dict[str, Any]:
+        start = time.time()
+        hot = await query_log.top(
+            settings.PRECOMPUTE_TOP_N,
+            settings.PRECOMPUTE_MIN_COUNT,
+            db.collection_name,
+        )
+        summary = Counter(dropped=await query_log.retain([e["key"] for e in hot]))
+
+        for entry in hot:
+            if entry["precomputed"]:
+                summary["fresh"] += 1
+                continue
+            if not await query_log.claim(
+                entry["key"], settings.PRECOMPUTE_CLAIM_TIMEOUT
+            ):
+                summary["claimed_elsewhere"] += 1
+                continue
+            try:
+                await self._precompute(entry)
+                summary["computed"] += 1
+            except Exception as e:
+                await query_log.release(entry["key"])
+                summary["failed"] += 1
+                logger.warning(f"Failed to precompute '{entry['question'][:50]}': {e}")
+                if isinstance(e, CircuitOpenError):
+                    break
+
+        self.last_run = {
+            "hot": len(hot),
+            "fresh": summary["fresh"],
+            "computed": summary["computed"],
+            "claimed_elsewhere": summary["claimed_elsewhere"],
+            "failed": summary["failed"],
+            "dropped": summary["dropped"],
+            "started_at": start,
+            "duration": round(time.time() - start, 3),
+        }
+        if summary["computed"] or summary["failed"]:
+            logger.info(f"Precompute round finished: {self.last_run}")
+        return self.last_run
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Precompute round failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.PRECOMPUTE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        if not (settings.QUERY_LOG_ENABLED and settings.PRECOMPUTE_ENABLED):
+            logger.info("Answer precompute disabled")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_status(self) -> dict[str, Any]:
+        return {"running": self._task is not None, "last_run": self.last_run}
+
+
+answer_precomputer = AnswerPrecomputer()
@@ -1,9 +1,17 @@
+import base64
+import hashlib
+import html
+import json
+import re
 from typing import Any
 from app.core.logger import logger
 
 from langchain_core.documents import Document
 
+from app.core.config import settings
 from app.core.database import db
+from app.core.deadline import guard
+from app.core.document_registry import document_registry
 
 
 class RetrievalService:
@@ -11,7 +19,13 @@ class RetrievalService:
         self.vectorstore = None
 
     async def search(
-        self, query: str, k: int = 4, score_threshold: float = 0.0
+        self,
+        query: str,
+        k: int = 4,
+        score_threshold: float = 0.0,
+        expand_parents: bool = True,
+        filter: dict[str, Any] | None = None,
+        vector: list[float] | None = None,
     ) -> list[Document]:
         try:
             if not self.vectorstore:
@@ -22,18 +36,24 @@ class RetrievalService:
 
             logger.info(f"Searching for: '{query}' (top_k={k})")
 
-            results = await self.vectorstore.asimilarity_search_with_relevance_scores(
-                query=query, k=k, score_threshold=score_threshold
+            if filter:
+                filter = await document_registry.resolve_filter(filter)
+                if filter is None:
+                    return []
+
+            fetch_k = await self._fetch_k(k, expand_parents)
+            # Embedding and vector search are separate calls so that each
+            # backend's failures trip its own circuit breaker.
+            if vector is None:
+                vector = await guard(db.embeddings.aembed_query(query), "retrieval")
+            [results] = await guard(
+                db.similarity_search_by_vectors(
+                    [vector], k=fetch_k, score_threshold=score_threshold, filter=filter
+                ),
+                "retrieval",
             )
 
-            documents = []
-            for doc, score in results:
-                doc.metadata["relevance_score"] = score
-                documents.append(doc)
-                logger.debug(
-                    f"Found: {doc.metadata.get('filename', 'unknown')} "
-                    f"(score={score:.3f})"
-                )
+            documents = await self._collect(results, k, expand_parents)
 
             logger.info(f"Found {len(documents)} relevant documents")
             return documents
@@ -42,6 +62,191 @@ class RetrievalService:
             logger.error(f"Search failed: {e}")
             raise
 
+    async def search_page(
+        self,
+        query: str,
+        limit: int = 10,
+        cursor: str | None = None,
+        score_threshold: float = 0.0,
+        filter: dict[str, Any] | None = None,
+        fields: list[str] | None = None,
+        include_content: bool = True,
+        highlight: bool = False,
+        expand_parents: bool = False,
+    ) -> dict[str, Any]:
+        fingerprint = self._fingerprint(query, score_threshold, filter, expand_parents)
+        offset = self._decode_cursor(cursor, fingerprint) if cursor else 0
+        if offset + limit > settings.SEARCH_MAX_RESULTS:
+            raise ValueError(
+                "Pagination is limited to the first "
+                f"{settings.SEARCH_MAX_RESULTS} results"
+            )
+
+        # Vector stores have no native offset: re-run the query for everything
+        # up to the end of the page, plus one row to know if another page exists.
+        documents = await self.search(
+            query=query,
+            k=offset + limit + 1,
+            score_threshold=score_threshold,
+            expand_parents=expand_parents,
+            filter=filter,
+        )
+        page = documents[offset : offset + limit]
+        has_more = len(documents) > offset + limit
+
+        results = []
+        for doc in page:
+            metadata = dict(doc.metadata)
+            score = metadata.pop("relevance_score", None)
+            if fields is not None:
+                metadata = {key: metadata[key] for key in fields if key in metadata}
+
+            result = {"id": doc.id, "score": score, "metadata": metadata}
+            if include_content:
+                result["content"] = doc.page_content
+            if highlight:
+                result["highlight"] = highlight_snippet(doc.page_content, query)
+            results.append(result)
+
+        return {
+            "query": query,
+            "results": results,
+            "next_cursor": (
+                self._encode_cursor(offset + limit, fingerprint) if has_more else None
+            ),
+        }
+
+    @staticmethod
+    def _fingerprint(
+        query: str, score_threshold: float, filter: dict | None, expand_parents: bool
+    ) -> str:
+        payload = json.dumps(
+            [query, score_threshold, filter, expand_parents],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _encode_cursor(offset: int, fingerprint: str) -> str:
+        payload = json.dumps({"offset": offset, "query": fingerprint})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, fingerprint: str) -> int:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+            offset = int(payload["offset"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {e}")
+
+        # A cursor only makes sense for the query that produced it.
+        if payload.get("query") != fingerprint or offset < 0:
+            raise ValueError("Cursor does not match this query")
+        return offset
+
+    async def search_batch(
+        self,
+        queries: list[str],
+        k: int = 4,
+        score_threshold: float = 0.0,
+        expand_parents: bool = True,
+    ) -> list[list[Document]]:
+        try:
+            if not db.vectorstore:
+                raise ValueError("VectorStore not initialized")
+
+            logger.info(f"Batch searching {len(queries)} queries (top_k={k})")
+
+            # One embedding call and one vector store query for the whole batch.
+            vectors = await guard(db.embeddings.aembed_documents(queries), "retrieval")
+            fetch_k = await self._fetch_k(k, expand_parents)
+            batch_results = await guard(
+                db.similarity_search_by_vectors(
+                    vectors, k=fetch_k, score_threshold=score_threshold
+                ),
+                "retrieval",
+            )
+
+            documents = [
+                await self._collect(results, k, expand_parents)
+                for results in batch_results
+            ]
+
+            logger.info(
+                f"Batch search found {sum(len(d) for d in documents)} documents"
+            )
+            return documents
+
+        except Exception as e:
+            logger.error(f"Batch search failed: {e}")
+            raise
+
+    @staticmethod
+    async def _fetch_k(k: int, expand_parents: bool) -> int:
+        # Several child chunks usually hit the same parent, so fetch more
+        # children to still end up with k distinct parents after expansion.
+        # Collections without parent_child documents get exactly k.
+        if expand_parents and await db.has_parent_documents():
+            return k * settings.PARENT_FETCH_FACTOR
+        return k
+
+    async def _collect(
+        self, results: list[tuple[Document, float]], k: int, expand_parents: bool
+    ) -> list[Document]:
+        documents = []
+        for doc, score in results:
+            doc.metadata["relevance_score"] = score
+            documents.append(doc)
+            logger.debug(
+                f"Found: {doc.metadata.get('doc_id', 'unknown')} (score={score:.3f})"
+            )
+
+        if expand_parents:
+            documents = await guard(self.expand_to_parents(documents), "expansion")
+        # Chunks carry only a doc_id; the file's metadata is joined back here
+        # for the results actually returned.
+        return await document_registry.attach(documents[:k])
+
+    async def expand_to_parents(self, documents: list[Document]) -> list[Document]:
+        parent_ids = list(
+            dict.fromkeys(
+                doc.metadata["parent_id"]
+                for doc in documents
+                if doc.metadata.get("parent_id")
+            )
+        )
+        if not parent_ids:
+            return documents
+
+        parents = await db.get_parent_documents(parent_ids)
+
+        expanded = []
+        seen = {}
+        for doc in documents:
+            parent_id = doc.metadata.get("parent_id")
+            parent = parents.get(parent_id) if parent_id else None
+            if parent is None:
+                expanded.append(doc)
+                continue
+
+            # Results are ordered by score, so the first child to hit a parent
+            # carries the parent's best relevance score.
+            if parent_id in seen:
+                seen[parent_id].metadata["matched_chunks"] += 1
+                continue
+
+            parent.metadata["relevance_score"] = doc.metadata.get("relevance_score")
+            parent.metadata["matched_chunks"] = 1
+            seen[parent_id] = parent
+            expanded.append(parent)
+
+        logger.info(
+            f"Expanded {len(documents)} chunks to {len(expanded)} parent documents"
+        )
+        return expanded
+
     def format_context(self, documents: list[Document]) -> str:
         if not documents:
             return "No relevant information found."
@@ -61,6 +266,21 @@ class RetrievalService:
 
         return "\n---\n".join(context_parts)
 
+    def format_results(self, documents: list[Document]) -> str:
+        if not documents:
+            return "No documents found matching your query."
+
+        results = []
+        for i, doc in enumerate(documents, 1):
+            filename = doc.metadata.get("filename", "Unknown")
+            score = doc.metadata.get("relevance_score") or 0
+            results.append(
+                f"{i}. {filename} (relevance: {score:.2f})\n"
+                f"   {doc.page_content[:200]}..."
+            )
+
+        return "Found documents:\n\n" + "\n\n".join(results)
+
     def get_sources(self, documents: list[Document]) -> list[dict[str, Any]]:
         sources = []
 
@@ -77,4 +297,49 @@ class RetrievalService:
         return sources
 
 
+def highlight_snippet(
+    text: str, query: str, size: int = None, tag: str = "mark"
+) -> str:
+    size = size or settings.SEARCH_SNIPPET_SIZE
+    terms = {term for term in re.findall(r"\w+", query.lower()) if len(term) > 2}
+    matches = []
+    if terms:
+        # Longest terms first so "python" wins over "py" at the same position.
+        alternatives = "|".join(map(re.escape, sorted(terms, key=len, reverse=True)))
+        pattern = re.compile(rf"\b({alternatives})", re.IGNORECASE)
+        matches = list(pattern.finditer(text))
+
+    # Start the snippet at the match that has the most other matches within
+    # one snippet length after it.
+    start = 0
+    if matches:
+        best = max(
+            range(len(matches)),
+            key=lambda i: sum(
+                1 for m in matches[i:] if m.end() <= matches[i].start() + size
+            ),
+        )
+        start = max(0, min(matches[best].start() - size // 4, len(text) - size))
+    end = min(len(text), start + size)
+
+    # Document text is escaped so only the inserted tags reach the client as
+    # markup.
+    parts = []
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(html.escape(text[position : match.start()]))
+        parts.append(f"<{tag}>{html.escape(match.group(0))}</{tag}>")
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+
+    snippet = "".join(parts).strip()
+    if start > 0:
+        snippet = "…" + snippet
+    if end < len(text):
+        snippet += "…"
+    return snippet
+
+
 retrieval_service = RetrievalService()
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+from app.core.document_registry import document_registry
+from app.core.leases import leases
+from app.core.logger import logger
+from app.core.parsed_store import parsed_store
+from app.core.sync_state import sync_state
+from app.services.chunking import ChunkingStrategy
+from app.services.document_loader import DocumentLoader
+from app.services.ingestion import ingestion_service
+
+
+class DirectorySync:
+    def __init__(self):
+        self.last_run: dict[str, Any] | None = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    def directories() -> list[Path]:
+        return [
+            Path(directory.strip()).resolve()
+            for directory in settings.SYNC_DIRECTORIES.split(",")
+            if directory.strip()
+        ]
+
+    @staticmethod
+    def _scan(root: Path) -> dict[str, tuple[int, int]]:
+        found = {}
+        for path in root.rglob("*"):
+            if path.suffix.lower() not in DocumentLoader.LOADER_MAPPING:
+                continue
+            try:
+                if not path.is_file():
+                    continue
+                stat = path.stat()
+            except OSError:
+                # Deleted or renamed between listing and stat.
+                continue
+            found[str(path)] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def sync(self, strategy: ChunkingStrategy = None) -> dict[str, Any]:
+        if self.running:
+            raise RuntimeError("Sync is already running")
+
+        # Every worker runs the loop; the lease lets one of them scan at a time
+        # so no file is indexed twice or deleted from under another worker.
+        async with self._lock, leases.hold("sync") as held:
+            if not held:
+                raise RuntimeError("Sync is running in another worker")
+            start = time.time()
+            summary = Counter()
+            for root in self.directories():
+                if not root.is_dir():
+                    logger.warning(f"Sync directory not found: {root}")
+                    continue
+                await self._sync_directory(
+                    root, strategy or settings.SYNC_STRATEGY, summary
+                )
+
+            self.last_run = {
+                "added": summary["added"],
+                "changed": summary["changed"],
+                "deleted": summary["deleted"],
+                "unchanged": summary["unchanged"],
+                "failed": summary["failed"],
+                "chunks": summary["chunks"],
+                "started_at": start,
+                "duration": round(time.time() - start, 3),
+            }
+            logger.info(f"Directory sync finished: {self.last_run}")
+            return self.last_run
+
+    async def _sync_directory(
+        self, root: Path, strategy: ChunkingStrategy, summary: Counter
+    ) -> None:
+        found = await asyncio.to_thread(self._scan, root)
+        known = await sync_state.list(str(root))
+
+        for path in known.keys() - found.keys():
+            try:
+                await self._remove(path, known[path]["file_hash"])
+                summary["deleted"] += 1
+            except Exception as e:
+                logger.error(f"Failed to remove {path} from the index: {e}")
+                summary["failed"] += 1
+
+        for path, (size, mtime_ns) in found.items():
+            entry = known.get(path)
+            # Size and mtime are free to compare; only a mismatch costs a hash.
+            if entry and (entry["size"], entry["mtime_ns"]) == (size, mtime_ns):
+                summary["unchanged"] += 1
+                continue
+
+            try:
+                file_hash = await asyncio.to_thread(
+                    DocumentLoader._get_file_hash, Path(path)
+                )
+                if entry and entry["file_hash"] == file_hash:
+                    # Touched or copied over with the same content.
+                    await sync_state.put(path, str(root), size, mtime_ns, file_hash)
+                    summary["unchanged"] += 1
+                    continue
+
+                summary["chunks"] += await self._index(path, strategy)
+                await sync_state.put(path, str(root), size, mtime_ns, file_hash)
+                if entry:
+                    await self._forget_parsed(entry["file_hash"])
+                summary["changed" if entry else "added"] += 1
+            except Exception as e:
+                # Left out of the sync state, so the next scan retries it.
+                logger.error(f"Failed to sync {path}: {e}")
+                summary["failed"] += 1
+
+    async def _index(self, path: str, strategy: ChunkingStrategy) -> int:
+        # Chunks of the previous version are looked up before indexing and
+        # removed after, so the file never disappears from search meanwhile.
+        previous = await document_registry.resolve_filter({"file_path": path})
+        ids = await ingestion_service.index_document_stream(
+            DocumentLoader.iter_document(path), strategy=strategy
+        )
+        if previous is not None:
+            await ingestion_service.delete_resolved(previous)
+        logger.info(f"Synced {path}: {len(ids)} chunks")
+        return len(ids)
+
+    async def _remove(self, path: str, file_hash: str) -> None:
+        await ingestion_service.delete_documents({"file_path": path})
+        await sync_state.delete(path)
+        await self._forget_parsed(file_hash)
+        logger.info(f"Removed {path} from the index")
+
+    @staticmethod
+    async def _forget_parsed(file_hash: str) -> None:
+        # Re-indexing would otherwise bring back files that no longer exist.
+        if not await sync_state.hash_in_use(file_hash):
+            await parsed_store.delete(file_hash)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not await leases.held("sync"):
+                    await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Directory sync failed: {e}")
+            await asyncio.sleep(settings.SYNC_INTERVAL)
+
+    def start(self) -> None:
+        if not self.directories() or settings.SYNC_INTERVAL <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "directories": [str(directory) for directory in self.directories()],
+            "interval": settings.SYNC_INTERVAL,
+            "running": self.running,
+            "last_run": self.last_run,
+        }
+
+
+directory_sync = DirectorySync()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import Any
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.logger import logger
+from app.services.intent import intent_router
+from app.services.llm import llm_service
+from app.services.retrieval import retrieval_service
+
+
+class WarmupService:
+    def __init__(self):
+        self.ready = not settings.WARMUP_ENABLED
+        self.last_warmup: float | None = None
+        self.warmup_time: float | None = None
+        self.error: str | None = None
+        self._task: asyncio.Task | None = None
+
+    async def warm_up(self) -> None:
+        start = time.time()
+
+        await llm_service.load_model()
+        logger.info(f"Generation model '{settings.OLLAMA_MODEL}' loaded")
+
+        await db.embedding_pool.broadcast(lambda client: client.aembed_query("warm-up"))
+        logger.info(f"Embedding model '{db.embedding_model}' loaded")
+
+        await retrieval_service.search(query="warm-up", k=1)
+        if settings.INTENT_ROUTER_ENABLED:
+            await intent_router.get_centroids()
+
+        self.warmup_time = time.time() - start
+        self.last_warmup = time.time()
+        logger.info(f"Warm-up completed in {self.warmup_time:.2f}s")
+
+    async def _run(self) -> None:
+        # Warm up until it succeeds, then keep the models loaded. A failed
+        # keep-warm round marks the instance as not ready until the next
+        # successful one.
+        while True:
+            try:
+                await self.warm_up()
+                self.ready = True
+                self.error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.ready = False
+                self.error = str(e)
+                logger.warning(f"Warm-up failed: {e}")
+
+            if self.ready and settings.KEEP_WARM_INTERVAL <= 0:
+                return
+            await asyncio.sleep(
+                settings.KEEP_WARM_INTERVAL
+                if self.ready
+                else settings.WARMUP_RETRY_INTERVAL
+            )
+
+    def start(self) -> None:
+        if not settings.WARMUP_ENABLED:
+            logger.info("Warm-up disabled")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "last_warmup": self.last_warmup,
+            "warmup_time": self.warmup_time,
+            "error": self.error,
+        }
+
+
+warmup_service = WarmupService()
@@ -1,8 +1,17 @@
 import pytest
 
 from app.core.logger import logger
+from app.core.aliases import collection_aliases
 from app.core.database import db
 from app.core.config import settings
+from app.core.docstore import docstore
+from app.core.document_registry import document_registry
+from app.core.leases import leases
+from app.core.parsed_store import parsed_store
+from app.core.quantized_log import quantized_log
+from app.core.query_log import query_log
+from app.core.sessions import session_store
+from app.core.sync_state import sync_state
 
 TEST_COLLECTION_NAME = "test_rag_collection"
 
@@ -18,7 +27,27 @@ def use_test_collection():
 
 
 @pytest.fixture(autouse=True, scope="function")
-async def create_test_collection():
+def isolate_stores(tmp_path, monkeypatch):
+    # SQLite stores and the local index default to paths under data/.
+    for store in (
+        collection_aliases,
+        docstore,
+        document_registry,
+        leases,
+        parsed_store,
+        quantized_log,
+        query_log,
+        session_store,
+        sync_state,
+    ):
+        monkeypatch.setattr(store, "path", tmp_path / "stores" / store.path.name)
+        monkeypatch.setattr(store, "_initialized", False)
+    monkeypatch.setattr(settings, "LOCAL_INDEX_PATH", str(tmp_path / "local_index"))
+    monkeypatch.setattr(settings, "EMBEDDING_PCA_PATH", str(tmp_path / "pca.npz"))
+
+
+@pytest.fixture(autouse=True, scope="function")
+async def create_test_collection(isolate_stores):
     await db.initialize()
 
     yield
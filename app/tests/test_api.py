@@ -1,4 +1,6 @@
 from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.database import VectorDatabase, db
 from app.main import app
 
 client = TestClient(app)
@@ -32,6 +34,20 @@ async def test_ask_question():
     assert len(data["answer"]) > 10
 
 
+async def test_ask_batch():
+    questions = [
+        "Describe me this document",
+        "Who wrote it?",
+        "Describe me this document",
+    ]
+    response = client.post(prefix + "/ask-batch", json={"questions": questions})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["question"] for result in results] == questions
+    assert all(len(result["answer"]) > 10 for result in results)
+
+
 async def test_unsupported_format(tmp_path):
     file_path = tmp_path / "bad.exe"
     file_path.write_bytes(b"fake binary")
@@ -44,3 +60,25 @@ async def test_unsupported_format(tmp_path):
 
     assert response.status_code == 400
     assert "Unsupported format" in response.text
+
+
+def test_ready_before_warmup():
+    response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+
+async def test_auto_fallback_is_read_only(monkeypatch):
+    def unavailable(self):
+        raise ConnectionError("Connection refused")
+
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "auto")
+    monkeypatch.setattr(VectorDatabase, "_initialize_chroma", unavailable)
+    await db.initialize()
+
+    response = client.post(prefix + "/add-chunks", json={"text": "new text"})
+    assert response.status_code == 503
+    health = client.get("/health").json()
+    assert health["status"] == "degraded"
+    assert health["vector_store"] == {"backend": "local", "read_only": True}
@@ -0,0 +1,122 @@
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.docstore import ParentDocumentStore
+from app.core.document_registry import DocumentRegistry
+from app.services.chunking import ChunkingService, SemanticChunker
+
+
+async def _parts(text: str, size: int):
+    for i in range(0, len(text), size):
+        yield text[i : i + size]
+
+
+async def test_split_text():
+    service = ChunkingService(chunk_size=100, chunk_overlap=10)
+    text = "Sentence number one. " * 50
+
+    chunks = await service.split_text(text, metadata={"filename": "raw.txt"})
+
+    assert len(chunks) > 1
+    assert all(len(chunk.page_content) <= 100 for chunk in chunks)
+    assert [chunk.metadata["chunk_id"] for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[0].metadata["filename"] == "raw.txt"
+
+
+async def test_split_text_stream():
+    service = ChunkingService(chunk_size=100, chunk_overlap=10)
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * 30 for i in range(40))
+
+    streamed = [
+        chunk
+        async for chunk in service.split_text_stream(
+            _parts(text, 37), metadata={"filename": "raw.txt"}, window_size=500
+        )
+    ]
+
+    assert all(len(chunk.page_content) <= 100 for chunk in streamed)
+    assert [c.metadata["chunk_id"] for c in streamed] == list(range(len(streamed)))
+    content = " ".join(chunk.page_content for chunk in streamed)
+    assert all(f"Paragraph {i}" in content for i in range(40))
+    assert "wordword" not in content
+
+
+def test_semantic_group_sentences_respects_breakpoints_and_bounds():
+    chunker = SemanticChunker(min_tokens=10, max_tokens=30)
+    sentences = ["a" * 40, "b" * 40, "c" * 40, "d" * 40, "e" * 40]
+
+    chunks = chunker.group_sentences(sentences, np.array([False, True, False, False]))
+
+    assert chunks[0] == " ".join(["a" * 40, "b" * 40])
+    assert all(len(chunk) // 4 <= 30 for chunk in chunks)
+    assert "".join(chunks).replace(" ", "") == "".join(sentences)
+
+
+def test_semantic_adjacent_distances():
+    vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+
+    distances = SemanticChunker.adjacent_distances(vectors)
+
+    assert np.allclose(distances, [0.0, 1.0])
+
+
+class TopicEmbeddings(Embeddings):
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float("apple" in text), float("engine" in text), 0.1]
+
+
+async def test_semantic_split_documents_breaks_on_topic_change():
+    chunker = SemanticChunker(
+        TopicEmbeddings(), min_tokens=1, max_tokens=200, breakpoint_percentile=50
+    )
+    documents = [
+        Document(
+            page_content="The apple is red. An apple grows on trees. "
+            "The engine is loud. An engine burns fuel.",
+            metadata={"filename": "mixed.txt"},
+        ),
+        Document(page_content="Apple pie. ", metadata={"filename": "short.txt"}),
+    ]
+
+    chunks = await chunker.split_documents(documents)
+
+    assert [chunk.page_content for chunk in chunks] == [
+        "The apple is red. An apple grows on trees.",
+        "The engine is loud. An engine burns fuel.",
+        "Apple pie.",
+    ]
+    assert [chunk.metadata["filename"] for chunk in chunks] == [
+        "mixed.txt",
+        "mixed.txt",
+        "short.txt",
+    ]
+
+
+async def test_split_parent_child_roundtrip(tmp_path):
+    service = ChunkingService()
+    store = ParentDocumentStore(tmp_path / "docstore.sqlite3")
+    document = Document(
+        page_content="\n\n".join(f"Section {i}. " + "text " * 200 for i in range(5)),
+        metadata={"filename": "manual.txt", "file_type": "txt"},
+    )
+
+    parents, children = await service.split_parent_child([document])
+    await store.put_many("manuals", parents)
+    parent_ids = [child.metadata["parent_id"] for child in children]
+    stored = await store.get_many("manuals", parent_ids)
+
+    assert len(children) > len(parents)
+    assert set(stored) == {parent.metadata["parent_id"] for parent in parents}
+    for child in children:
+        assert child.page_content in stored[child.metadata["parent_id"]].page_content
+
+    # Scoped to the collection and deleted by the doc_id of their children.
+    assert await store.get_many("other", parent_ids) == {}
+    doc_id = DocumentRegistry.split(children[0].metadata)[0]
+    deleted = await store.delete_where("manuals", {"doc_id": {"$in": [doc_id]}})
+    assert deleted == len(parents)
+    assert not await store.exists("manuals")
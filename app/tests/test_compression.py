@@ -0,0 +1,68 @@
+import numpy as np
+
+from app.core.compression import EmbeddingCompressor, QuantizedIndex, normalize
+from app.core.config import settings
+from app.core.quantized_log import QuantizedChangeLog
+
+
+def _corpus(n: int = 500, dimension: int = 64) -> np.ndarray:
+    return normalize(np.random.default_rng(0).normal(size=(n, dimension)))
+
+
+def test_matryoshka_truncation_normalizes():
+    compressor = EmbeddingCompressor("matryoshka", 16)
+
+    reduced = compressor.transform(_corpus())
+
+    assert reduced.shape == (500, 16)
+    assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+
+
+def test_pca_fit_without_saving(tmp_path):
+    compressor = EmbeddingCompressor("pca", 8, tmp_path / "pca.npz")
+
+    compressor.fit_pca(_corpus(), save=False)
+
+    assert compressor.transform(_corpus()[:3]).shape == (3, 8)
+    assert not (tmp_path / "pca.npz").exists()
+
+
+def test_quantized_index_finds_nearest_neighbour():
+    corpus = _corpus()
+    for mode in ["int8", "binary"]:
+        index = QuantizedIndex(mode)
+        index.add([str(i) for i in range(len(corpus))], corpus)
+
+        assert index.search(corpus[42], k=5)[0] == "42"
+        assert index.nbytes < corpus.astype(np.float32).nbytes
+
+        index.remove(["42"])
+        assert "42" not in index.search(corpus[42], k=5)
+        assert len(index) == len(corpus) - 1
+
+
+def test_quantized_change_log_replays_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "QUANTIZATION_LOG_SIZE", 3)
+    log = QuantizedChangeLog(tmp_path / "quantized.sqlite3")
+    corpus = _corpus(10)
+    writer, reader = QuantizedIndex("int8"), QuantizedIndex("int8")
+    seq = log.latest()
+
+    writer.add(["0", "1", "2"], corpus[:3])
+    log.append("docs", "add", ["0", "1", "2"])
+    writer.remove(["1"])
+    log.append("docs", "remove", ["1"])
+    log.append("other", "add", ["9"])
+
+    seq, entries = log.since("docs", seq)
+    for op, ids in entries:
+        if op == "remove":
+            reader.remove(ids)
+        else:
+            reader.add(ids, corpus[[int(i) for i in ids]])
+    reader.add(["0"], corpus[:1])
+
+    assert reader.ids == writer.ids == ["0", "2"]
+    assert log.since("docs", seq) == (seq, [])
+    log.append("docs", "add", ["3"])
+    assert log.since("docs", 0) is None
@@ -0,0 +1,73 @@
+from pathlib import Path
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.sessions import SessionStore
+from app.services.conversation import ConversationService
+from app.services.llm import llm_service
+from app.services.retrieval import retrieval_service
+
+
+async def test_session_reuses_context_and_keeps_prompt_prefix(
+    tmp_path: Path, monkeypatch
+):
+    searches, prompts, existing = [], [], set()
+
+    async def search(query, k, score_threshold, vector):
+        searches.append(query)
+        existing.add(f"chunk-{len(searches)}")
+        return [Document(id=f"chunk-{len(searches)}", page_content=f"about {query}")]
+
+    async def complete(prompt, temperature, max_tokens=None, prefer=None):
+        prompts.append(prompt)
+        return f"answer {len(prompts)}", "http://node-1", {}
+
+    async def summarize(summary, turns):
+        return f"{len(turns)} earlier turns"
+
+    monkeypatch.setattr(db, "embeddings", DeterministicFakeEmbedding(size=32))
+    monkeypatch.setattr(retrieval_service, "search", search)
+    monkeypatch.setattr(
+        db,
+        "get_by_ids",
+        lambda ids: [Document(id=id, page_content="") for id in ids if id in existing],
+    )
+    monkeypatch.setattr(llm_service, "complete", complete)
+    monkeypatch.setattr(llm_service, "summarize", summarize)
+    monkeypatch.setattr(
+        "app.services.conversation.session_store",
+        SessionStore(tmp_path / "sessions.sqlite3"),
+    )
+    monkeypatch.setattr(settings, "SESSION_MAX_TURNS", 2)
+    conversation = ConversationService()
+
+    first = await conversation.ask("what is the warranty period?")
+    session_id = first["session_id"]
+    second = await conversation.ask("what is the warranty period?", session_id)
+    assert (first["context_reused"], second["context_reused"]) == (False, True)
+    assert len(searches) == 1
+    # The follow-up prompt extends the previous one, so Ollama reuses it.
+    assert prompts[1].startswith(prompts[0])
+
+    third = await conversation.ask("who signed the lease?", session_id)
+    assert third["context_reused"] is False
+    assert len(searches) == 2
+
+    # Chunks deleted by another worker, then an upload in this one: both
+    # make the cached context stale.
+    existing.clear()
+    fourth = await conversation.ask("who signed the lease?", session_id)
+    await conversation.on_index_change()
+    fifth = await conversation.ask("who signed the lease?", session_id)
+    assert (fourth["context_reused"], fifth["context_reused"]) == (False, False)
+    assert len(searches) == 4
+
+    session = await conversation.get(session_id)
+    assert session["turns"] == 1
+    assert session["summary"] == "2 earlier turns"
+    assert session["chunk_ids"] == ["chunk-4"]
+    assert await conversation.delete(session_id)
+    assert await conversation.get(session_id) is None
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from app.core.deadline import DeadlineExceeded, deadline_scope, guard, request_stats
+
+
+async def test_guard_without_deadline():
+    assert await guard(asyncio.sleep(0, result="done"), "retrieval") == "done"
+
+
+async def test_guard_cancels_on_deadline():
+    before = request_stats.deadline_exceeded["generation"]
+
+    with deadline_scope(0.05):
+        with pytest.raises(DeadlineExceeded):
+            await guard(asyncio.sleep(1), "generation")
+
+    assert request_stats.deadline_exceeded["generation"] == before + 1
+
+
+async def test_deadline_propagates_to_tasks():
+    async def stage():
+        return await guard(asyncio.sleep(1), "retrieval")
+
+    with deadline_scope(0.05):
+        task = asyncio.create_task(stage())
+
+    with pytest.raises(DeadlineExceeded):
+        await task
@@ -1,4 +1,8 @@
 from pathlib import Path
+
+from langchain_core.documents import Document
+
+from app.core.parsed_store import ParsedTextStore
 from app.services.document_loader import DocumentLoader
 
 
@@ -29,3 +33,30 @@ async def test_get_supported_formats():
         ".flac",
     ]
     assert set(formats) == set(expected)
+
+
+async def test_load_from_parsed_store(tmp_path: Path, monkeypatch):
+    store = ParsedTextStore(tmp_path / "parsed.sqlite3")
+    monkeypatch.setattr("app.services.document_loader.parsed_store", store)
+
+    file_path = tmp_path / "cached.txt"
+    file_path.write_text("Original text")
+    file_hash = DocumentLoader._get_file_hash(file_path)
+    await store.put(file_hash, [Document(page_content="Parsed earlier")])
+
+    docs = await DocumentLoader.load_document(file_path)
+
+    assert [doc.page_content for doc in docs] == ["Parsed earlier"]
+    assert docs[0].metadata["file_hash"] == file_hash
+    assert docs[0].metadata["source"] == "cached.txt"
+
+
+async def test_parsed_store_append(tmp_path: Path):
+    store = ParsedTextStore(tmp_path / "parsed.sqlite3")
+    await store.append("stream:1", [Document(page_content="a")], "recursive")
+    await store.append("stream:1", [Document(page_content="b")], "recursive")
+
+    docs = await store.get("stream:1")
+
+    assert [doc.page_content for doc in docs] == ["a", "b"]
+    assert (await store.list_files())[0]["strategy"] == "recursive"
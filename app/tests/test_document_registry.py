@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from app.core.document_registry import DocumentRegistry
+
+
+async def test_chunks_keep_only_positional_fields(tmp_path: Path):
+    registry = DocumentRegistry(tmp_path / "registry.sqlite3")
+    file_metadata = {"source": "report.pdf", "file_type": "pdf", "file_size": 1024}
+
+    compact = await registry.register(
+        [
+            {**file_metadata, "chunk_id": 0, "page": 0},
+            {**file_metadata, "chunk_id": 1, "page": 1},
+        ]
+    )
+
+    assert compact[0]["doc_id"] == compact[1]["doc_id"]
+    assert set(compact[0]) == {"doc_id", "chunk_id", "page"}
+    assert await registry.count() == 1
+
+    documents = await registry.attach(
+        [Document(page_content="text", metadata=compact[1])]
+    )
+    assert documents[0].metadata == {**file_metadata, **compact[1]}
+
+
+async def test_document_filters_resolve_to_doc_ids(tmp_path: Path):
+    registry = DocumentRegistry(tmp_path / "registry.sqlite3")
+    [report, notes] = await registry.register(
+        [
+            {"source": "report.pdf", "chunk_id": 0},
+            {"source": "notes.txt", "chunk_id": 0},
+        ]
+    )
+
+    assert await registry.resolve_filter({"source": "notes.txt", "page": 2}) == {
+        "page": 2,
+        "doc_id": {"$in": [notes["doc_id"]]},
+    }
+    assert await registry.resolve_filter({"page": 2}) == {"page": 2}
+    assert await registry.resolve_filter({"source": "missing.md"}) is None
+    assert report["doc_id"] != notes["doc_id"]
+
+
+async def test_audio_segments_share_one_entry_until_deleted(tmp_path: Path):
+    registry = DocumentRegistry(tmp_path / "registry.sqlite3")
+    compact = await registry.register(
+        [
+            {"source": "talk.mp3", "chunk_id": 0, "timestamps": "[0.00s -> 4.20s]"},
+            {"source": "talk.mp3", "chunk_id": 1, "timestamps": "[4.20s -> 9.00s]"},
+        ]
+    )
+
+    assert compact[0]["doc_id"] == compact[1]["doc_id"]
+    assert await registry.count() == 1
+    assert await registry.delete([compact[0]["doc_id"]]) == 1
+    assert await registry.resolve_filter({"source": "talk.mp3"}) is None
@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "chromadb",
+    "langchain_chroma",
+    "langchain_ollama",
+    "langchain_community",
+    "langchain_classic",
+    "langchain_text_splitters",
+    "langgraph",
+    "faster_whisper",
+    "torch",
+    "ctranslate2",
+]
+IMPORT_TIME_BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", "2.0"))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": list(sys.modules)}))
+"""
+
+
+def _import_app() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_app_import_skips_heavy_modules():
+    modules = set(_import_app()["modules"])
+
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+
+    assert loaded == [], f"Heavy modules imported at startup: {loaded}"
+
+
+def test_app_import_time_budget():
+    seconds = min(_import_app()["seconds"] for _ in range(3))
+
+    assert seconds < IMPORT_TIME_BUDGET, (
+        f"Importing app.main took {seconds:.2f}s (budget {IMPORT_TIME_BUDGET}s)"
+    )
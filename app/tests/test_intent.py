@@ -0,0 +1,30 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.core.database import db
+from app.services.graph import QueryRouter
+from app.services.intent import IntentRouter
+
+
+async def test_intent_router_classifies_against_centroids(monkeypatch):
+    embeddings = DeterministicFakeEmbedding(size=64)
+    monkeypatch.setattr(db, "embeddings", embeddings)
+    monkeypatch.setattr(db, "embedding_model", "fake")
+    router = IntentRouter(
+        {
+            "greeting": {"examples": ["hello"], "threshold": 0.99},
+            "thanks": {"examples": ["thank you"], "response": "You're welcome!"},
+        }
+    )
+
+    assert (await router.classify(embeddings.embed_query("hello")))[0] == "greeting"
+    assert (await router.classify(embeddings.embed_query("thank you")))[0] == "thanks"
+    question = embeddings.embed_query("what does the contract say about penalties?")
+    assert (await router.classify(question))[0] == "question"
+    assert router.response("thanks") == "You're welcome!"
+
+
+def test_keyword_fallback_matches_whole_words():
+    assert QueryRouter.route_by_keywords("hey there") == "greeting"
+    assert QueryRouter.route_by_keywords("What did they decide?") == "question"
+    assert QueryRouter.route_by_keywords("Where is the showcase held?") == "question"
+    assert QueryRouter.route_by_keywords("list the contracts") == "search"
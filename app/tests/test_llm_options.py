@@ -0,0 +1,52 @@
+import json
+
+from app.core.config import settings
+from app.services.llm import LLMService
+
+
+def test_plan_options_keeps_num_ctx_fixed(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_TOKENIZER", "")
+    monkeypatch.setattr(settings, "LLM_NUM_CTX", 4096)
+    monkeypatch.setattr(settings, "LLM_NUM_PREDICT", 512)
+    llm = LLMService()
+    monkeypatch.setattr(llm, "count_tokens", lambda text: len(text.split()))
+
+    small = llm.plan_options("word " * 1000)
+    assert small == {"prompt_tokens": 1000, "num_ctx": 4096, "num_predict": 512}
+
+    assert llm.plan_options("word " * 100)["num_ctx"] == 4096
+    assert llm.plan_options("word " * 1600, max_tokens=64)["num_predict"] == 64
+
+
+def test_plan_options_shrinks_answer_to_fit_context(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_NUM_CTX", 4096)
+    llm = LLMService()
+    monkeypatch.setattr(llm, "count_tokens", lambda text: len(text.split()))
+
+    options = llm.plan_options("word " * 4000, max_tokens=512)
+    assert options["num_ctx"] == 4096
+    assert options["num_predict"] == 96
+
+
+async def test_load_model_uses_generation_num_ctx(monkeypatch):
+    import httpx
+
+    monkeypatch.setattr(settings, "LLM_NUM_CTX", 4096)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"done": True})
+
+    client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs),
+    )
+    llm = LLMService()
+    await llm.load_model()
+
+    options = llm.plan_options("word " * 10)
+    assert requests
+    assert all(r["options"]["num_ctx"] == options["num_ctx"] for r in requests)
@@ -0,0 +1,91 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.core.config import settings
+from app.core.local_index import LocalVectorStore
+
+
+def _store(tmp_path, **kwargs) -> LocalVectorStore:
+    return LocalVectorStore(
+        embedding_function=DeterministicFakeEmbedding(size=32),
+        collection_name="test",
+        path=tmp_path,
+        **kwargs,
+    )
+
+
+async def test_add_and_search(tmp_path):
+    store = _store(tmp_path)
+    ids = await store.aadd_texts(
+        [f"document {i}" for i in range(20)], [{"i": i} for i in range(20)]
+    )
+
+    results = await store.asimilarity_search_with_relevance_scores("document 7", k=1)
+
+    assert len(ids) == 20
+    assert results[0][0].page_content == "document 7"
+    assert results[0][0].metadata == {"i": 7}
+    assert results[0][1] > 0.99
+    assert store.count() == 20
+
+
+async def test_delete_and_reopen(tmp_path):
+    store = _store(tmp_path)
+    ids = await store.aadd_texts(["alpha", "beta", "gamma"])
+    store.delete([ids[0]])
+
+    reopened = _store(tmp_path)
+    results = await reopened.asimilarity_search("alpha", k=3)
+
+    assert reopened.count() == 2
+    assert "alpha" not in [doc.page_content for doc in results]
+
+
+async def test_ivf_search(tmp_path):
+    store = _store(tmp_path, ivf_threshold=200, nprobe=64)
+    texts = [f"chunk {i}" for i in range(300)]
+    await store.aadd_texts(texts[:250])
+    await store.aadd_texts(texts[250:])
+
+    results = await store.asimilarity_search("chunk 280", k=1)
+
+    assert (tmp_path / "test" / LocalVectorStore.CENTROIDS_FILE).exists()
+    assert results[0].page_content == "chunk 280"
+
+
+async def test_deleted_rows_and_filters_still_fill_k(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_INDEX_COMPACT_RATIO", 0)
+    store = _store(tmp_path)
+    ids = await store.aadd_texts(
+        [f"document {i}" for i in range(40)],
+        [{"doc_id": "even" if i % 2 == 0 else "odd"} for i in range(40)],
+    )
+    store.delete(ids[:30])
+
+    results = await store.asimilarity_search("document 3", k=10)
+    filtered = await store.asimilarity_search(
+        "document 3", k=5, filter={"doc_id": {"$in": ["odd"]}}
+    )
+
+    assert len(results) == 10
+    assert len(filtered) == 5
+    assert all(doc.metadata["doc_id"] == "odd" for doc in filtered)
+
+
+async def test_compaction_keeps_live_rows(tmp_path):
+    store = _store(tmp_path)
+    ids = await store.aadd_texts(
+        [f"document {i}" for i in range(20)], [{"i": i} for i in range(20)]
+    )
+    reader = _store(tmp_path)
+    await reader.asimilarity_search("document 1", k=1)
+
+    assert store.delete_where({"i": {"$in": list(range(10))}}) == 10
+
+    assert not (tmp_path / "test" / LocalVectorStore.VECTORS_FILE).exists()
+    results = await reader.asimilarity_search("document 15", k=20)
+    assert len(results) == 10
+    assert results[0].page_content == "document 15"
+    assert results[0].metadata == {"i": 15}
+    assert reader.ids() == set(ids[10:])
+    batches = list(reader.iter_vectors(batch_size=4))
+    assert sum(len(batch[0]) for batch in batches) == 10
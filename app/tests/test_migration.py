@@ -0,0 +1,161 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.core.aliases import collection_aliases
+from app.core.config import settings
+from app.core.database import VectorDatabase, db
+from app.core.leases import leases
+from app.core.local_index import LocalVectorStore
+from app.core.parsed_store import parsed_store
+from app.services.ingestion import ingestion_service
+from app.services.migration import EmbeddingMigration, ShadowCollection
+
+
+def use_fake_models(tmp_path: Path, monkeypatch) -> None:
+    sizes = {"old-model": 8, "new-model": 16}
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(settings, "LOCAL_INDEX_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "OLLAMA_EMBEDDING_MODEL", "old-model")
+    monkeypatch.setattr(settings, "EMBEDDING_REDUCTION", "none")
+    monkeypatch.setattr(
+        VectorDatabase,
+        "create_embeddings",
+        staticmethod(
+            lambda model, pool_name="embedding": (
+                None,
+                DeterministicFakeEmbedding(size=sizes[model]),
+            )
+        ),
+    )
+
+
+async def test_migration_swaps_alias_to_reembedded_collection(
+    tmp_path: Path, monkeypatch
+):
+    use_fake_models(tmp_path, monkeypatch)
+    await db.initialize()
+    await db.add_documents([f"chunk {i}" for i in range(20)])
+
+    migration = EmbeddingMigration()
+    await migration.start("new-model", rate=0)
+    while migration.running:
+        await asyncio.sleep(0.01)
+
+    assert migration.status["state"] == "swapped"
+    assert db.collection_name == migration.status["target"]
+    assert db.embedding_model == "new-model"
+    assert db.count() == 20
+    vector = await db.embeddings.aembed_query("chunk 7")
+    [[(document, _)]] = await db.similarity_search_by_vectors([vector], k=1)
+    assert document.page_content == "chunk 7"
+
+    # A restart keeps the recorded model even though the setting still differs.
+    await db.initialize()
+    assert db.embedding_model == "new-model"
+
+    # The previous collection catches up on writes made since the swap.
+    await db.add_documents(["written after the swap"], [{"doc_id": "late"}])
+    result = await migration.rollback()
+    assert result["documents_added"] == 1
+    assert db.collection_name == settings.COLLECTION_NAME
+    assert db.embedding_model == "old-model"
+    assert db.count() == 21
+    assert collection_aliases.shadow_job(settings.COLLECTION_NAME) is None
+
+
+async def test_cancel_leaves_other_jobs_alone(tmp_path: Path, monkeypatch):
+    use_fake_models(tmp_path, monkeypatch)
+    await db.initialize()
+    collection_aliases.set_shadow(
+        settings.COLLECTION_NAME, "being-reindexed", "old-model", "reindex"
+    )
+    migration = EmbeddingMigration()
+
+    async with leases.hold("shadow"):
+        with pytest.raises(RuntimeError):
+            await migration.cancel()
+    with pytest.raises(RuntimeError):
+        await migration.cancel()
+    assert collection_aliases.shadow_job(settings.COLLECTION_NAME)["kind"] == "reindex"
+
+
+async def test_other_workers_dual_write_and_follow_the_swap(
+    tmp_path: Path, monkeypatch
+):
+    use_fake_models(tmp_path, monkeypatch)
+    monkeypatch.setattr(settings, "ALIAS_CHECK_INTERVAL", 0)
+    await db.initialize()
+    await db.add_documents([f"chunk {i}" for i in range(5)])
+    worker = VectorDatabase()
+    worker.shadow_factory = ShadowCollection
+    await worker.initialize()
+
+    migration = EmbeddingMigration()
+    await migration.start("new-model", rate=0, swap=False)
+    while migration.running:
+        await asyncio.sleep(0.01)
+    assert migration.status["state"] == "ready"
+
+    # Written after the reconciliation pass, so only the dual-write copies it.
+    await worker.add_documents(["written by another worker"])
+    assert worker.shadow.name == migration.status["target"]
+
+    await migration.swap()
+    await worker.refresh()
+    assert worker.collection_name == migration.status["target"]
+    assert worker.embedding_model == "new-model"
+    assert worker.shadow is None
+    assert worker.count() == 6
+
+
+async def test_reindex_builds_a_new_collection_and_swaps_it_in(
+    tmp_path: Path, monkeypatch
+):
+    use_fake_models(tmp_path, monkeypatch)
+    await db.initialize()
+    documents = [
+        Document(page_content=f"document {i}", metadata={"source": f"{i}.txt"})
+        for i in range(3)
+    ]
+    await ingestion_service.index_documents(documents)
+    source = db.collection_name
+
+    async with leases.hold("shadow"):
+        with pytest.raises(RuntimeError):
+            await ingestion_service.reindex()
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("embedding failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ShadowCollection, "embed_and_write", fail)
+        with pytest.raises(RuntimeError):
+            await ingestion_service.reindex()
+    # The live collection is untouched and the partial one is gone.
+    assert db.collection_name == source
+    assert db.count() == 3
+    assert db.shadow is None
+    assert collection_aliases.state(settings.COLLECTION_NAME)[1] is None
+    partial = LocalVectorStore(None, ingestion_service.reindex_status["target"])
+    assert partial.count() == 0
+
+    # Recorded before the files are listed and dual-written after: rebuilt
+    # from its parsed text too, but only the upload's copy is kept.
+    upload = Document(page_content="document 3", metadata={"source": "3.txt"})
+    list_files = parsed_store.list_files
+
+    async def upload_while_listing():
+        await ingestion_service._record([upload], "recursive")
+        files = await list_files()
+        await ingestion_service.index_documents([upload], record=False)
+        return files
+
+    monkeypatch.setattr(parsed_store, "list_files", upload_while_listing)
+    status = await ingestion_service.reindex()
+    assert db.collection_name == status["target"] != source
+    assert (status["previous"], status["chunks"], db.count()) == (source, 3, 4)
+    assert status["duplicates"] == 1
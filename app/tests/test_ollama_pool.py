@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.ollama_pool import OllamaPool
+
+
+class FakeClient:
+    def __init__(self, url: str, delay: float = 0.0, fail: bool = False):
+        self.url = url
+        self.delay = delay
+        self.fail = fail
+
+    async def embed(self, text: str) -> str:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.url)
+        return self.url
+
+
+async def test_least_outstanding_routing():
+    pool = OllamaPool("test", ["a", "b"], lambda url: FakeClient(url, delay=0.05))
+
+    results = await asyncio.gather(
+        *(pool.call(lambda client: client.embed("x")) for _ in range(4))
+    )
+
+    assert sorted(results) == ["a", "a", "b", "b"]
+    assert all(node.outstanding == 0 for node in pool.nodes)
+
+
+async def test_failing_node_is_ejected():
+    pool = OllamaPool(
+        "test", ["bad", "good"], lambda url: FakeClient(url, fail=url == "bad")
+    )
+    bad = pool.nodes[0]
+
+    # Idle nodes tie, so the first one keeps being picked until it is ejected.
+    for _ in range(settings.OLLAMA_EJECT_FAILURES):
+        with pytest.raises(ConnectionError):
+            await pool.call(lambda client: client.embed("x"))
+
+    assert not bad.available
+    assert await pool.call(lambda client: client.embed("x")) == "good"
+
+
+async def test_hedged_request_uses_faster_node():
+    delays = {"slow": 1.0, "fast": 0.0}
+    pool = OllamaPool(
+        "test", ["slow", "fast"], lambda url: FakeClient(url, delay=delays[url])
+    )
+    pool.nodes[0].latency = 0.0
+    pool.nodes[1].latency = 0.1
+
+    result = await pool.call(lambda client: client.embed("x"), hedge_after=0.05)
+
+    assert result == "fast"
+    assert pool.hedged == 1 and pool.hedge_wins == 1
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from pypdf import PdfWriter
+from pypdf.generic import (
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+)
+
+from app.services.pdf_extraction import PdfExtractor
+
+
+def write_pdf(path: Path, pages: int) -> None:
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    for number in range(1, pages + 1):
+        page = writer.add_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/Font"): DictionaryObject(
+                    {NameObject("/F1"): writer._add_object(font)}
+                )
+            }
+        )
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td (Page {number}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+async def test_pages_are_extracted_in_order(tmp_path: Path):
+    path = tmp_path / "large.pdf"
+    write_pdf(path, 5)
+    extractor = PdfExtractor(workers=2, pages_per_task=2)
+
+    try:
+        docs = [doc async for doc in extractor.iter_pages(path)]
+    finally:
+        extractor.shutdown()
+
+    assert [doc.page_content for doc in docs] == [f"Page {i}" for i in range(1, 6)]
+    assert [doc.metadata["page"] for doc in docs] == list(range(5))
+    assert all(doc.metadata["total_pages"] == 5 for doc in docs)
@@ -0,0 +1,40 @@
+from langchain_core.documents import Document
+
+from app.services.llm import llm_service
+from app.services.pipeline import query_pipeline
+from app.services.retrieval import retrieval_service
+
+
+async def test_ask_batch_shares_generation_for_same_context(monkeypatch):
+    fruit = [Document(page_content="Apples grow on trees.", id="a")]
+    cars = [Document(page_content="Engines burn fuel.", id="b")]
+    retrieved = {"apples?": fruit, "apple trees?": fruit, "engines?": cars}
+    prompts = []
+
+    async def search_batch(queries, k, score_threshold):
+        return [retrieved[query] for query in queries]
+
+    async def generate(prompt, temperature, max_tokens=None, prefer=None):
+        prompts.append((prompt, max_tokens))
+        if "Question: apples?" in prompt:
+            return "On trees.", None, {}
+        if "Question: apple trees?" in prompt:
+            return "Yes, trees.", None, {}
+        return "Fuel.", None, {}
+
+    monkeypatch.setattr(retrieval_service, "search_batch", search_batch)
+    monkeypatch.setattr(llm_service, "_generate", generate)
+
+    results = await query_pipeline.ask_batch(
+        ["apples?", "engines?", "apple trees?"], max_tokens=64
+    )
+
+    # One call per question, each with its own budget.
+    assert [max_tokens for _, max_tokens in prompts] == [64, 64, 64]
+    assert [result["answer"] for result in results] == [
+        "On trees.",
+        "Fuel.",
+        "Yes, trees.",
+    ]
+    assert results[0]["metrics"]["shared_context"] == 2
+    assert "shared_context" not in results[1]["metrics"]
@@ -0,0 +1,80 @@
+import re
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.database import VectorDatabase, db
+from app.services.llm import llm_service
+from app.services.pipeline import query_pipeline
+from app.services.precompute import AnswerPrecomputer
+from app.services.retrieval import retrieval_service
+
+VOCABULARY = ["apple", "orchard", "harvest", "engine", "piston", "fuel"]
+
+
+class KeywordEmbeddings(Embeddings):
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        words = re.findall(r"[a-z]+", text.lower())
+        return [float(words.count(word)) + 0.01 for word in VOCABULARY]
+
+
+async def test_precomputed_answer_survives_unrelated_changes_only(monkeypatch):
+    generated = []
+
+    async def generate_answer(question, context, temperature, max_tokens=None):
+        generated.append(question)
+        return {"answer": f"answer {len(generated)}", "model": "fake", "options": {}}
+
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(settings, "EMBEDDING_REDUCTION", "none")
+    monkeypatch.setattr(settings, "PARENT_FETCH_FACTOR", 1)
+    monkeypatch.setattr(settings, "PRECOMPUTE_MIN_COUNT", 2)
+    monkeypatch.setattr(
+        VectorDatabase,
+        "create_embeddings",
+        staticmethod(lambda model, pool_name="embedding": (None, KeywordEmbeddings())),
+    )
+    monkeypatch.setattr(llm_service, "generate_answer", generate_answer)
+    monkeypatch.setattr(retrieval_service, "vectorstore", None)
+    monkeypatch.setattr(db, "change_listeners", [])
+
+    await db.initialize()
+    await db.add_documents(
+        ["apple orchard", "apple harvest", "engine piston", "piston fuel"],
+        [{"source": "fruit.txt"}] * 2 + [{"source": "cars.txt"}] * 2,
+    )
+    precomputer = AnswerPrecomputer()
+    precomputer.watch_index()
+
+    for question in ["When is the apple harvest?", "when is the apple harvest"]:
+        await query_pipeline.ask(question, top_k=2)
+    assert len(generated) == 2
+
+    run = await precomputer.refresh()
+    assert (run["hot"], run["computed"]) == (1, 1)
+
+    result = await query_pipeline.ask("When is the APPLE harvest?", top_k=2)
+    assert result["metrics"]["precomputed"] is True
+    assert result["answer"] == "answer 3"
+    assert len(generated) == 3
+    # Other parameters are a different entry.
+    result = await query_pipeline.ask("When is the apple harvest?", top_k=1)
+    assert "precomputed" not in result["metrics"]
+
+    # Chunks that would not be retrieved for the question leave it alone.
+    await db.add_documents(["engine fuel"], [{"source": "cars.txt"}])
+    await db.delete_where({"source": "cars.txt"})
+    result = await query_pipeline.ask("When is the apple harvest?", top_k=2)
+    assert result["metrics"]["precomputed"] is True
+
+    # A better match for the question invalidates its answer.
+    await db.add_documents(["apple harvest harvest"], [{"source": "notes.txt"}])
+    result = await query_pipeline.ask("When is the apple harvest?", top_k=2)
+    assert "precomputed" not in result["metrics"]
+    assert (await precomputer.refresh())["computed"] == 1
+    result = await query_pipeline.ask("When is the apple harvest?", top_k=2)
+    assert result["metrics"]["precomputed"] is True
+    assert result["answer"] == "answer 6"
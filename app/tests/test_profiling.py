@@ -0,0 +1,55 @@
+import asyncio
+import re
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.profiling import LoopLagMonitor, profile_process
+
+
+def spin(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+async def test_profile_process_samples_busy_threads():
+    async def busy():
+        await asyncio.sleep(0.01)
+        await asyncio.to_thread(spin, 0.2)
+
+    task = asyncio.create_task(busy())
+    profile = await profile_process(0.15)
+    await task
+
+    collapsed = profile.to_collapsed()
+    assert profile.samples > 0
+    # Paths are relative to the working directory, so only the basename is fixed.
+    assert re.search(rf"spin \([^;]*\b{re.escape(Path(__file__).name)}\)", collapsed)
+    # The idle event loop waiting in select() is left out by default.
+    assert "select (" not in collapsed
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+    speedscope = profile.to_speedscope("test")
+    names = [frame["name"] for frame in speedscope["shared"]["frames"]]
+    assert "spin" in names
+
+
+async def test_loop_lag_monitor_captures_blocking_stack(monkeypatch):
+    monkeypatch.setattr(settings, "LOOP_LAG_MONITOR_ENABLED", True)
+    monkeypatch.setattr(settings, "LOOP_LAG_CHECK_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "LOOP_LAG_THRESHOLD", 0.05)
+    monitor = LoopLagMonitor()
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        spin(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    status = monitor.get_status()
+    assert status["blocked"] >= 1
+    assert status["max_lag"] >= 0.25
+    assert "in spin" in status["stalls"][-1]["stack"]
+    assert status["stalls"][-1]["lag"] >= 0.25
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientBackend,
+    RetryBudget,
+)
+
+
+async def _fail():
+    raise ConnectionError("down")
+
+
+async def _ok():
+    return "ok"
+
+
+async def test_breaker_opens_and_recovers():
+    backend = ResilientBackend("test", retries=0)
+    backend.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await backend.call(_fail)
+    assert backend.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await backend.call(_ok)
+
+    await asyncio.sleep(0.06)
+    assert await backend.call(_ok) == "ok"
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_retry_until_success():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise ConnectionError("flaky")
+        return "ok"
+
+    backend = ResilientBackend("test", retries=1)
+
+    assert await backend.call(flaky) == "ok"
+    assert len(attempts) == 2
+
+
+def test_retry_budget_is_bounded():
+    budget = RetryBudget(ratio=0.5, burst=1)
+
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.exhausted == 1
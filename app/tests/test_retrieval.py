@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.retrieval import highlight_snippet, retrieval_service
+
+
+def test_highlight_snippet_marks_query_terms():
+    text = "Intro. " * 50 + "Python is a programming language. " + "Outro. " * 50
+
+    snippet = highlight_snippet(text, "python language", size=80)
+
+    assert "<mark>Python</mark>" in snippet
+    assert "<mark>language</mark>" in snippet
+    assert snippet.startswith("…") and snippet.endswith("…")
+
+
+def test_highlight_snippet_without_matches():
+    assert highlight_snippet("short text", "python") == "short text"
+
+
+def test_highlight_snippet_escapes_document_markup():
+    snippet = highlight_snippet("<b>Python</b> & <script>x()</script>", "python")
+
+    assert snippet == (
+        "&lt;b&gt;<mark>Python</mark>&lt;/b&gt; &amp; &lt;script&gt;x()&lt;/script&gt;"
+    )
+
+
+def test_cursor_roundtrip_and_mismatch():
+    fingerprint = retrieval_service._fingerprint("python", 0.0, None, False)
+    cursor = retrieval_service._encode_cursor(20, fingerprint)
+
+    assert retrieval_service._decode_cursor(cursor, fingerprint) == 20
+
+    other = retrieval_service._fingerprint("java", 0.0, None, False)
+    with pytest.raises(ValueError):
+        retrieval_service._decode_cursor(cursor, other)
+    with pytest.raises(ValueError):
+        retrieval_service._decode_cursor("not-a-cursor", fingerprint)
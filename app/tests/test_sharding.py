@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.sharding import HashRing, ShardSet
+
+
+class FakeCollection:
+    def __init__(self, hits: list[tuple[str, float]], delay: float = 0.0):
+        self.hits = hits
+        self.delay = delay
+
+    def query(self, query_embeddings, n_results, where, include):
+        if self.delay:
+            time.sleep(self.delay)
+        hits = self.hits[:n_results]
+        return {
+            "ids": [[id_ for id_, _ in hits] for _ in query_embeddings],
+            "documents": [[id_ for id_, _ in hits] for _ in query_embeddings],
+            "metadatas": [[{} for _ in hits] for _ in query_embeddings],
+            "distances": [[distance for _, distance in hits] for _ in query_embeddings],
+        }
+
+
+class FakeShard:
+    def __init__(self, name: str, collection: FakeCollection):
+        self.name = name
+        self.collection = collection
+        self.queries = self.failures = self.timeouts = 0
+
+
+def test_adding_a_shard_moves_only_its_share_of_keys():
+    keys = [f"doc-{i}" for i in range(2000)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+
+    moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+
+    assert all(after.node_for(key) == "d" for key in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+
+
+async def test_query_merges_top_k_across_shards():
+    shards = ShardSet(
+        [
+            FakeShard("a", FakeCollection([("a1", 0.1), ("a2", 0.5)])),
+            FakeShard("b", FakeCollection([("b1", 0.2), ("b2", 0.3)])),
+        ]
+    )
+
+    [results] = await shards.query([[0.0]], k=3)
+
+    assert [doc.id for doc, _ in results] == ["a1", "b1", "b2"]
+    assert isinstance(results[0][0], Document)
+
+
+async def test_slow_shard_is_left_out_of_partial_results(monkeypatch):
+    monkeypatch.setattr(settings, "SHARD_TIMEOUT", 0.05)
+    slow = FakeShard("slow", FakeCollection([("s1", 0.0)], delay=0.3))
+    shards = ShardSet([FakeShard("a", FakeCollection([("a1", 0.1)])), slow])
+
+    [results] = await shards.query([[0.0]], k=2)
+    await asyncio.sleep(0.3)
+
+    assert [doc.id for doc, _ in results] == ["a1"]
+    assert slow.timeouts == 1
+    assert shards.partial_results == 1
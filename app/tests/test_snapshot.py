@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.core.config import settings
+from app.core.database import VectorDatabase, db
+from app.core.parsed_store import parsed_store
+from app.core.snapshot import (
+    iter_snapshot,
+    read_manifest,
+    read_registry,
+    write_snapshot,
+)
+from app.services.ingestion import ingestion_service
+
+
+def test_snapshot_round_trip(tmp_path: Path):
+    batches = [
+        (
+            ["a", "b"],
+            np.array([[0.1, 0.2], [0.3, 0.4]], dtype=np.float32),
+            ["первый", "second"],
+            [{"doc_id": "d1", "chunk_id": 0}, {}],
+        ),
+        (["c"], np.array([[0.5, 0.6]]), ["third"], [{"doc_id": "d2"}]),
+    ]
+    registry = [("d1", '{"source": "a.txt"}', 1.0)]
+
+    write_snapshot(tmp_path, batches, registry, {"embedding_model": "test"})
+    manifest = read_manifest(tmp_path)
+    loaded = list(iter_snapshot(tmp_path, manifest))
+
+    assert manifest["count"] == 3 and manifest["dimension"] == 2
+    assert [batch[0] for batch in loaded] == [["a", "b"], ["c"]]
+    assert loaded[0][2] == ["первый", "second"]
+    assert loaded[0][3] == [{"doc_id": "d1", "chunk_id": 0}, {}]
+    np.testing.assert_array_equal(loaded[1][1], np.array([[0.5, 0.6]], np.float32))
+    assert read_registry(tmp_path, manifest) == registry
+
+
+def test_corrupted_batch_is_rejected(tmp_path: Path):
+    write_snapshot(tmp_path, [(["a"], np.ones((1, 2)), ["text"], [{}])], [], {})
+    manifest = read_manifest(tmp_path)
+    batch = tmp_path / manifest["batches"][0]["file"]
+    data = bytearray(batch.read_bytes())
+    data[-1] ^= 0xFF
+    batch.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        list(iter_snapshot(tmp_path, manifest))
+
+
+async def test_database_snapshot_keeps_parents_and_parsed_texts(
+    tmp_path: Path, monkeypatch
+):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(settings, "EMBEDDING_REDUCTION", "none")
+    monkeypatch.setattr(
+        VectorDatabase,
+        "create_embeddings",
+        staticmethod(
+            lambda model, pool_name="embedding": (
+                None,
+                DeterministicFakeEmbedding(size=8),
+            )
+        ),
+    )
+    await db.initialize()
+    document = Document(
+        page_content="\n\n".join(f"Section {i}. " + "text " * 200 for i in range(3)),
+        metadata={"source": "manual.txt", "filename": "manual.txt"},
+    )
+    await ingestion_service.index_documents([document], strategy="parent_child")
+    chunks = db.count()
+    await db.export_snapshot(tmp_path / "snapshot")
+
+    await db.import_snapshot(tmp_path / "snapshot", replace=True)
+    assert db.count() == chunks
+    assert len(await parsed_store.list_files()) == 1
+    parent_ids = {
+        metadata["parent_id"]
+        for _, _, _, metadatas in db.iter_batches()
+        for metadata in metadatas
+    }
+    parents = await db.get_parent_documents(list(parent_ids))
+    assert set(parents) == parent_ids
@@ -0,0 +1,60 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.core.leases import leases
+from app.core.sync_state import SyncState
+from app.services.sync import DirectorySync
+
+
+async def test_sync_indexes_only_the_delta(tmp_path: Path, monkeypatch):
+    root = tmp_path / "docs"
+    root.mkdir()
+    (root / "a.txt").write_text("first")
+    (root / "b.txt").write_text("second")
+    (root / "image.png").write_bytes(b"not a document")
+
+    monkeypatch.setattr(settings, "SYNC_DIRECTORIES", str(root))
+    monkeypatch.setattr(
+        "app.services.sync.sync_state", SyncState(tmp_path / "sync.sqlite3")
+    )
+    indexed, removed = [], []
+
+    async def index(path, strategy):
+        indexed.append(Path(path).name)
+        return 1
+
+    async def remove(path, file_hash):
+        removed.append(Path(path).name)
+
+    sync = DirectorySync()
+    monkeypatch.setattr(sync, "_index", index)
+    monkeypatch.setattr(sync, "_remove", remove)
+
+    first = await sync.sync()
+    assert sorted(indexed) == ["a.txt", "b.txt"]
+    assert first["added"] == 2
+
+    indexed.clear()
+    (root / "a.txt").write_text("first, edited")
+    os.utime(root / "b.txt", ns=(0, 10**9))  # touched, same content
+    (root / "c.txt").write_text("third")
+
+    second = await sync.sync()
+    assert sorted(indexed) == ["a.txt", "c.txt"]
+    assert (second["added"], second["changed"], second["unchanged"]) == (1, 1, 1)
+
+    indexed.clear()
+    (root / "c.txt").unlink()
+
+    third = await sync.sync()
+    assert indexed == []
+    assert removed == ["c.txt"]
+    assert third["deleted"] == 1
+
+    # Another worker holds the sync lease.
+    async with leases.hold("sync"):
+        with pytest.raises(RuntimeError):
+            await sync.sync()
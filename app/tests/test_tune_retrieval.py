@@ -0,0 +1,50 @@
+import re
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.scripts.tune_retrieval import pick, tune
+
+VOCABULARY = ["apple", "orchard", "harvest", "engine", "piston", "fuel"]
+
+
+class KeywordEmbeddings(Embeddings):
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        words = re.findall(r"[a-z]+", text.lower())
+        return [float(words.count(word)) + 0.01 for word in VOCABULARY]
+
+
+async def test_tune_reports_metrics_and_picks_cheapest_passing_config():
+    documents = [
+        Document(
+            page_content="apple orchard harvest. " * 40,
+            metadata={"source": "fruit.txt"},
+        ),
+        Document(
+            page_content="engine piston fuel. " * 40, metadata={"source": "cars.txt"}
+        ),
+    ]
+    dataset = [
+        {"question": "when is the apple harvest", "sources": {"fruit.txt"}},
+        {"question": "engine fuel", "sources": {"cars.txt"}},
+    ]
+
+    rows = await tune(
+        documents,
+        dataset,
+        KeywordEmbeddings(),
+        chunk_sizes=[200, 400],
+        overlaps=[0, 50],
+        top_ks=[1, 3],
+        score_thresholds=[0.0],
+    )
+
+    assert len(rows) == 8
+    assert all(row["recall"] == 1.0 and row["mrr"] == 1.0 for row in rows)
+    best = pick(rows, min_recall=1.0, min_mrr=1.0)
+    assert (best["chunk_size"], best["top_k"]) == (200, 1)
+    assert best["avg_context_tokens"] == min(row["avg_context_tokens"] for row in rows)
+    assert pick(rows, min_recall=1.1, min_mrr=0.0) is None